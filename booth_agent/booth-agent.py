@@ -1,13 +1,14 @@
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langchain.agents import create_react_agent, AgentExecutor
 from langchain.memory import ConversationBufferMemory
 from langchain.agents.format_scratchpad import format_log_to_str
 from langchain.agents.output_parsers import ReActSingleInputOutputParser
 from langchain.callbacks.base import BaseCallbackHandler
 from flask import Flask, request, jsonify
+from aiohttp import web
 from flask_cors import CORS
 import argparse
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -20,28 +21,44 @@ from tools.degree_requirements import degree_requirements_checker
 from tools.concentration_requirements import concentration_requirements_checker
 from tools.course_csv_loaders.course_loader_context import course_tool_context_search
 from tools.course_csv_loaders.course_loader_vector import course_tool_vector_search
-from tools.course_csv_loaders.course_name_finder import course_to_title
+from tools.course_csv_loaders.course_name_finder import course_to_title, title_to_course
+from tools.course_csv_loaders.schedule_index import schedule_conflict_checker
 from tools.syllabus_loader.syllabus_tool import syllabus_qa
 from tools.bidding_loader.bidding_tool import bid_history_qa
+from tools.course_planner import course_planner
+from tools.tool_memo import tool_memos
+from tools.single_flight import CoalescingChatOpenAI, coalesce_tools, llm_flight, tool_flight
 from prompts.react_prompt import REACT_PROMPT
+from server.usage_tracker import UsageTracker, empty_totals, usage_aggregator
+from server.session_manager import SessionManager
+from server.streaming import EventLoopThread, format_sse, start_stream_server, stream_agent
+from server.answer_cache import build_answer_cache
 
 class CaptureThinkingCallback(BaseCallbackHandler):
-    """Callback handler to capture the agent's thinking process."""
+    """
+    Callback handler to capture the agent's thinking process.
+
+    A new handler is passed in the invoke config of every request, so it is inherited by
+    nested runs; only the top-level agent's steps are recorded.
+    """
     
     def __init__(self):
         self.thinking_steps = []
 
-    def on_chain_start(self, serialized, inputs, **kwargs):
+    def on_chain_start(self, serialized, inputs, *, parent_run_id=None, **kwargs):
         """Capture the start of a new chain with its inputs."""
-        self.thinking_steps.append(f"Starting new invocation with input: {inputs}")
+        if parent_run_id is None:
+            self.thinking_steps.append(f"Starting new invocation with input: {inputs}")
 
-    def on_agent_action(self, action, **kwargs):
+    def on_agent_action(self, action, *, parent_run_id=None, **kwargs):
         """Capture each action the agent takes."""
-        self.thinking_steps.append(f"Agent is thinking: {action}")
+        if parent_run_id is None:
+            self.thinking_steps.append(f"Agent is thinking: {action}")
 
-    def on_agent_finish(self, finish, **kwargs):
+    def on_agent_finish(self, finish, *, parent_run_id=None, **kwargs):
         """Capture the agent's final response."""
-        self.thinking_steps.append(f"Final agent response: {finish}")
+        if parent_run_id is None:
+            self.thinking_steps.append(f"Final agent response: {finish}")
 
 def setup_agent():
     """Initialize and configure the agent with all necessary components."""
@@ -49,27 +66,25 @@ def setup_agent():
     app = Flask(__name__)
     CORS(app)  # Enable CORS for all routes
 
-    # Initialize language model
-    llm = ChatOpenAI(model="gpt-4o-mini")
+    # Initialize language model (stream_usage reports token counts for the streamed agent steps;
+    # identical concurrent completions share one request)
+    llm = CoalescingChatOpenAI(model="gpt-4o-mini", stream_usage=True)
 
-    # Define available tools
-    tools = [
+    # Define available tools, memoized on their input and the version of their data files,
+    # with identical concurrent calls sharing one run
+    tools = tool_memos.memoize_tools(coalesce_tools([
         degree_requirements_checker,
         concentration_requirements_checker,
         course_tool_vector_search,
         course_to_title,
+        title_to_course,
+        schedule_conflict_checker,
         syllabus_qa,
-        bid_history_qa
-    ]
+        bid_history_qa,
+        course_planner
+    ]))
 
-    # Initialize memory
-    memory = ConversationBufferMemory(
-        memory_key="chat_history",
-        return_messages=True,
-        output_key="output"
-    )
-
-    # Create the ReAct agent
+    # Create the ReAct agent (stateless, shared by every session)
     react_agent = create_react_agent(
         llm=llm,
         tools=tools,
@@ -77,24 +92,88 @@ def setup_agent():
         output_parser=ReActSingleInputOutputParser()
     )
 
-    # Initialize thinking callback
-    thinking_callback = CaptureThinkingCallback()
+    def build_executor():
+        """Create an agent executor with its own conversation memory."""
+        memory = ConversationBufferMemory(
+            memory_key="chat_history",
+            return_messages=True,
+            output_key="output"
+        )
+        return AgentExecutor(
+            agent=react_agent,
+            tools=tools,
+            memory=memory,
+            verbose=True,
+            handle_parsing_errors=True,
+            max_iterations=50
+        )
 
-    # Create agent executor
-    agent_executor = AgentExecutor(
-        agent=react_agent,
-        tools=tools,
-        memory=memory,
-        verbose=True,
-        handle_parsing_errors=True,
-        max_iterations=50,
-        callbacks=[thinking_callback]
-    )
+    # Session-scoped memory and executors, so concurrent users don't share history
+    session_manager = SessionManager(build_executor)
 
-    return app, agent_executor, thinking_callback
+    return app, session_manager
 
 # Initialize components
-app, agent_executor, thinking_callback = setup_agent()
+app, session_manager = setup_agent()
+
+# Session used by the CLI and test modes
+LOCAL_SESSION = "local"
+
+# Event loop that runs the streaming server and its agent turns
+event_loop = EventLoopThread()
+
+# Port of the async server that streams agent turns (the Flask API is on port 5000)
+STREAM_PORT = int(os.getenv("BOOTH_AGENT_STREAM_PORT", "5001"))
+
+# Answers to self-contained queries, invalidated when the data files change
+answer_cache = build_answer_cache()
+
+def has_history(session) -> bool:
+    """
+    Whether the session already has turns. The answer cache is shared by every session
+    and keyed on the query alone, so turns that may depend on earlier ones are neither
+    served from it nor stored in it.
+    """
+    return session.turns > 0
+
+def serve_cached(session, query: str):
+    """
+    Answer the first query of a session from the answer cache, recording the turn in the
+    session's memory so follow-up questions still have their context.
+
+    Returns:
+        dict: The cached answer in run_agent()'s format, or None on a miss or if the
+              session already has history
+    """
+    if has_history(session):
+        return None
+    answer = answer_cache.get(query)
+    if answer is None:
+        return None
+    with session.lock:
+        session.executor.memory.save_context({"input": query}, {"output": answer})
+        session.turns += 1
+    usage = {"total": empty_totals(), "by_tool": {}, "by_iteration": [], "wall_seconds": 0.0}
+    return {"result": {"output": answer}, "bot_thinking": "Served from the answer cache", "usage": usage, "cached": True}
+
+def run_agent(session, query: str) -> dict:
+    """
+    Run one turn of a session's conversation.
+
+    Turns of the same session run one at a time; the thinking and usage callbacks are
+    created per request and passed in the invoke config.
+
+    Returns:
+        dict: The agent result, the thinking steps and the usage summary
+    """
+    thinking_callback = CaptureThinkingCallback()
+    usage_tracker = UsageTracker()
+    with session.lock:
+        result = session.executor.invoke({"input": query}, config={"callbacks": [thinking_callback, usage_tracker]})
+        session.turns += 1
+    usage = usage_tracker.summary()
+    usage_aggregator.record(usage)
+    return {"result": result, "bot_thinking": "\n".join(thinking_callback.thinking_steps), "usage": usage}
 
 @app.route('/api/query', methods=['POST'])
 def handle_query():
@@ -103,11 +182,13 @@ def handle_query():
     
     Expected JSON payload:
     {
-        "query": "Your question here"
+        "query": "Your question here",
+        "session_id": "Optional id of the conversation to continue"
     }
     
     Returns:
-        JSON response with the agent's answer and thinking process
+        JSON response with the agent's answer, thinking process, token/latency usage and the
+        session id to send with the next query (a new one if none was given)
     """
     try:
         # Validate request
@@ -117,18 +198,23 @@ def handle_query():
                 'error': 'Missing query in request body'
             }), 400
 
-        # Process query
+        # Process query in the caller's session, held so it is not evicted while the turn runs
         query = data['query']
-        result = agent_executor.invoke({"input": query})
-        bot_thinking = "\n".join(thinking_callback.thinking_steps)
-        
-        # Clear thinking steps for next query
-        thinking_callback.thinking_steps = []
+        with session_manager.use(data.get('session_id')) as session:
+            first_turn = not has_history(session)
+            turn = serve_cached(session, query)
+            if turn is None:
+                turn = run_agent(session, query)
+                if first_turn:
+                    answer_cache.put(query, turn['result']['output'])
 
         return jsonify({
             'query': query,
-            'response': result['output'],
-            'bot_thinking': bot_thinking
+            'session_id': session.session_id,
+            'response': turn['result']['output'],
+            'bot_thinking': turn['bot_thinking'],
+            'usage': turn['usage'],
+            'cached': turn.get('cached', False)
         })
 
     except Exception as e:
@@ -136,6 +222,128 @@ def handle_query():
             'error': f'Error processing query: {str(e)}'
         }), 500
 
+# Routes of the async streaming server, which runs on the agent event loop
+stream_routes = web.RouteTableDef()
+
+# Headers of the server-sent event responses (the Flask routes get theirs from flask_cors)
+SSE_HEADERS = {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+    'Access-Control-Allow-Origin': '*'
+}
+
+@stream_routes.post('/api/query/stream')
+async def handle_query_stream(request):
+    """
+    Stream the agent's work on a query as server-sent events.
+
+    Takes the same JSON payload as /api/query. Events:
+        start      {"session_id", "query"}, sent immediately
+        tool_start {"tool", "input"} and tool_end {"tool", "output", "truncated"} per tool call
+        thought    {"text"} for each agent step that chose an action
+        token      {"text"} pieces of the final answer as the LLM streams them
+        done       {"session_id", "response", "bot_thinking", "usage"} at the end
+        error      {"error"} if the agent failed
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not data or 'query' not in data:
+        return web.json_response({'error': 'Missing query in request body'}, status=400, headers={'Access-Control-Allow-Origin': '*'})
+
+    # Held for the whole stream, so the session is not evicted while its turn runs
+    with session_manager.use(data.get('session_id')) as session:
+        return await stream_query(request, session, data['query'])
+
+async def stream_query(request, session, query: str):
+    """Stream the cached answer, or the agent's turn, for a query of a held session."""
+    first_turn = not has_history(session)
+    response = web.StreamResponse(headers=SSE_HEADERS)
+    await response.prepare(request)
+
+    try:
+        # The cache lookup may embed the query and waits for the session's lock, so it runs in the thread pool
+        turn = await asyncio.get_running_loop().run_in_executor(None, serve_cached, session, query)
+        if turn is not None:
+            answer = turn['result']['output']
+            for event, payload in (
+                ('start', {'session_id': session.session_id, 'query': query}),
+                ('token', {'text': answer}),
+                ('done', {'session_id': session.session_id, 'response': answer, 'bot_thinking': turn['bot_thinking'],
+                          'usage': turn['usage'], 'cached': True})
+            ):
+                await response.write(format_sse(event, payload).encode('utf-8'))
+            return response
+
+        thinking_callback = CaptureThinkingCallback()
+        usage_tracker = UsageTracker()
+
+        def finish(output):
+            usage = usage_tracker.summary()
+            usage_aggregator.record(usage)
+            if first_turn:
+                answer_cache.put(query, output)
+            return {'bot_thinking': "\n".join(thinking_callback.thinking_steps), 'usage': usage, 'cached': False}
+
+        await stream_agent(response, session, query, [thinking_callback, usage_tracker], on_finish=finish)
+    except ConnectionResetError:
+        # The client disconnected; stream_agent has cancelled the run
+        pass
+    return response
+
+@stream_routes.options('/api/query/stream')
+async def handle_query_stream_preflight(request):
+    """CORS preflight for browsers posting JSON to the streaming endpoint."""
+    return web.Response(headers={
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type'
+    })
+
+@app.route('/api/sessions/<session_id>', methods=['DELETE'])
+def reset_session(session_id):
+    """Forget a session's conversation history."""
+    return jsonify({'session_id': session_id, 'reset': session_manager.reset(session_id)})
+
+@app.route('/api/sessions', methods=['GET'])
+def session_stats():
+    """Number of live sessions."""
+    return jsonify(session_manager.stats())
+
+@app.route('/api/cache', methods=['GET'])
+def cache_stats():
+    """Answer cache hit/miss counters and size."""
+    return jsonify(answer_cache.snapshot())
+
+@app.route('/api/cache', methods=['DELETE'])
+def clear_cache():
+    """Drop every cached answer."""
+    answer_cache.clear()
+    return jsonify(answer_cache.snapshot())
+
+@app.route('/api/cache/tools', methods=['GET'])
+def tool_cache_stats():
+    """Hit/miss counters and size of every tool's memo."""
+    return jsonify(tool_memos.snapshot())
+
+@app.route('/api/cache/tools', methods=['DELETE'])
+def clear_tool_cache():
+    """Drop every memoized tool output."""
+    tool_memos.clear()
+    return jsonify(tool_memos.snapshot())
+
+@app.route('/api/inflight', methods=['GET'])
+def inflight_stats():
+    """LLM completions and tool calls computed, shared with concurrent identical calls, and in flight."""
+    return jsonify({'llm': llm_flight.snapshot(), 'tools': tool_flight.snapshot()})
+
+@app.route('/api/usage', methods=['GET'])
+def usage_report():
+    """Rolling token and latency usage per tool since the server started."""
+    return jsonify(usage_aggregator.snapshot())
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint to verify API status."""
@@ -156,7 +364,7 @@ def run_cli():
             print("Exiting the tool. Have a great day! 👋")
             break
 
-        result = agent_executor.invoke({"input": query})
+        result = run_agent(session_manager.get(LOCAL_SESSION), query)["result"]
         print(f"\nQuery: {query}")
         print(f"\nResponse: {result['output']}\n")
 
@@ -169,21 +377,29 @@ def run_tests():
         "What are the bid points for 34106?", # Testing bid_history_qa
         "What do we learn in 34106?", # Testing syllabus_qa
         "What is the title for 35150?", # Testing course_to_title # Testing degree_requirements_checker
-        "What is the course number for investments?", # Testing course_tool_vector_search
-        "What are the course numbers for investments and financial accounting?", # Testing course_tool_vector_search
+        "What is the course number for investments?", # Testing title_to_course
+        "What are the course numbers for investments and financial accounting?", # Testing title_to_course
         "What are the prerequisites for Advanced Investments?" # Testing syllabus_qa
     ]
 
     for query in test_queries:
         print(f"\nQuery: {query}")
-        result = agent_executor.invoke({"input": query})
+        result = run_agent(session_manager.get(LOCAL_SESSION), query)["result"]
         print(f"Response: {result['output']}")
 
 def run_server():
-    """Run the Flask server with the specified configuration."""
+    """Run the Flask server and the streaming server with the specified configuration."""
     # Initialize the agent to reduce cold start time
-    result = agent_executor.invoke({"input": "hi"})
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    run_agent(session_manager.get("warmup"), "hi")
+    session_manager.reset("warmup")
+
+    # Streamed turns are served asynchronously on the event loop. With the debug reloader the
+    # app is served by a child process (WERKZEUG_RUN_MAIN), which is where the port is bound
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_stream_server(event_loop, stream_routes, '0.0.0.0', STREAM_PORT)
+
+    # Requests are handled in threads; sessions keep their conversations apart
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
 
 if __name__ == "__main__":
     # Set up command line argument parser
@@ -1,10 +1,51 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import argparse
+import hashlib
+import io
+import json
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+# Bidding phases in column order
+PHASES = ("Phase 1", "Phase 2", "Phase 25", "Phase 1 New Students", "Phase 2 New Students", "Phase 3")
+
+# Typed schema of the columnar file, in CSV column order. Seats available stay strings
+# because closed sections are recorded as "CLO".
+SCHEMA = {
+    "Course_Original": "string",
+    "Course_Number": "string",
+    "Section": "string",
+    "Title": "string",
+    "Quarter": "string",
+    "Year": "int32",
+    "Day and Time": "string",
+    "Instructor": "string"
+}
+for phase in PHASES:
+    SCHEMA[f"Total Enrollment after  {phase}"] = "float64"
+    SCHEMA[f"Seats Available after {phase}"] = "string"
+    SCHEMA[f"{phase} Price"] = "float64"
+
+# Parquet key-value metadata entry that records which sheets the file was built from
+SHEETS_METADATA_KEY = b"bidding_history_sheets"
+
+XLSX_NAMESPACES = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "rel": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "pkg": "http://schemas.openxmlformats.org/package/2006/relationships"
+}
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Load bidding history from Excel file')
     parser.add_argument('input_file_path', help='Path to the Excel file containing bidding history')
     parser.add_argument('output_file_path', help='Path to the CSV file that will be created')
+    parser.add_argument('--parquet-path', help='Path of the typed Parquet file (defaults to the CSV path with a .parquet suffix)')
+    parser.add_argument('--rebuild', action='store_true', help='Re-parse every sheet instead of only new or changed ones')
+    parser.add_argument('--benchmark', action='store_true', help='Compare load times of the CSV and the Parquet file')
     return parser.parse_args()
 
 def process_bidding_data(df):
@@ -26,25 +67,160 @@ def process_bidding_data(df):
     
     return df
 
+def format_cell(value):
+    """Render a string-typed cell the way it appears in the CSV (whole numbers without ".0")."""
+    if pd.isna(value):
+        return pd.NA
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def apply_schema(df):
+    """
+    Give a processed sheet every SCHEMA column, in order and with its declared type.
+
+    Sheets without a phase (e.g. no Phase 2.5 that quarter) get empty columns for it.
+    """
+    typed = pd.DataFrame(index=df.index)
+    for column, dtype in SCHEMA.items():
+        values = df[column] if column in df.columns else pd.Series(None, index=df.index, dtype=dtype)
+        if dtype == "string":
+            values = values.map(format_cell)
+        typed[column] = values.astype(dtype)
+    return typed.reset_index(drop=True)
+
+def read_shared_strings(workbook_zip):
+    """
+    Text of every entry of the workbook's shared-string table, by index.
+
+    Returns:
+        list: Strings referenced by cells of type "s" through their index
+    """
+    if "xl/sharedStrings.xml" not in workbook_zip.namelist():
+        return []
+    table = ET.fromstring(workbook_zip.read("xl/sharedStrings.xml"))
+    text_tag = f"{{{XLSX_NAMESPACES['main']}}}t"
+    return ["".join(text.text or "" for text in item.iter(text_tag)) for item in table.findall("main:si", XLSX_NAMESPACES)]
+
+def sheet_digest(sheet_xml, shared_strings):
+    """
+    Hash the cells of a worksheet, with shared-string references resolved to their text.
+
+    Cells are hashed by reference, type, style, formula and value, so the digest only
+    changes when the sheet's own contents do, not when another sheet adds strings to
+    the shared table (and shifts the indices).
+    """
+    cell_tag = f"{{{XLSX_NAMESPACES['main']}}}c"
+    text_tag = f"{{{XLSX_NAMESPACES['main']}}}t"
+    digest = hashlib.sha256()
+    for _, element in ET.iterparse(io.BytesIO(sheet_xml)):
+        if element.tag != cell_tag:
+            continue
+        value = element.findtext("main:v", default="", namespaces=XLSX_NAMESPACES)
+        if element.get("t") == "s":
+            value = shared_strings[int(value)]
+        elif element.get("t") == "inlineStr":
+            value = "".join(text.text or "" for text in element.iter(text_tag))
+        formula = element.findtext("main:f", default="", namespaces=XLSX_NAMESPACES)
+        digest.update(json.dumps([element.get("r"), element.get("t"), element.get("s"), formula, value]).encode("utf-8"))
+        element.clear()
+    return digest.hexdigest()
+
+def sheet_hashes(input_file_path):
+    """
+    Hash the cell values of every worksheet in the workbook, without building DataFrames.
+
+    Returns:
+        dict: Sheet name -> SHA-256 hex digest, in workbook order
+    """
+    with zipfile.ZipFile(input_file_path) as workbook_zip:
+        workbook = ET.fromstring(workbook_zip.read("xl/workbook.xml"))
+        relationships = ET.fromstring(workbook_zip.read("xl/_rels/workbook.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in relationships.findall("pkg:Relationship", XLSX_NAMESPACES)}
+        shared_strings = read_shared_strings(workbook_zip)
+
+        hashes = {}
+        for sheet in workbook.find("main:sheets", XLSX_NAMESPACES):
+            target = targets[sheet.get(f"{{{XLSX_NAMESPACES['rel']}}}id")].lstrip("/")
+            path = target if target.startswith("xl/") else f"xl/{target}"
+            hashes[sheet.get("name")] = sheet_digest(workbook_zip.read(path), shared_strings)
+        return hashes
+
+def read_parquet_sheets(parquet_file_path):
+    """
+    Read the rows of a previously written Parquet file, split back into its sheets.
+
+    Returns:
+        dict: Sheet name -> (sha256, DataFrame); empty if there is no usable file
+    """
+    if not Path(parquet_file_path).exists():
+        return {}
+    table = pq.read_table(parquet_file_path)
+    metadata = (table.schema.metadata or {}).get(SHEETS_METADATA_KEY)
+    if metadata is None:
+        return {}
+
+    data = table.to_pandas()
+    if list(data.columns) != list(SCHEMA):
+        return {}
+
+    sheets, start = {}, 0
+    for sheet in json.loads(metadata):
+        sheets[sheet["name"]] = (sheet["sha256"], data.iloc[start:start + sheet["rows"]].reset_index(drop=True))
+        start += sheet["rows"]
+    return sheets
+
+def write_parquet(data, sheets, parquet_file_path):
+    """Write the typed rows to Parquet, recording each sheet's name, hash and row count."""
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    metadata = json.dumps([{"name": name, "sha256": sha, "rows": len(df)} for name, (sha, df) in sheets.items()])
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), SHEETS_METADATA_KEY: metadata.encode("utf-8")})
+
+    tmp_path = Path(str(parquet_file_path) + ".tmp")
+    pq.write_table(table, tmp_path)
+    tmp_path.replace(parquet_file_path)
+
+def run_benchmark(output_file_path, parquet_file_path, repeat=20):
+    """Compare pd.read_csv of the CSV with pd.read_parquet of the typed file."""
+    for name, load in (("read_csv", lambda: pd.read_csv(output_file_path)),
+                       ("read_parquet", lambda: pd.read_parquet(parquet_file_path))):
+        load()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            load()
+        print(f"{name:<13} {(time.perf_counter() - start) * 1000 / repeat:8.2f} ms/load")
+
 if __name__ == "__main__":
     args = parse_args()
     input_file_path = args.input_file_path
     output_file_path = args.output_file_path
+    parquet_file_path = Path(args.parquet_path) if args.parquet_path else Path(output_file_path).with_suffix(".parquet")
 
-    # Load the Excel file
+    if args.benchmark:
+        run_benchmark(output_file_path, parquet_file_path)
+        raise SystemExit
+
+    # Hash the sheets and reuse the rows of every sheet that was already loaded unchanged
     print(f"Loading Excel file from {input_file_path}...")
-    xls = pd.ExcelFile(input_file_path)
+    hashes = sheet_hashes(input_file_path)
+    previous = {} if args.rebuild else read_parquet_sheets(parquet_file_path)
+    new_sheets = [name for name, sha in hashes.items() if previous.get(name, (None,))[0] != sha]
+    print(f"{len(hashes) - len(new_sheets)} sheets unchanged, parsing {len(new_sheets)}: {', '.join(new_sheets) or 'none'}")
 
-    # Read all sheets and merge them
-    df_list = [xls.parse(sheet) for sheet in xls.sheet_names]
-    merged_df = pd.concat(df_list, ignore_index=True)
+    # Read only the new or changed sheets
+    parsed = {}
+    if new_sheets:
+        xls = pd.ExcelFile(input_file_path)
+        for name in new_sheets:
+            # Process the data to split course numbers and sections
+            parsed[name] = (hashes[name], apply_schema(process_bidding_data(xls.parse(name))))
 
-    # Process the data to split course numbers and sections
-    print("Processing course numbers and sections...")
-    processed_df = process_bidding_data(merged_df)
+    sheets = {name: parsed[name] if name in parsed else previous[name] for name in hashes}
+    processed_df = pd.concat([df for _, df in sheets.values()], ignore_index=True)
 
-    # Save to a CSV file
+    # Save to a CSV file, then the Parquet file (written last so readers see it as current)
     processed_df.to_csv(output_file_path, index=False)
+    write_parquet(processed_df, sheets, parquet_file_path)
 
     # Display summary of the merged data
     print("\nData Summary:")
@@ -52,5 +228,4 @@ if __name__ == "__main__":
     print(f"Columns: {', '.join(processed_df.columns)}")
     print("\nSample of processed data:")
     print(processed_df[['Course_Original', 'Course_Number', 'Section']].head())
-    print(f"\nProcessed data saved as {output_file_path}")
-
+    print(f"\nProcessed data saved as {output_file_path} and {parquet_file_path}")
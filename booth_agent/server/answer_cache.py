@@ -0,0 +1,180 @@
+from collections import OrderedDict
+from threading import Lock
+import numpy as np
+import os
+import re
+import time
+from tools.cache_utils import DATA_DIR, DataVersion
+
+# Entries kept, and how long an answer is served
+ANSWER_CACHE_SIZE = int(os.getenv("BOOTH_AGENT_ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("BOOTH_AGENT_ANSWER_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+
+# Cosine similarity above which a differently worded query reuses an answer (unset: exact matches only)
+ANSWER_CACHE_SIMILARITY = os.getenv("BOOTH_AGENT_ANSWER_CACHE_SIMILARITY")
+
+# Seconds between checks of the data files' fingerprint
+DATA_VERSION_CHECK_SECONDS = 5
+
+# Queries that refer back to the conversation, whose answers depend on the chat history
+ANAPHORA_PATTERN = re.compile(
+    r"\b(it|its|that|this|these|those|they|them|their|he|she|him|her|same|above|previous|earlier|"
+    r"former|latter|again|else|instead|also|too|more|another|other|what about|how about)\b",
+    re.IGNORECASE
+)
+
+# Queries that depend on the student's own state (courses taken, transcript, concentration,
+# points), whose answers differ per student. Generic first-person questions such as "What
+# courses can I take on Monday evenings?" or "What do we learn in 34106?" stay cacheable.
+PERSONAL_STATE_PATTERN = re.compile(
+    r"\b(my|mine|our|ours)\b"
+    r"|\b(i|we)('ve|'m|'re|\s+have|\s+had|\s+am|\s+are|\s+was|\s+were)?(\s+already|\s+just|\s+currently)?\s+"
+    r"(took|taken|taking|completed?|finished|done|passed|failed|waived|bid|enrolled|registered|declared|majoring|concentrating|in)\b"
+    r"|\b(ive|im)\s+(already\s+)?(taken|taking|completed|finished|done|passed|waived|bid|enrolled|registered|in)\b"
+    r"|\b(i|we)('ve|\s+have|\s+only\s+have)(\s+got)?\s+(only\s+)?\d",
+    re.IGNORECASE
+)
+
+# Answers that should not be replayed
+UNCACHEABLE_OUTPUTS = ("Agent stopped due to iteration limit", "Agent stopped due to max iterations")
+
+
+def normalize_query(query: str) -> str:
+    """Lower-case, unify quotes, collapse whitespace and drop trailing punctuation."""
+    query = query.lower().replace("’", "'").replace("“", '"').replace("”", '"')
+    query = re.sub(r"\s+", " ", query).strip()
+    return query.rstrip("?!. ")
+
+
+class AnswerCache:
+    """
+    Final answers of self-contained queries, keyed on the normalized query and the data version.
+
+    The data version is a fingerprint of everything under data/ (bidding history, course
+    list, syllabi), so refreshing any data file makes every older entry unreachable.
+    Entries are evicted least recently used first beyond max_entries and expire after
+    ttl_seconds. Queries that refer back to the conversation ("what about its bid
+    points?") or depend on the student's own state ("I have taken 30000, what is
+    left?") are neither served nor stored; the caller must also skip turns of sessions
+    that already have history, as the key does not include it. With an embeddings model and a threshold,
+    a query whose embedding is close enough to a cached query of the same data version
+    and with the same numbers in it (course numbers embed almost alike) reuses its
+    answer; this costs one embedding call per exact-match miss.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 data_paths=(DATA_DIR,), embeddings=None, similarity: float = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = DataVersion(data_paths, DATA_VERSION_CHECK_SECONDS)
+        self.embeddings = embeddings
+        self.similarity = similarity
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.stats = {"hits": 0, "similar_hits": 0, "misses": 0, "skipped": 0, "stores": 0, "evictions": 0, "expirations": 0}
+
+    def data_version(self) -> str:
+        """Fingerprint of the data files, rechecked at most every DATA_VERSION_CHECK_SECONDS."""
+        return self.version.current()
+
+    def cacheable(self, query: str) -> bool:
+        """Whether the query stands on its own, without the conversation history or the student's situation."""
+        query = query.replace("’", "'")
+        return not (ANAPHORA_PATTERN.search(query) or PERSONAL_STATE_PATTERN.search(query))
+
+    def _embed(self, query: str):
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _expire(self, now: float):
+        for key, entry in list(self._entries.items()):
+            if now - entry["stored"] > self.ttl_seconds or entry["version"] != self.version.value:
+                del self._entries[key]
+                self.stats["expirations"] += 1
+
+    def get(self, query: str):
+        """
+        Look up the answer to a query.
+
+        Returns:
+            str: The cached answer, or None on a miss or for a query that is not cacheable
+        """
+        if not self.cacheable(query):
+            with self._lock:
+                self.stats["skipped"] += 1
+            return None
+
+        key = (self.data_version(), normalize_query(query))
+        with self._lock:
+            now = time.time()
+            entry = self._entries.get(key)
+            if entry is not None and now - entry["stored"] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry["answer"]
+            if entry is not None:
+                del self._entries[key]
+                self.stats["expirations"] += 1
+            numbers = re.findall(r"\d+", key[1])
+            candidates = [(cached_key, cached) for cached_key, cached in self._entries.items()
+                          if cached_key[0] == key[0] and cached.get("vector") is not None
+                          and now - cached["stored"] <= self.ttl_seconds and re.findall(r"\d+", cached_key[1]) == numbers]
+
+        if self.embeddings is not None and self.similarity is not None and candidates:
+            vector = self._embed(key[1])
+            scores = np.stack([cached["vector"] for _, cached in candidates]) @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.similarity:
+                with self._lock:
+                    if candidates[best][0] in self._entries:
+                        self._entries.move_to_end(candidates[best][0])
+                    self.stats["similar_hits"] += 1
+                return candidates[best][1]["answer"]
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, query: str, answer: str):
+        """Store the answer to a self-contained query for the current data version."""
+        if not self.cacheable(query) or not answer or answer.startswith(UNCACHEABLE_OUTPUTS):
+            return
+        normalized = normalize_query(query)
+        vector = self._embed(normalized) if self.embeddings is not None and self.similarity is not None else None
+
+        key = (self.data_version(), normalized)
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            self._entries[key] = {"answer": answer, "stored": now, "version": key[0], "vector": vector}
+            self._entries.move_to_end(key)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> dict:
+        """Hit/miss counters, hit rate and size."""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["similar_hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": (self.stats["hits"] + self.stats["similar_hits"]) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity": self.similarity,
+                "data_version": self.version.value
+            }
+
+
+def build_answer_cache() -> AnswerCache:
+    """Answer cache configured from the environment (similarity matching needs OpenAI embeddings)."""
+    if ANSWER_CACHE_SIMILARITY:
+        from langchain_openai import OpenAIEmbeddings
+        return AnswerCache(embeddings=OpenAIEmbeddings(), similarity=float(ANSWER_CACHE_SIMILARITY))
+    return AnswerCache()
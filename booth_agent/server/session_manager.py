@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+import os
+import time
+import uuid
+
+# Sessions kept in memory, and how long an idle session lives
+MAX_SESSIONS = int(os.getenv("BOOTH_AGENT_MAX_SESSIONS", "500"))
+SESSION_IDLE_SECONDS = float(os.getenv("BOOTH_AGENT_SESSION_IDLE_SECONDS", str(60 * 60)))
+
+
+class Session:
+    """One user's conversation: its own memory and executor, and a lock that serializes its turns."""
+
+    def __init__(self, session_id: str, executor):
+        self.session_id = session_id
+        self.executor = executor
+        self.lock = Lock()
+        self.created = time.time()
+        self.last_used = self.created
+        self.turns = 0
+        # Requests currently holding the session (see SessionManager.use); guarded by the manager's lock
+        self.users = 0
+
+
+class SessionManager:
+    """
+    Session-scoped agent executors keyed by session id.
+
+    Every session gets its own conversation memory and AgentExecutor, built by the
+    given factory on top of the shared (stateless) ReAct agent, tools and LLM clients,
+    so building one is cheap. Requests of the same session run one at a time under the
+    session's lock; different sessions run in parallel. Sessions are evicted least
+    recently used first when there are more than max_sessions, and after idle_seconds
+    without a request, except while a request holds them (use()) or runs a turn.
+    """
+
+    def __init__(self, build_executor, max_sessions: int = MAX_SESSIONS, idle_seconds: float = SESSION_IDLE_SECONDS):
+        """
+        Args:
+            build_executor: Callable returning a new AgentExecutor with its own memory
+            max_sessions (int): Sessions kept before the least recently used is dropped
+            idle_seconds (float): Seconds after which an unused session is dropped
+        """
+        self.build_executor = build_executor
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+        self.created = 0
+        self.evicted = 0
+
+    def get(self, session_id: str = None) -> Session:
+        """
+        Return the session with this id, creating it (or a session with a new id) if needed.
+
+        The session may be evicted once returned; requests that run turns on it should
+        hold it with use() instead.
+        """
+        with self._lock:
+            return self._lookup(session_id)
+
+    @contextmanager
+    def use(self, session_id: str = None):
+        """
+        Hold the session with this id (created if needed) for the duration of a request,
+        so it is not evicted between being looked up and its turn running.
+
+        Yields:
+            Session: The session
+        """
+        with self._lock:
+            session = self._lookup(session_id)
+            session.users += 1
+        try:
+            yield session
+        finally:
+            with self._lock:
+                session.users -= 1
+                session.last_used = time.time()
+
+    def _lookup(self, session_id: str = None) -> Session:
+        session_id = session_id or uuid.uuid4().hex
+        self._evict()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = Session(session_id, self.build_executor())
+            self._sessions[session_id] = session
+            self.created += 1
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.time()
+        return session
+
+    def reset(self, session_id: str) -> bool:
+        """Forget a session's conversation. Returns whether the session existed."""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _evict(self):
+        now = time.time()
+        for session_id, session in list(self._sessions.items()):
+            idle = now - session.last_used > self.idle_seconds
+            over_capacity = len(self._sessions) >= self.max_sessions
+            if not (idle or over_capacity):
+                # Sessions are in least recently used order, so the rest are newer
+                break
+            if session.users or session.lock.locked():
+                continue
+            del self._sessions[session_id]
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        """Number of live sessions and totals since the server started."""
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "created": self.created,
+                "evicted": self.evicted,
+                "max_sessions": self.max_sessions,
+                "idle_seconds": self.idle_seconds
+            }
@@ -0,0 +1,198 @@
+from threading import Thread
+import asyncio
+import json
+import re
+
+# Marker after which the ReAct agent's completion is the answer shown to the user
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+# Longest tool output sent in a tool_end event
+MAX_OBSERVATION_CHARS = 2000
+
+# Seconds without events after which a keep-alive comment is sent
+KEEPALIVE_SECONDS = 15
+
+# Sentinel closing an event queue
+_DONE = object()
+
+
+def format_sse(event: str, data) -> str:
+    """Encode one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class EventLoopThread:
+    """
+    An asyncio event loop running in a daemon thread.
+
+    The streaming server runs on it, and agent runs are scheduled on it as coroutines,
+    so waiting on the OpenAI API does not hold a thread per request: all in-flight LLM
+    calls share this loop, and only the synchronous tools run in the loop's thread pool.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, name="agent-event-loop", daemon=True)
+        self.thread.start()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the loop and return its concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+async def agent_events(executor, query: str, callbacks: list):
+    """
+    Run the agent with astream_events and translate its events for the client.
+
+    Yields:
+        tuple: (event name, payload) for
+            - "tool_start": a tool called by the agent, with its input
+            - "tool_end": the tool's output (the agent's observation)
+            - "thought": an agent step that chose an action
+            - "token": a piece of the final answer, as the LLM streams it
+            - "final": the agent's complete output
+    """
+    tool_runs = set()
+    completions = {}
+    emitted = {}
+    action_input = None
+
+    async for event in executor.astream_events({"input": query}, config={"callbacks": callbacks}, version="v2"):
+        kind, run_id = event["event"], event["run_id"]
+        nested = any(parent in tool_runs for parent in event.get("parent_ids", []))
+
+        if kind == "on_tool_start":
+            tool_runs.add(run_id)
+            if not nested:
+                # AgentExecutor passes the tool input as a string, which the event does not carry
+                yield "tool_start", {"tool": event["name"], "input": event["data"].get("input") or action_input}
+        elif kind == "on_tool_end" and not nested:
+            output = str(event["data"].get("output", ""))
+            yield "tool_end", {"tool": event["name"], "output": output[:MAX_OBSERVATION_CHARS], "truncated": len(output) > MAX_OBSERVATION_CHARS}
+
+        elif kind == "on_chat_model_stream" and not nested:
+            # Stream only what the agent writes after "Final Answer:"
+            chunk = event["data"]["chunk"].content
+            text = completions[run_id] = completions.get(run_id, "") + (chunk if isinstance(chunk, str) else "")
+            marker = text.find(FINAL_ANSWER_MARKER)
+            if marker >= 0:
+                answer = text[marker + len(FINAL_ANSWER_MARKER):].lstrip()
+                start = emitted.get(run_id, 0)
+                if len(answer) > start:
+                    emitted[run_id] = len(answer)
+                    yield "token", {"text": answer[start:]}
+        elif kind == "on_chat_model_end" and not nested:
+            text = completions.pop(run_id, "")
+            if FINAL_ANSWER_MARKER not in text and text:
+                match = re.search(r"Action Input:\s*(.*)", text, re.DOTALL)
+                action_input = match.group(1).strip() if match else None
+                yield "thought", {"text": text.strip()}
+
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            yield "final", {"output": (event["data"].get("output") or {}).get("output")}
+
+
+async def acquire(lock):
+    """
+    Acquire a threading lock from a coroutine without blocking the event loop.
+
+    An uncontended lock is taken immediately; otherwise the wait happens in the loop's
+    thread pool. If the waiting coroutine is cancelled, the lock is released as soon as
+    the pending acquire gets it.
+    """
+    if lock.acquire(blocking=False):
+        return
+    pending = asyncio.get_running_loop().run_in_executor(None, lock.acquire)
+    try:
+        await asyncio.shield(pending)
+    except asyncio.CancelledError:
+        pending.add_done_callback(lambda _: lock.release())
+        raise
+
+
+async def stream_agent(response, session, query: str, callbacks: list, on_finish=None):
+    """
+    Write the server-sent event stream of one agent turn to an aiohttp StreamResponse.
+
+    Runs on the event loop that serves the request, awaiting astream_events directly, so
+    a turn waiting on the OpenAI API holds no thread. The session's lock is held until
+    the turn ends, so turns of one conversation stay ordered (the sync /api/query route
+    takes the same lock). If the client disconnects, writing raises ConnectionResetError
+    and the run is cancelled; the lock is only released once the cancelled run has
+    finished, so the session's next turn never overlaps it.
+
+    Args:
+        response: A prepared aiohttp.web.StreamResponse
+        on_finish: Called (in the thread pool) with the final output once the run
+                   completed; its return value (a dict) is merged into the "done" event
+    """
+    events = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for name, data in agent_events(session.executor, query, callbacks):
+                await events.put((name, data))
+        except Exception as e:
+            await events.put(("error", {"error": f"Error processing query: {str(e)}"}))
+        finally:
+            await events.put(_DONE)
+
+    await acquire(session.lock)
+    producer = None
+    try:
+        await response.write(format_sse("start", {"session_id": session.session_id, "query": query}).encode("utf-8"))
+        producer = asyncio.create_task(produce())
+        output = None
+        while True:
+            try:
+                item = await asyncio.wait_for(events.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                await response.write(b": keep-alive\n\n")
+                continue
+            if item is _DONE:
+                break
+            name, data = item
+            if name == "final":
+                output = data["output"]
+                continue
+            await response.write(format_sse(name, data).encode("utf-8"))
+
+        if output is not None:
+            session.turns += 1
+            done = {"session_id": session.session_id, "response": output}
+            if on_finish is not None:
+                done.update(await asyncio.get_running_loop().run_in_executor(None, on_finish, output))
+            await response.write(format_sse("done", done).encode("utf-8"))
+    finally:
+        try:
+            if producer is not None:
+                # Client went away or the run ended: stop the agent if still running,
+                # and wait for the cancelled run to unwind
+                producer.cancel()
+                await asyncio.wait([producer])
+        finally:
+            if producer is None or producer.done():
+                session.lock.release()
+            else:
+                # This handler was cancelled while waiting: release once the run has ended
+                producer.add_done_callback(lambda _: session.lock.release())
+
+
+def start_stream_server(loop_thread: EventLoopThread, routes, host: str, port: int):
+    """
+    Serve aiohttp routes on the background event loop, next to the Flask (WSGI) server.
+
+    Returns:
+        aiohttp.web.AppRunner: The running server, for cleanup()
+    """
+    from aiohttp import web
+
+    async def start():
+        app = web.Application()
+        app.add_routes(routes)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+    return loop_thread.submit(start()).result()
@@ -0,0 +1,208 @@
+from langchain_core.callbacks import BaseCallbackHandler
+from collections import deque
+from threading import Lock
+import time
+
+# Name under which LLM calls made by the agent itself (not inside a tool) are reported
+AGENT = "agent"
+
+
+def empty_totals() -> dict:
+    return {"calls": 0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+
+
+def extract_token_usage(response) -> tuple:
+    """
+    Read (prompt tokens, completion tokens) from an LLMResult.
+
+    Chat models report usage on each generated message; completion models and
+    older chat integrations report it in llm_output["token_usage"].
+    """
+    prompt_tokens = completion_tokens = 0
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+                found = True
+    if not found and response.llm_output:
+        usage = response.llm_output.get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+class UsageTracker(BaseCallbackHandler):
+    """
+    Callback handler that accounts LLM calls, tokens and wall time for one agent invocation.
+
+    Pass a fresh tracker in the invoke config so it is inherited by every nested run.
+    LLM calls are attributed to the outermost agent tool they run under (so the calls
+    of the nested bid_history_qa agent count towards bid_history_qa), or to "agent"
+    for the ReAct loop's own completions, and to the agent iteration they belong to.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._started = time.perf_counter()
+        self._parents = {}
+        self._tool_names = {}
+        self._iterations = {}
+        self._starts = {}
+        self._actions = 0
+        self.by_tool = {}
+        self.by_iteration = {}
+
+    def _outermost_tool(self, run_id):
+        tool_name = None
+        while run_id is not None:
+            tool_name = self._tool_names.get(run_id, tool_name)
+            run_id = self._parents.get(run_id)
+        return tool_name
+
+    def _iteration(self, run_id):
+        while run_id is not None:
+            if run_id in self._iterations:
+                return self._iterations[run_id]
+            run_id = self._parents.get(run_id)
+        return None
+
+    def _totals(self, table: dict, key) -> dict:
+        return table.setdefault(key, empty_totals())
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+
+    def on_agent_action(self, action, *, run_id, **kwargs):
+        with self._lock:
+            # Steps of agents nested inside a tool belong to that tool's iteration
+            if self._outermost_tool(run_id) is None:
+                self._actions += 1
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+            self._tool_names[run_id] = (serialized or {}).get("name") or kwargs.get("name", "tool")
+            if self._outermost_tool(parent_run_id) is None:
+                # An agent-level tool runs in the iteration whose action selected it
+                self._iterations[run_id] = self._actions
+                self._totals(self.by_tool, self._tool_names[run_id])["calls"] += 1
+                self._totals(self.by_iteration, self._actions)["calls"] += 1
+            self._starts[run_id] = time.perf_counter()
+
+    def _finish_tool(self, run_id):
+        with self._lock:
+            start = self._starts.pop(run_id, None)
+            if start is not None and run_id in self._iterations:
+                seconds = time.perf_counter() - start
+                self._totals(self.by_tool, self._tool_names[run_id])["seconds"] += seconds
+                self._totals(self.by_iteration, self._iterations[run_id])["seconds"] += seconds
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish_tool(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish_tool(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+            if self._outermost_tool(parent_run_id) is None:
+                # The agent's own completion that decides the next action
+                self._iterations[run_id] = self._actions + 1
+            self._starts[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self.on_llm_start(serialized, [], run_id=run_id, parent_run_id=parent_run_id, **kwargs)
+
+    def _finish_llm(self, run_id, prompt_tokens=0, completion_tokens=0):
+        with self._lock:
+            start = self._starts.pop(run_id, None)
+            seconds = time.perf_counter() - start if start is not None else 0.0
+            tool_name = self._outermost_tool(run_id) or AGENT
+            iteration = self._iteration(run_id)
+
+            for totals in (self._totals(self.by_tool, tool_name), self._totals(self.by_iteration, iteration)):
+                totals["llm_calls"] += 1
+                totals["prompt_tokens"] += prompt_tokens
+                totals["completion_tokens"] += completion_tokens
+            if tool_name == AGENT:
+                self.by_tool[AGENT]["calls"] += 1
+                self.by_tool[AGENT]["seconds"] += seconds
+                self.by_iteration[iteration]["seconds"] += seconds
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish_llm(run_id, *extract_token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish_llm(run_id)
+
+    def summary(self) -> dict:
+        """
+        Usage of this invocation, per tool and per agent iteration.
+
+        Returns:
+            dict: "total", "by_tool", "by_iteration" and "wall_seconds"
+        """
+        with self._lock:
+            total = empty_totals()
+            for totals in self.by_tool.values():
+                for key in ("llm_calls", "prompt_tokens", "completion_tokens"):
+                    total[key] += totals[key]
+            total["calls"] = sum(totals["calls"] for name, totals in self.by_tool.items() if name != AGENT)
+            total["seconds"] = time.perf_counter() - self._started
+
+            return {
+                "total": total,
+                "by_tool": {name: dict(totals) for name, totals in self.by_tool.items()},
+                "by_iteration": [
+                    {"iteration": iteration, **totals}
+                    for iteration, totals in sorted(self.by_iteration.items(), key=lambda item: (item[0] is None, item[0] or 0))
+                ],
+                "wall_seconds": total["seconds"]
+            }
+
+
+class UsageAggregator:
+    """Process-wide rolling usage totals across all queries served."""
+
+    def __init__(self, window: int = 500):
+        self._lock = Lock()
+        self.queries = 0
+        self.by_tool = {}
+        self.recent = deque(maxlen=window)
+
+    def record(self, summary: dict):
+        """Add one query's UsageTracker.summary() to the aggregates."""
+        with self._lock:
+            self.queries += 1
+            for name, totals in summary["by_tool"].items():
+                aggregate = self.by_tool.setdefault(name, empty_totals())
+                for key, value in totals.items():
+                    aggregate[key] += value
+            self.recent.append(summary["total"])
+
+    def snapshot(self) -> dict:
+        """
+        Totals per tool since the process started, plus averages over the recent window.
+        """
+        with self._lock:
+            recent = list(self.recent)
+            return {
+                "queries": self.queries,
+                "by_tool": {name: dict(totals) for name, totals in self.by_tool.items()},
+                "recent_window": {
+                    "queries": len(recent),
+                    **{
+                        f"avg_{key}": (sum(totals[key] for totals in recent) / len(recent)) if recent else 0
+                        for key in ("llm_calls", "prompt_tokens", "completion_tokens", "seconds")
+                    }
+                }
+            }
+
+
+# Shared aggregates for the server process
+usage_aggregator = UsageAggregator()
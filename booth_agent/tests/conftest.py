@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+# Modules import each other as tools.*, server.* and data_loader.*, relative to booth_agent/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# The tool modules create their OpenAI clients at import time; tests never call the API
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,33 @@
+import pytest
+from server.answer_cache import AnswerCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(data_paths=[tmp_path])
+
+
+@pytest.mark.parametrize("query", [
+    "What do we learn in 34106?",
+    "What courses can I take on Monday evenings?",
+    "Can I take 34106 without 35000?",
+    "When is Investments offered next?",
+    "How many points do I need for 34106 in Phase 1?",
+    "What are the bid points for 34106?"
+])
+def test_generic_questions_are_cacheable(cache, query):
+    assert cache.cacheable(query)
+
+
+@pytest.mark.parametrize("query", [
+    "I have taken 30000 and 35000. What is left for the finance concentration?",
+    "I’ve already taken Investments, what should I take next?",
+    "Ive completed 41000, which requirements remain?",
+    "We're taking 35200 in Spring, does 30131 conflict?",
+    "Does my transcript meet the degree requirements?",
+    "Which courses count towards my concentration?",
+    "I have 3000 points, can I get 34106?",
+    "What about its bid points?"
+])
+def test_questions_depending_on_the_student_or_conversation_are_not(cache, query):
+    assert not cache.cacheable(query)
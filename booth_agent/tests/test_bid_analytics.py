@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+from tools.bidding_loader.bid_analytics import PHASES, BidAnalytics, format_summary
+
+
+def bid_rows(course_number, section, quarter, year, price):
+    row = {"Course_Number": course_number, "Section": section, "Title": f"Course {course_number}",
+           "Quarter": quarter, "Year": year}
+    for phase in PHASES:
+        row[f"{phase} Price"] = price
+        row[f"Total Enrollment after  {phase}"] = 50
+        row[f"Seats Available after {phase}"] = 10
+    return row
+
+
+def make_analytics():
+    return BidAnalytics.from_dataframe(pd.DataFrame([
+        bid_rows("30133", 1, "Spring", 2024, 75),
+        bid_rows("30133", 2, "Autumn", 2024, 0),
+        bid_rows("34106", 1, "Spring", 2024, 4000),
+        bid_rows("34106", 81, "Spring", 2024, 0)
+    ]))
+
+
+def test_missing_program_falls_back_to_program_with_bids():
+    summary = make_analytics().summarize("30133", "Evening/Weekend")
+    assert summary["program"] == "Full-Time"
+    assert summary["unavailable_program"] == "Evening/Weekend"
+    assert summary["quarters"] == ["Autumn-2024", "Spring-2024"]
+
+    report = format_summary(summary)
+    assert "No bid history for Evening/Weekend sections; showing Full-Time sections instead." in report
+
+
+def test_requested_program_with_bids_is_summarised():
+    summary = make_analytics().summarize("34106", "Evening/Weekend")
+    assert summary["program"] == "Evening/Weekend"
+    assert summary["unavailable_program"] is None
+    assert summary["phases"]["Phase 1"]["latest"] == {"quarter": "Spring-2024", "price": 0.0, "section": 81}
+    assert make_analytics().summarize("34106")["phases"]["Phase 1"]["latest"]["price"] == 4000.0
+
+
+def test_format_summary_of_empty_summary():
+    summary = {"course": "30133", "title": "Course 30133", "program": "Full-Time", "unavailable_program": None,
+               "other_programs": [], "quarters": [], "phases": {}, "usually_clears_at_zero": False}
+    assert format_summary(summary) == "Course: 30133 - Course 30133\nFull-Time sections: no bid data."
+
+
+def test_evening_question_about_course_without_evening_bids():
+    from tools.bidding_loader.bidding_tool import bid_history_qa
+
+    result = bid_history_qa.invoke("What are the evening bid points for 30133?")
+    assert "No bid history for Evening/Weekend sections" in result["output"]
+    assert "Full-Time sections: bid data" in result["output"]
+
+
+def test_analytics_are_keyed_on_the_loaded_file(tmp_path):
+    from tools.bidding_loader.bid_analytics import load_or_build_analytics, source_fingerprint
+
+    csv_path = tmp_path / "bidding-history.csv"
+    pd.DataFrame([bid_rows("34106", 1, "Spring", 2024, 4000)]).to_csv(csv_path, index=False)
+    analytics = load_or_build_analytics(csv_path, tmp_path / "analytics")
+    assert analytics.summarize("34106")["phases"]["Phase 1"]["latest"]["price"] == 4000.0
+
+    # A newer Parquet copy with different rows is what the tools load, so the cache must follow it
+    pytest.importorskip("pyarrow", exc_type=ImportError)
+    pd.DataFrame([bid_rows("34106", 1, "Spring", 2024, 2500)]).to_parquet(csv_path.with_suffix(".parquet"))
+    analytics = load_or_build_analytics(csv_path, tmp_path / "analytics")
+    assert analytics.summarize("34106")["phases"]["Phase 1"]["latest"]["price"] == 2500.0
+    assert source_fingerprint(csv_path.with_suffix(".parquet")) != source_fingerprint(csv_path)
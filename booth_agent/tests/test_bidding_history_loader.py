@@ -0,0 +1,63 @@
+import zipfile
+import pytest
+
+pytest.importorskip("pyarrow", exc_type=ImportError)
+
+from data_loader.bidding_history_loader import sheet_hashes
+
+MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+
+def write_workbook(path, sheets):
+    """Write a minimal .xlsx whose string cells reference a workbook-wide shared-string table, as Excel does."""
+    strings = []
+
+    def cell(reference, value):
+        if isinstance(value, str):
+            if value not in strings:
+                strings.append(value)
+            return f'<c r="{reference}" t="s"><v>{strings.index(value)}</v></c>'
+        return f'<c r="{reference}"><v>{value}</v></c>'
+
+    with zipfile.ZipFile(path, "w") as workbook_zip:
+        entries, relationships = [], []
+        for number, (name, rows) in enumerate(sheets.items(), start=1):
+            cells = "".join(
+                f'<row r="{row}">' + "".join(cell(f"{'ABC'[column]}{row}", value) for column, value in enumerate(values)) + "</row>"
+                for row, values in enumerate(rows, start=1)
+            )
+            workbook_zip.writestr(f"xl/worksheets/sheet{number}.xml", f'<worksheet xmlns="{MAIN}"><sheetData>{cells}</sheetData></worksheet>')
+            entries.append(f'<sheet name="{name}" sheetId="{number}" r:id="rId{number}"/>')
+            relationships.append(f'<Relationship Id="rId{number}" Target="worksheets/sheet{number}.xml"/>')
+        workbook_zip.writestr("xl/workbook.xml", f'<workbook xmlns="{MAIN}" xmlns:r="{REL}"><sheets>{"".join(entries)}</sheets></workbook>')
+        workbook_zip.writestr("xl/_rels/workbook.xml.rels", f'<Relationships xmlns="{PKG}">{"".join(relationships)}</Relationships>')
+        items = "".join(f"<si><t>{value}</t></si>" for value in strings)
+        workbook_zip.writestr("xl/sharedStrings.xml", f'<sst xmlns="{MAIN}">{items}</sst>')
+
+
+HEADER = ["Course", "Title", "Phase 1 Price"]
+AUTUMN = [HEADER, ["34106-01", "Investments", 1200], ["30000-01", "Financial Accounting", 0]]
+WINTER = [HEADER, ["35200-01", "Negotiations", 800]]
+
+
+def test_appending_a_sheet_keeps_existing_hashes(tmp_path):
+    write_workbook(tmp_path / "before.xlsx", {"Autumn 2024": AUTUMN})
+    # The new sheet comes first and adds strings, shifting the shared-string indices
+    write_workbook(tmp_path / "after.xlsx", {"Winter 2025": WINTER, "Autumn 2024": AUTUMN})
+
+    before = sheet_hashes(tmp_path / "before.xlsx")
+    after = sheet_hashes(tmp_path / "after.xlsx")
+    assert list(after) == ["Winter 2025", "Autumn 2024"]
+    assert after["Autumn 2024"] == before["Autumn 2024"]
+
+
+def test_editing_a_sheet_changes_its_hash(tmp_path):
+    write_workbook(tmp_path / "before.xlsx", {"Winter 2025": WINTER, "Autumn 2024": AUTUMN})
+    write_workbook(tmp_path / "after.xlsx", {"Winter 2025": [HEADER, ["35200-01", "Negotiation", 800]], "Autumn 2024": AUTUMN})
+
+    before = sheet_hashes(tmp_path / "before.xlsx")
+    after = sheet_hashes(tmp_path / "after.xlsx")
+    assert after["Winter 2025"] != before["Winter 2025"]
+    assert after["Autumn 2024"] == before["Autumn 2024"]
@@ -0,0 +1,28 @@
+from tools.concentration_requirements import concentration_evaluator
+
+
+def test_reached_total_with_unmet_minimum_is_explained():
+    answer = concentration_evaluator.answer("I have taken 35123 35124 35133 35136 for Finance, what is left?")
+    assert answer == (
+        "Finance: 400 units required, 400 counted after caps, total reached but minimums unmet, "
+        "200 more units needed in: asset pricing (100 units), corporate finance (100 units)"
+    )
+
+
+def test_course_blocked_by_bucket_maximum_is_named():
+    answer = concentration_evaluator.answer("I have taken 33350 34104 34115 for Healthcare, progress?")
+    assert answer.startswith("Healthcare: 400 units required, 200 counted after caps, 200 more units needed in: courses (200 units)")
+    assert answer.endswith("; not counted: 34115 (experiential counts at most 100 units)")
+
+
+def test_course_blocked_by_area_cap_is_named():
+    evaluation = concentration_evaluator.evaluate(["41201", "41202", "41203", "41301", "36109"], ["Business Analytics"])
+    result = evaluation["Business Analytics"]
+    assert result["units"] == 400
+    assert result["capped"] == {"additional counts at most 200 units per area": ["41301"]}
+    assert "not counted: 41301 (additional counts at most 200 units per area)" in concentration_evaluator.format_evaluation(evaluation)
+
+
+def test_complete_concentration_still_lists_capped_courses():
+    answer = concentration_evaluator.answer("I have taken 33350 33351 33352 34205 34210 for Healthcare, progress?")
+    assert answer == "Healthcare: 400 units required, 400 counted after caps, complete; not counted: 34210 (courses counts at most 300 units)"
@@ -0,0 +1,31 @@
+import pytest
+from tools.course_csv_loaders.course_catalog import CourseCatalog
+from tools.course_csv_loaders.course_csv_loader_utils import get_csv_file_path
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    return CourseCatalog.from_csv(get_csv_file_path())
+
+
+@pytest.mark.parametrize("question", [
+    "Which sections have open seats in Spring 2025?",
+    "What Harper Center courses are full in Spring 2025?",
+    "What courses are taught by Professor Xyzzy in Winter 2025?",
+    "Which courses are not on Monday in Spring 2025?",
+    "Which Spring 2025 courses count towards the finance concentration?",
+    "Which Winter 2025 courses are online?"
+])
+def test_unparsed_constraints_go_to_the_llm(catalog, question):
+    assert catalog.answer(question) is None
+
+
+@pytest.mark.parametrize("question", [
+    "Which sections of 35150 are offered in Winter 2025?",
+    "Which sections have at least 60 seats in Spring 2025?",
+    "What courses are taught by Stefan Nagel in Winter 2025?",
+    "What courses are on Monday evenings in Spring 2025?"
+])
+def test_fully_parsed_questions_are_answered(catalog, question):
+    answer = catalog.answer(question)
+    assert answer is not None and answer.startswith("Found ")
@@ -0,0 +1,28 @@
+import pytest
+from tools.degree_requirements import degree_ruleset
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("Does 30000 fulfill a requirement?", "counts towards Financial Accounting (Required)."),
+    ("Which requirement does 35000 satisfy?", "counts towards Finance (Breadth)."),
+    ("Does 33251 count towards a requirement?", "It only counts together with 33250."),
+    ("Does 34106 fulfill a requirement?", "does not count towards any degree requirement category.")
+])
+def test_single_course_gets_its_categories(question, expected):
+    answer = degree_ruleset.answer(question)
+    assert expected in answer
+    assert "Still needed" not in answer
+
+
+@pytest.mark.parametrize("question", [
+    "I have taken 30000. What is left?",
+    "I've completed 30000, what do I still need?",
+    "Do 30000 and 35000 fulfill the requirements?",
+    "Audit these transcripts:\n30000 33001 41000 35000\n30000 37000"
+])
+def test_transcripts_are_audited(question):
+    assert "Still needed" in degree_ruleset.answer(question)
+
+
+def test_other_single_course_questions_go_to_the_llm():
+    assert degree_ruleset.answer("What is 30000 about?") is None
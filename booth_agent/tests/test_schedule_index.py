@@ -0,0 +1,36 @@
+import pytest
+from tools.course_csv_loaders.schedule_index import ScheduleIndex, answer_schedule_question
+
+SECTIONS = [
+    {"quarter": "Spring 2025", "course": "35200", "section": "1", "title": "Corporation Finance", "schedule": "Wednesday 8:30 AM - 11:30 AM"},
+    {"quarter": "Spring 2025", "course": "30131", "section": "1", "title": "Advanced Financial Analysis", "schedule": "Wednesday 10:00 AM - 1:00 PM"},
+    {"quarter": "Winter 2025", "course": "35200", "section": "01", "title": "Corporation Finance", "schedule": "Monday 8:30 AM - 11:30 AM"},
+    {"quarter": "Winter 2025", "course": "35200", "section": "81", "title": "Corporation Finance", "schedule": "Monday 6:00 PM - 9:00 PM"}
+]
+
+
+@pytest.mark.parametrize("reference", ["35200-1", "35200-01"])
+@pytest.mark.parametrize("quarter", ["Spring 2025", "Winter 2025"])
+def test_padded_and_unpadded_section_references_resolve(quarter, reference):
+    index = ScheduleIndex(SECTIONS)
+    [(_, rows)] = index.resolve(quarter, [reference])
+    assert [index.sections[row]["course"] for row in rows] == ["35200"]
+    assert index.sections[rows[0]]["section"].lstrip("0") == "1"
+
+
+def test_unknown_section_is_not_offered():
+    index = ScheduleIndex(SECTIONS)
+    assert index.resolve("Spring 2025", ["35200-02", "35200-81"]) == [("35200-02", []), ("35200-81", [])]
+
+
+@pytest.mark.parametrize("reference", ["35200-1", "35200-01"])
+def test_catalog_section_conflicts_are_found(reference):
+    answer = answer_schedule_question(f"Does {reference} conflict with 30131 in Spring 2025?")
+    assert "Not offered" not in answer
+    assert "35200-1 Corporation Finance (Wednesday 8:30 AM - 11:30 AM)" in answer
+
+
+def test_fit_question_uses_the_named_section():
+    answer = answer_schedule_question("What fits around 35200-01 on Wednesday in Spring 2025?")
+    assert "Not offered" not in answer
+    assert "Wednesday: 8:00 AM - 8:30 AM, 11:30 AM - 10:00 PM" in answer
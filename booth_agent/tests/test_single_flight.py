@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+import asyncio
+import inspect
+import time
+import pytest
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.tools import tool
+from tools.single_flight import CoalescingChatMixin, SingleFlight, coalesce_tool
+from tools.tool_memo import build_memo
+
+CONCURRENCY = 16
+
+
+@pytest.fixture
+def upstream_calls():
+    return []
+
+
+@pytest.fixture
+def model(upstream_calls):
+    class SlowFakeChatModel(CoalescingChatMixin, FakeListChatModel):
+        def _call(self, messages, stop=None, run_manager=None, **kwargs):
+            upstream_calls.append(messages[-1].content)
+            time.sleep(0.2)
+            return super()._call(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    return SlowFakeChatModel(responses=["The bid price is 1200 points."] * CONCURRENCY)
+
+
+def fire_concurrently(call) -> list:
+    barrier = Barrier(CONCURRENCY)
+
+    def fire():
+        barrier.wait()
+        return call()
+
+    with ThreadPoolExecutor(CONCURRENCY) as pool:
+        return list(pool.map(lambda _: fire(), range(CONCURRENCY)))
+
+
+def test_concurrent_identical_completions_reach_the_llm_once(model, upstream_calls):
+    results = fire_concurrently(lambda: model.invoke("What are the bid points for 34106?").content)
+    assert len(upstream_calls) == 1
+    assert set(results) == {"The bid price is 1200 points."}
+
+
+def test_concurrent_identical_async_completions_reach_the_llm_once(model, upstream_calls):
+    async def fire():
+        return await asyncio.gather(*(model.ainvoke("When is 34106 offered?") for _ in range(CONCURRENCY)))
+
+    results = asyncio.run(fire())
+    assert len(upstream_calls) == 1
+    assert len({result.content for result in results}) == 1
+
+
+def test_sequential_completions_are_not_coalesced(model, upstream_calls):
+    model.invoke("What are the bid points for 34106?")
+    model.invoke("What are the bid points for 34106?")
+    assert len(upstream_calls) == 2
+
+
+def test_concurrent_identical_tool_calls_run_once(upstream_calls):
+    @tool
+    def slow_lookup(course_number: str) -> str:
+        """Look up a course slowly."""
+        upstream_calls.append(course_number)
+        time.sleep(0.2)
+        return f"Course {course_number}"
+
+    flight = SingleFlight()
+    lookup = coalesce_tool(slow_lookup, flight)
+    results = fire_concurrently(lambda: lookup.invoke("34106"))
+    assert upstream_calls == ["34106"]
+    assert set(results) == {"Course 34106"}
+    assert flight.snapshot() == {"calls": 1, "shared": CONCURRENCY - 1, "in_flight": 0}
+
+
+def test_leader_error_is_shared_and_not_kept():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("upstream failed")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fail)
+    assert flight.do("key", lambda: "recovered") == ("recovered", False)
+
+
+def test_memo_of_a_coalesced_tool_fingerprints_the_tool_module():
+    from tools.degree_requirements import degree_requirements_checker
+
+    memo = build_memo(coalesce_tool(degree_requirements_checker))
+    source_file = inspect.getsourcefile(inspect.unwrap(degree_requirements_checker.func))
+    assert source_file.endswith("degree_requirements.py")
+    assert source_file in memo.version.paths
@@ -0,0 +1,72 @@
+from threading import Lock
+from types import SimpleNamespace
+import asyncio
+import pytest
+from server.streaming import stream_agent
+
+
+class SlowAgent:
+    """Agent that calls a tool, then keeps running and needs a while to unwind when cancelled."""
+
+    def __init__(self):
+        self.unwound = False
+
+    async def astream_events(self, inputs, config=None, version=None):
+        yield {"event": "on_tool_start", "run_id": "tool", "name": "bid_history_qa", "data": {"input": "34106"}, "parent_ids": ["agent"]}
+        try:
+            await asyncio.sleep(60)
+        finally:
+            await asyncio.sleep(0.2)
+            self.unwound = True
+
+
+class DisconnectingResponse:
+    """Stream response whose client goes away after the first event."""
+
+    def __init__(self):
+        self.written = []
+
+    async def write(self, data: bytes):
+        if self.written:
+            raise ConnectionResetError("client disconnected")
+        self.written.append(data)
+
+
+class RecordingResponse:
+    def __init__(self):
+        self.written = []
+
+    async def write(self, data: bytes):
+        self.written.append(data.decode("utf-8"))
+
+
+def test_disconnect_releases_the_lock_after_the_run_has_unwound():
+    agent = SlowAgent()
+    session = SimpleNamespace(session_id="s", executor=agent, lock=Lock(), turns=0)
+
+    async def run():
+        with pytest.raises(ConnectionResetError):
+            await stream_agent(DisconnectingResponse(), session, "What are the bid points for 34106?", [])
+
+    asyncio.run(run())
+    assert session.lock.acquire(timeout=5)
+    assert agent.unwound
+    assert session.turns == 0
+
+
+def test_lock_is_held_until_the_done_event():
+    class FinishingAgent:
+        async def astream_events(self, inputs, config=None, version=None):
+            yield {"event": "on_chain_end", "run_id": "agent", "name": "AgentExecutor", "data": {"output": {"output": "1200 points"}}, "parent_ids": []}
+
+    session = SimpleNamespace(session_id="s", executor=FinishingAgent(), lock=Lock(), turns=0)
+    response = RecordingResponse()
+
+    def finish(output):
+        assert session.lock.locked()
+        return {"cached": False}
+
+    asyncio.run(stream_agent(response, session, "What are the bid points for 34106?", [], on_finish=finish))
+    assert not session.lock.locked()
+    assert session.turns == 1
+    assert response.written[-1].startswith("event: done")
@@ -0,0 +1,46 @@
+from langchain_core.embeddings import FakeEmbeddings
+from tools.cache_utils import write_manifest
+from tools.syllabus_loader.syllabus_index import MANIFEST_FILE, index_settings, scan_syllabi, stage_syllabi, sync_index
+
+
+def make_docs(tmp_path):
+    docs_dir = tmp_path / "syllabus"
+    docs_dir.mkdir()
+    (docs_dir / "34106_syllabus.pdf").write_bytes(b"%PDF investments")
+    (docs_dir / "30000_syllabus.pdf").write_bytes(b"%PDF accounting")
+    new_pdf = tmp_path / "35200_syllabus.pdf"
+    new_pdf.write_bytes(b"%PDF corporation finance")
+    return docs_dir, new_pdf
+
+
+def make_index(tmp_path, docs_dir, embeddings):
+    """A saved index whose manifest lists the PDFs currently in docs_dir."""
+    index_dir = tmp_path / "index"
+    index_dir.mkdir()
+    (index_dir / "index.faiss").write_bytes(b"")
+    files = {name: {"sha256": sha256, "chunk_ids": []} for name, sha256 in scan_syllabi(docs_dir).items()}
+    write_manifest(index_dir / MANIFEST_FILE, {"settings": index_settings(embeddings), "files": files})
+    return index_dir
+
+
+def test_dry_run_previews_changes_without_touching_the_pdfs(tmp_path):
+    docs_dir, new_pdf = make_docs(tmp_path)
+    embeddings = FakeEmbeddings(size=8)
+    index_dir = make_index(tmp_path, docs_dir, embeddings)
+    before = scan_syllabi(docs_dir)
+
+    files = stage_syllabi([new_pdf], ["34106"], docs_dir, dry_run=True)
+    store, report = sync_index(embeddings, docs_dir, index_dir, dry_run=True, files=files)
+
+    assert scan_syllabi(docs_dir) == before
+    assert store is None
+    assert report == {"added": ["35200_syllabus.pdf"], "changed": [], "removed": ["34106_syllabus.pdf"], "full_rebuild": False}
+
+
+def test_staging_copies_and_removes_pdfs(tmp_path):
+    docs_dir, new_pdf = make_docs(tmp_path)
+
+    files = stage_syllabi([new_pdf], ["34106"], docs_dir)
+
+    assert sorted(path.name for path in docs_dir.iterdir()) == ["30000_syllabus.pdf", "35200_syllabus.pdf"]
+    assert files == scan_syllabi(docs_dir)
@@ -0,0 +1,50 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListLLM
+from langchain_core.outputs import LLMResult
+from server.usage_tracker import UsageTracker
+from tools.single_flight import coalesce_tool
+from tools.tool_memo import build_memo, memoize_tool
+import tools.syllabus_loader.syllabus_tool as syllabus_tool
+
+
+class UsageReportingLLM(FakeListLLM):
+    """Fake completion model that reports token usage like the OpenAI one."""
+
+    def _generate(self, prompts, stop=None, run_manager=None, **kwargs):
+        result = super()._generate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+        return LLMResult(generations=result.generations,
+                         llm_output={"token_usage": {"prompt_tokens": 100, "completion_tokens": 20}})
+
+
+@pytest.fixture
+def fake_syllabus(monkeypatch):
+    chunks = [Document(page_content="Grades are 40% homework and 60% final.", metadata={"source": "34106_syllabus.pdf", "page": 0}),
+              Document(page_content="Office hours are on Tuesdays.", metadata={"source": "34106_syllabus.pdf", "page": 1})]
+    monkeypatch.setattr(syllabus_tool, "llm", UsageReportingLLM(responses=["Homework and a final [1].\nScore: 90"] * 10))
+    monkeypatch.setattr(syllabus_tool, "chain", syllabus_tool.initialize_qa_chain())
+    monkeypatch.setattr(syllabus_tool, "embeddings", object())
+    monkeypatch.setattr(syllabus_tool, "retrieve_chunks", lambda query, mode=None: chunks)
+
+
+@pytest.mark.parametrize("strategy", syllabus_tool.ANSWER_STRATEGIES)
+def test_syllabus_qa_usage_is_tracked(fake_syllabus, monkeypatch, strategy):
+    monkeypatch.setattr(syllabus_tool, "ANSWER_STRATEGY", strategy)
+    tracker = UsageTracker()
+
+    result = syllabus_tool.syllabus_qa.invoke({"query": "How is 34106 graded?"}, config={"callbacks": [tracker]})
+
+    assert result["Strategy"] == strategy
+    usage = tracker.summary()["by_tool"]["syllabus_qa"]
+    assert usage["llm_calls"] == (1 if strategy == "stuff" else 2)
+    assert usage["prompt_tokens"] > 0 and usage["completion_tokens"] > 0
+
+
+def test_syllabus_qa_usage_is_tracked_through_agent_wrappers(fake_syllabus):
+    tool = coalesce_tool(syllabus_tool.syllabus_qa)
+    tool = memoize_tool(tool, build_memo(tool))
+    tracker = UsageTracker()
+
+    tool.invoke({"query": "How is 34106 graded?"}, config={"callbacks": [tracker]})
+
+    assert tracker.summary()["by_tool"]["syllabus_qa"]["prompt_tokens"] > 0
@@ -0,0 +1,125 @@
+import pandas as pd
+from pathlib import Path
+import argparse
+import time
+from tools.cache_utils import BASE_DIR
+
+# Initialize file paths
+FILE_PATH = BASE_DIR / "data" / "bidding-history.csv"
+
+SEASONS = ("Winter", "Spring", "Summer", "Autumn")
+PRICE_COLUMNS = ("Phase 1 Price", "Phase 2 Price", "Phase 3 Price")
+
+
+def quarter_sort_key(quarter: str, year) -> tuple:
+    """Chronological sort key for a quarter and year (Winter is the first quarter of a year)."""
+    return (int(year), SEASONS.index(quarter) if quarter in SEASONS else len(SEASONS))
+
+
+class BidHistoryIndex:
+    """
+    Bid history of every course, grouped and sorted once when the data is loaded.
+
+    Maps each course number to its title and a list of (quarter label, phase prices)
+    tuples, newest quarter first. Like the original per-call groupby, each quarter
+    takes the first recorded value of every price column across its sections.
+    """
+
+    def __init__(self, courses: dict):
+        self.courses = courses
+
+    @classmethod
+    def from_dataframe(cls, data: pd.DataFrame):
+        """
+        Build the index from the bidding-history DataFrame.
+
+        Args:
+            data (pd.DataFrame): Contents of bidding-history.csv
+
+        Returns:
+            BidHistoryIndex: Index keyed by course number as a string
+        """
+        data = data.assign(Course_Number=data["Course_Number"].astype(str))
+        titles = data.groupby("Course_Number", sort=False)["Title"].first()
+        quarters = (data.groupby(["Course_Number", "Quarter", "Year"], sort=False)[list(PRICE_COLUMNS)]
+                    .first()
+                    .reset_index())
+
+        courses = {course_number: {"title": title, "quarters": []} for course_number, title in titles.items()}
+        for course_number, quarter, year, *prices in quarters.itertuples(index=False, name=None):
+            courses[course_number]["quarters"].append((quarter, int(year), tuple(prices)))
+
+        for history in courses.values():
+            history["quarters"].sort(key=lambda entry: quarter_sort_key(entry[0], entry[1]), reverse=True)
+            history["quarters"] = [(f"{quarter}-{year}", prices) for quarter, year, prices in history["quarters"]]
+        return cls(courses)
+
+    def get(self, course_number: str):
+        """Return the title and quarter rows of a course, or None if it has no bid history."""
+        return self.courses.get(str(course_number).strip())
+
+    def format(self, course_number: str):
+        """
+        Render the bid history of a course for the bidding agent.
+
+        Returns:
+            str: Formatted history, or None if the course has no bid history
+        """
+        history = self.get(course_number)
+        if history is None:
+            return None
+
+        lines = [f"Course: {course_number} - {history['title']}\n\nBid History by Quarter:\n"]
+        for label, (phase_1, phase_2, phase_3) in history["quarters"]:
+            lines.append(f"{label}:")
+            lines.append(f"  Phase 1: {phase_1} points")
+            lines.append(f"  Phase 2: {phase_2} points")
+            lines.append(f"  Phase 3: {phase_3} points" if phase_3 == phase_3 else "  Phase 3: No data")
+        return "\n".join(lines)
+
+
+def scan_bid_history(data: pd.DataFrame, course_number: str):
+    """The previous per-call lookup (full-column scan, groupby and iterrows), kept for the benchmark."""
+    filtered_data = data[data["Course_Number"].astype(str) == course_number].copy()
+    if filtered_data.empty:
+        return None
+    filtered_data['Quarter-Year'] = filtered_data['Quarter'] + '-' + filtered_data['Year'].astype(str)
+    simplified_data = (filtered_data[['Quarter-Year', *PRICE_COLUMNS]]
+                       .groupby('Quarter-Year')
+                       .first()
+                       .reset_index()
+                       .sort_values('Quarter-Year', ascending=False))
+    output = f"Course: {course_number} - {filtered_data.iloc[0]['Title']}\n\nBid History by Quarter:\n"
+    for _, row in simplified_data.iterrows():
+        output += f"\n{row['Quarter-Year']}:"
+        output += f"\n  Phase 1: {row['Phase 1 Price']} points"
+        output += f"\n  Phase 2: {row['Phase 2 Price']} points"
+        output += f"\n  Phase 3: {row['Phase 3 Price']} points" if not pd.isna(row['Phase 3 Price']) else "\n  Phase 3: No data"
+    return output
+
+
+def run_benchmark(file_path: Path, repeat: int = 3):
+    """Time a lookup of every course number in the file with the full-table scan and with the index."""
+    data = pd.read_csv(file_path)
+    course_numbers = data["Course_Number"].astype(str).unique().tolist()
+
+    start = time.perf_counter()
+    index = BidHistoryIndex.from_dataframe(data)
+    build_seconds = time.perf_counter() - start
+    print(f"Indexed {len(course_numbers)} courses from {len(data)} rows in {build_seconds * 1000:.1f} ms")
+
+    for name, lookup in (("scan", lambda course: scan_bid_history(data, course)), ("index", index.format)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for course_number in course_numbers:
+                lookup(course_number)
+        microseconds = (time.perf_counter() - start) * 1e6 / (repeat * len(course_numbers))
+        print(f"{name:<6} {microseconds:10.1f} us/lookup")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark bid history lookups')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over every course number')
+    args = parser.parse_args()
+
+    run_benchmark(FILE_PATH, args.repeat)
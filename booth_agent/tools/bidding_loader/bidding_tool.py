@@ -1,10 +1,13 @@
 import pandas as pd
+import re
 from langchain_core.tools import tool, Tool
 from pathlib import Path
 from langchain.agents import create_react_agent
 from langchain.agents import AgentExecutor
 from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
+from tools.bidding_loader.bid_history_index import BidHistoryIndex
+from tools.bidding_loader.bid_analytics import PROGRAMS, format_summary, load_bidding_data, load_or_build_analytics
+from tools.single_flight import CoalescingChatOpenAI
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -14,18 +17,29 @@ current_file = Path(__file__)
 BASE_DIR = current_file.parents[3]
 FILE_PATH = BASE_DIR / "data" / "bidding-history.csv"
 
+
 # Initialize bidding data at module level
 try:
-    bidding_data = pd.read_csv(FILE_PATH)
-    print(f"Successfully loaded bidding data from {FILE_PATH}")
+    bidding_data, loaded_path = load_bidding_data(FILE_PATH)
+    print(f"Successfully loaded bidding data from {loaded_path}")
     print(f"Total records: {len(bidding_data)}")
+
+    # Group and sort every course's history once instead of scanning the table per lookup
+    bid_history_index = BidHistoryIndex.from_dataframe(bidding_data)
+
+    # Statistics for every course and phase, recomputed only when the loaded file's data changes
+    bid_analytics = load_or_build_analytics(FILE_PATH, data=bidding_data, source_path=loaded_path)
 except FileNotFoundError:
     print(f"Warning: Bidding history file not found at {FILE_PATH}")
     print("Please run the bidding_history_loader.py script first")
     bidding_data = None
+    bid_history_index = None
+    bid_analytics = None
 except Exception as e:
     print(f"Error loading bidding data: {str(e)}")
     bidding_data = None
+    bid_history_index = None
+    bid_analytics = None
 
 
 @tool("bid_history_by_course_number")
@@ -39,40 +53,13 @@ def bid_history_by_course_number(course_number: str) -> str:
     Returns:
         Formatted string containing bid history details with quarter-year and prices for each phase.
     """
-    if bidding_data is None:
+    if bid_history_index is None:
         return "Error: Bidding data not initialized. Please ensure the bidding history CSV file exists and is properly formatted."
 
-    filtered_data = bidding_data[bidding_data["Course_Number"].astype(str) == course_number].copy()
-
-    if filtered_data.empty:
+    output = bid_history_index.format(course_number)
+    if output is None:
         return f"No bid history found for course {course_number}"
 
-    # Create quarter-year column
-    filtered_data['Quarter-Year'] = filtered_data['Quarter'] + '-' + filtered_data['Year'].astype(str)
-    
-    # Select only needed columns
-    columns_needed = ['Quarter-Year', 'Phase 1 Price', 'Phase 2 Price', 'Phase 3 Price']
-    
-    # Group by Quarter-Year and take the first section's data for each quarter
-    simplified_data = (filtered_data[columns_needed]
-                      .groupby('Quarter-Year')
-                      .first()
-                      .reset_index()
-                      .sort_values('Quarter-Year', ascending=False))
-    
-    # Get course info
-    course_info = filtered_data.iloc[0]
-    
-    # Create formatted output string
-    output = f"Course: {course_number} - {course_info['Title']}\n\nBid History by Quarter:\n"
-    
-    for _, row in simplified_data.iterrows():
-        output += f"\n{row['Quarter-Year']}:"
-        output += f"\n  Phase 1: {row['Phase 1 Price']} points"
-        output += f"\n  Phase 2: {row['Phase 2 Price']} points"
-        output += f"\n  Phase 3: {row['Phase 3 Price']} points" if not pd.isna(row['Phase 3 Price']) else "\n  Phase 3: No data"
-    
-    print(output)
     return output
 
 REACT_PROMPT = PromptTemplate.from_template(
@@ -122,7 +109,7 @@ REACT_PROMPT = PromptTemplate.from_template(
 tools = [bid_history_by_course_number]
 
 # Initialize the LLM
-llm = ChatOpenAI(model="gpt-4", temperature=0)
+llm = CoalescingChatOpenAI(model="gpt-4", temperature=0, stream_usage=True)
 
 # Create the ReAct agent using the imported prompt
 react_agent = create_react_agent(llm, tools, REACT_PROMPT)
@@ -134,6 +121,42 @@ agent_executor = AgentExecutor(
     handle_parsing_errors=True,
     verbose=True)
 
+# Open-ended questions that still need the bidding agent's reasoning
+STRATEGY_PATTERN = re.compile(
+    r"\b(should|recommend\w*|strateg\w*|advice|advise|worth|chances?|likely|odds|plan\w*|compare|versus|vs|safe)\b",
+    re.IGNORECASE
+)
+
+# Questions about the Evening, Weekend or Executive MBA sections rather than the daytime ones
+EVENING_WEEKEND_PATTERN = re.compile(r"\b(evening|weekend|part[- ]time|emba|executive)\b", re.IGNORECASE)
+
+
+def answer_directly(query: str):
+    """
+    Summarise the bid history of the courses a query names, without an LLM call.
+
+    Returns:
+        dict: Structured summaries and their report, or None if the query names no
+              course number, asks an open-ended strategy question, or no named course
+              has bid history
+    """
+    if bid_analytics is None or STRATEGY_PATTERN.search(query):
+        return None
+
+    course_numbers = list(dict.fromkeys(re.findall(r"\b(\d{5})\b", query)))
+    program = PROGRAMS[1] if EVENING_WEEKEND_PATTERN.search(query) else None
+    summaries = [summary for summary in (bid_analytics.summarize(course_number, program) for course_number in course_numbers)
+                 if summary is not None]
+    if not summaries:
+        return None
+
+    missing = [course_number for course_number in course_numbers if course_number not in {summary["course"] for summary in summaries}]
+    output = "\n\n".join(format_summary(summary) for summary in summaries)
+    if missing:
+        output += "\n\nNo bid history found for course " + ", ".join(missing)
+    return {"input": query, "output": output, "summaries": summaries}
+
+
 @tool("bid_history_qa")
 def bid_history_qa(query: str) -> dict:
     """
@@ -145,6 +168,11 @@ def bid_history_qa(query: str) -> dict:
     Returns:
         Detailed analysis of bid history and recommendations
     """
+    # Bid summaries for named courses are computed directly; only strategy questions need the agent
+    result = answer_directly(query)
+    if result is not None:
+        return result
+
     result = agent_executor.invoke({"input": query})
     return result
     #return result["output"] if isinstance(result, dict) and "output" in result else result
@@ -0,0 +1,97 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import time
+
+# Project root and the directory that holds generated indexes and caches
+BASE_DIR = Path(__file__).parents[2]
+CACHE_DIR = BASE_DIR / ".cache"
+DATA_DIR = BASE_DIR / "data"
+
+
+def file_sha256(path, block_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hex digest of a file's contents.
+
+    Args:
+        path: Path of the file to hash
+        block_size (int): Number of bytes read per iteration
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def files_fingerprint(paths) -> str:
+    """
+    Fingerprint files by their paths, sizes and modification times, without reading them.
+
+    Directories are walked recursively, so adding, removing, replacing or editing any
+    file under them changes the fingerprint.
+
+    Args:
+        paths: Files or directories
+
+    Returns:
+        str: SHA-256 hex digest of the file listing
+    """
+    digest = hashlib.sha256()
+    for path in sorted(Path(path) for path in paths):
+        files = sorted(file for file in path.rglob("*") if file.is_file()) if path.is_dir() else [path]
+        for file in files:
+            try:
+                stat = file.stat()
+                digest.update(f"{file}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+            except FileNotFoundError:
+                digest.update(f"{file}\0missing\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class DataVersion:
+    """
+    Fingerprint of a set of data files that is recomputed at most every check_seconds,
+    so caches can compare it on every lookup without walking the files each time.
+    """
+
+    def __init__(self, paths, check_seconds: float = 5):
+        self.paths = list(paths)
+        self.check_seconds = check_seconds
+        self.value = None
+        self._checked = 0.0
+
+    def current(self) -> str:
+        """The fingerprint of the files, recomputed if the last check is too old."""
+        now = time.time()
+        if self.value is None or now - self._checked > self.check_seconds:
+            self.value = files_fingerprint(self.paths)
+            self._checked = now
+        return self.value
+
+
+def read_manifest(path) -> dict:
+    """
+    Read a JSON manifest, returning an empty dict if it is missing or unreadable.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_manifest(path, manifest: dict):
+    """
+    Atomically write a JSON manifest so a crash never leaves a half-written file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
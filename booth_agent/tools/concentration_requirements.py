@@ -1,13 +1,17 @@
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
+import numpy as np
+import re
+from tools.degree_requirements import COURSE_PATTERN, degree_ruleset, parse_course_list
+from tools.course_csv_loaders.course_name_finder import COURSE_MAPPING
+from tools.single_flight import CoalescingChatOpenAI
 
 # Load environment variables
 load_dotenv()
 
 # Initialize the language model
-llm = ChatOpenAI(
+llm = CoalescingChatOpenAI(
     temperature=0,
     model="gpt-4o-mini"
 )
@@ -75,6 +79,421 @@ Operations Management
 300 credit units chosen from: Business 36106, 36109, 40000, 40101, 40108, 40110, 40111, 40206 (or 40205), 40721, 40810, and 40811.
 """
 
+# Every course counts for 100 credit units
+COURSE_UNITS = 100
+
+# Concentrations whose rules are not fully expressed as course lists
+APPROXIMATE_NOTES = {
+    "General Management": "Evaluated approximately: the eight Functions, Leadership and Management, and Business "
+                          "Environment lines are taken to be the eight breadth categories of the degree requirements, "
+                          "and strategic management courses to be those numbered 42xxx.",
+}
+
+
+def split_sentences(line: str) -> list:
+    """Split a requirement line into sentences without breaking course lists."""
+    return [sentence.strip() for sentence in re.split(r"(?<=\.)\s+(?=[A-Z0-9])", line) if sentence.strip()]
+
+
+def course_area(course: str) -> str:
+    """Department area of a course for per-area caps (the first two digits, e.g. 41 for statistics)."""
+    digits = re.search(r"\d{5}", course)
+    return digits.group(0)[:2] if digits else course
+
+
+def parse_concentrations(text: str) -> dict:
+    """
+    Parse CONCENTRATION_REQUIREMENTS into concentration rules.
+
+    Each concentration has a total number of units and a list of buckets. A bucket is a
+    set of courses with an optional minimum and maximum number of units and an optional
+    per-area cap. Sentences are classified by their wording ("100 units in ...", "An
+    additional 300 units ...", "Up to 100 credit units ...", "No more than 200 units ...
+    from each area", "must also satisfy the finance requirements", ...); notes such as
+    "cannot take both 37200 and 37201" become exclusive course groups.
+
+    Returns:
+        dict: Concentration name -> rule dict
+    """
+    lines = [line.strip() for line in text.splitlines()]
+    concentrations, current = {}, None
+    for index, line in enumerate(lines):
+        if not line or line.startswith("*") or line.startswith("For more") or line.startswith("Chicago Booth"):
+            continue
+        following = next((next_line for next_line in lines[index + 1:] if next_line), "")
+        if not re.search(r"\d", line) and not line.startswith(("Note", "-")) and re.search(r"\d|complete", following):
+            current = {"name": line, "total": 0, "extra": 0, "buckets": [], "requires": [], "exclusive": [],
+                       "notes": [], "excluded": set(), "couplings": {}}
+            concentrations[line] = current
+            continue
+        if current is None:
+            continue
+
+        if line.startswith("Note:"):
+            for sentence in split_sentences(line[len("Note:"):]):
+                exclusive = re.search(r"cannot take both (\d{5}) and (\d{5})", sentence)
+                if exclusive:
+                    current["exclusive"].append(set(exclusive.groups()))
+                current["notes"].append(sentence)
+            continue
+
+        label = re.match(r"-\s*([^:]+):\s*(.*)$", line)
+        for sentence in ([label.group(2)] if label else split_sentences(line)):
+            options, couplings = parse_course_list(sentence)
+            current["couplings"].update(couplings)
+            bucket = None
+            if re.search(r"do not qualify", sentence):
+                current["excluded"] |= set(options)
+                continue
+            requires = re.search(r"must also satisfy the (\w+) requirements", sentence)
+            if requires:
+                current["requires"].append(requires.group(1).capitalize())
+                continue
+            cap = re.search(r"No more than (\d+) units .* from each area", sentence)
+            if cap:
+                current["buckets"][-1]["area_cap"] = int(cap.group(1))
+                continue
+
+            required_first = re.match(r"Business (\d{5}) \(or (\d{5})\) and at least (\d+) credit units from", sentence)
+            if required_first:
+                current["buckets"].append({"name": "required", "courses": list(required_first.group(1, 2)), "min": COURSE_UNITS})
+                bucket = {"min": int(required_first.group(3))}
+                options, _ = parse_course_list(sentence.split("from", 1)[1])
+            elif re.match(r"(\d+) credit units\.?$", sentence):
+                current["total"] = int(re.match(r"(\d+)", sentence).group(1))
+                continue
+            elif re.match(r"(\d+) credit units (chosen )?from", sentence):
+                current["total"] = int(re.match(r"(\d+)", sentence).group(1))
+                bucket = {} if options else None
+            elif re.match(r"(\d+) (credit )?units in ([^:]+):", sentence):
+                match = re.match(r"(\d+) (credit )?units in ([^:]+):", sentence)
+                bucket = {"name": match.group(3).strip(), "min": int(match.group(1))}
+            elif re.match(r"An additional (\d+) units", sentence):
+                current["extra"] += int(re.match(r"An additional (\d+)", sentence).group(1))
+                bucket = {"name": "additional"}
+            elif re.match(r"At least (\d+) .*from", sentence):
+                bucket = {"name": "core", "min": int(re.match(r"At least (\d+)", sentence).group(1))}
+            elif re.match(r"(\d+)-(\d+) credit units from", sentence):
+                low, high = re.match(r"(\d+)-(\d+)", sentence).groups()
+                bucket = {"min": int(low), "max": int(high)}
+            elif re.match(r"Up to (\d+) credit units", sentence):
+                bucket = {"name": "experiential", "max": int(re.match(r"Up to (\d+)", sentence).group(1))}
+            elif re.match(r"At least one must be", sentence):
+                bucket = {"name": "at least one of", "min": COURSE_UNITS}
+            elif label and options:
+                bucket = {"name": label.group(1).strip()}
+            elif options:
+                bucket = {}
+
+            if bucket is not None and options:
+                bucket.setdefault("name", "courses")
+                bucket["courses"] = list(dict.fromkeys(options))
+                current["buckets"].append(bucket)
+
+    for rule in concentrations.values():
+        if not rule["total"]:
+            rule["total"] = sum(bucket.get("min", 0) for bucket in rule["buckets"]) + rule["extra"]
+        for bucket in rule["buckets"]:
+            bucket["courses"] = [course for course in bucket["courses"] if course not in rule["excluded"]]
+            bucket.setdefault("min", 0)
+            bucket.setdefault("max", None)
+            bucket.setdefault("area_cap", None)
+    return concentrations
+
+
+def general_management_rule(concentrations: dict) -> dict:
+    """
+    Approximate General Management: the eight degree breadth categories (800 units) plus
+    300 units of strategic management (42xxx) or behavioral science courses.
+    """
+    rule = concentrations["General Management"]
+    breadth = next(group for group in degree_ruleset.groups if group["name"] == "Breadth")
+    for category in breadth["categories"]:
+        rule["buckets"].append({"name": category["name"], "courses": category["courses"], "min": COURSE_UNITS, "max": COURSE_UNITS, "area_cap": None})
+    strategy_courses = sorted(course for course in COURSE_MAPPING if course.startswith("42"))
+    behavioral_courses = [course for bucket in concentrations["Behavioral Science"]["buckets"] for course in bucket["courses"]]
+    rule["buckets"].append({"name": "strategic management or behavioral science", "courses": list(dict.fromkeys(strategy_courses + behavioral_courses)),
+                            "min": 300, "max": None, "area_cap": None})
+    rule["total"] = 1100
+    rule["notes"].append(APPROXIMATE_NOTES["General Management"])
+    rule["approximate"] = True
+    return rule
+
+
+class ConcentrationEvaluator:
+    """
+    All concentrations compiled into course-index vectors.
+
+    Every course in any concentration gets a column. Within each concentration the
+    courses are partitioned into cells: courses with the same bucket memberships and the
+    same area. A 0/1 course x cell matrix then turns a transcript vector (or a matrix
+    of many transcripts) into per-cell course counts for every concentration in one
+    product. Allocating those counts to buckets (minimums first, then up to the bucket
+    maximums, area caps and the concentration total) works on a handful of cells per
+    concentration, not on individual courses.
+    """
+
+    def __init__(self, concentrations: dict, exclusive: list, couplings: dict):
+        self.concentrations = concentrations
+        self.exclusive = exclusive
+        self.couplings = couplings
+        self.names = list(concentrations)
+
+        self.courses = sorted({course for rule in concentrations.values() for bucket in rule["buckets"] for course in bucket["courses"]})
+        self.columns = {course: column for column, course in enumerate(self.courses)}
+
+        cells = []
+        self.cells_by_concentration = {}
+        for name, rule in concentrations.items():
+            signatures = {}
+            for course in dict.fromkeys(course for bucket in rule["buckets"] for course in bucket["courses"]):
+                memberships = tuple(position for position, bucket in enumerate(rule["buckets"]) if course in bucket["courses"])
+                signatures.setdefault((memberships, course_area(course)), []).append(course)
+            self.cells_by_concentration[name] = []
+            for (memberships, area), courses in signatures.items():
+                self.cells_by_concentration[name].append({"column": len(cells), "buckets": memberships, "area": area, "courses": courses})
+                cells.append(courses)
+
+        # Cells that can fill each bucket, those shared with fewer other buckets first
+        self.bucket_cells = {
+            name: [sorted((cell for cell in self.cells_by_concentration[name] if position in cell["buckets"]), key=lambda cell: len(cell["buckets"]))
+                   for position in range(len(rule["buckets"]))]
+            for name, rule in concentrations.items()
+        }
+
+        self.cell_matrix = np.zeros((len(self.courses), len(cells)), dtype=np.int32)
+        for column, courses in enumerate(cells):
+            for course in courses:
+                self.cell_matrix[self.columns[course], column] = 1
+
+    def transcript_vector(self, courses) -> np.ndarray:
+        """
+        0/1 vector of the countable courses in a transcript.
+
+        Coupled courses count only with their partner (33251 with 33250), and only the
+        first course of an exclusive group (37200 or 37201) counts.
+        """
+        courses = list(dict.fromkeys(courses))
+        taken = set(courses)
+        vector = np.zeros(len(self.courses), dtype=np.int32)
+        for course in courses:
+            if course not in self.columns or not self.couplings.get(course, set()) <= taken:
+                continue
+            group = next((group for group in self.exclusive if course in group), None)
+            if group and any(vector[self.columns[other]] for other in group if other != course and other in self.columns):
+                continue
+            vector[self.columns[course]] = 1
+        return vector
+
+    def allocate(self, name: str, cell_counts) -> dict:
+        """
+        Allocate counted courses to one concentration's buckets.
+
+        Returns:
+            dict: Units counted, units still needed, unmet bucket minimums, the cells whose
+                  courses a bucket maximum or area cap kept from counting, and completion
+        """
+        rule = self.concentrations[name]
+        remaining = {cell["column"]: int(cell_counts[cell["column"]]) for cell in self.cells_by_concentration[name]}
+        bucket_units = [0] * len(rule["buckets"])
+        area_units = {}
+
+        def take(position: int, limit: int) -> int:
+            bucket = rule["buckets"][position]
+            taken = 0
+            for cell in self.bucket_cells[name][position]:
+                while remaining[cell["column"]] and taken < limit:
+                    if bucket["max"] is not None and bucket_units[position] + COURSE_UNITS > bucket["max"]:
+                        return taken
+                    if bucket["area_cap"] is not None and area_units.get((position, cell["area"]), 0) + COURSE_UNITS > bucket["area_cap"]:
+                        break
+                    remaining[cell["column"]] -= 1
+                    bucket_units[position] += COURSE_UNITS
+                    area_units[(position, cell["area"])] = area_units.get((position, cell["area"]), 0) + COURSE_UNITS
+                    taken += COURSE_UNITS
+            return taken
+
+        for position, bucket in enumerate(rule["buckets"]):
+            if bucket["min"]:
+                take(position, bucket["min"])
+        for position in range(len(rule["buckets"])):
+            take(position, max(rule["total"] - sum(bucket_units), 0))
+
+        # Courses left over because every bucket they belong to is at its maximum or area cap
+        capped = []
+        for cell in self.cells_by_concentration[name]:
+            if not remaining[cell["column"]]:
+                continue
+            caps = []
+            for position in cell["buckets"]:
+                bucket = rule["buckets"][position]
+                if bucket["max"] is not None and bucket_units[position] + COURSE_UNITS > bucket["max"]:
+                    caps.append(f"{bucket['name']} counts at most {bucket['max']} units")
+                elif bucket["area_cap"] is not None and area_units.get((position, cell["area"]), 0) + COURSE_UNITS > bucket["area_cap"]:
+                    caps.append(f"{bucket['name']} counts at most {bucket['area_cap']} units per area")
+            if len(caps) == len(cell["buckets"]):
+                capped.append({"column": cell["column"], "count": remaining[cell["column"]], "cap": "; ".join(caps)})
+
+        counted = min(sum(bucket_units), rule["total"])
+        unmet = {bucket["name"]: bucket["min"] - bucket_units[position] for position, bucket in enumerate(rule["buckets"]) if bucket_units[position] < bucket["min"]}
+        needed = max(rule["total"] - counted, sum(unmet.values()))
+        return {"units": counted, "total": rule["total"], "remaining": needed, "unmet": unmet, "capped": capped, "complete": needed == 0}
+
+    def evaluate_many(self, transcripts: list, names: list = None) -> list:
+        """
+        Evaluate many transcripts against every concentration.
+
+        Args:
+            transcripts (list): Lists of course numbers
+            names (list): Only evaluate these concentrations (and the ones they require)
+
+        Returns:
+            list: For each transcript, a dict of concentration name -> allocate() result
+                  sorted from most to least complete
+        """
+        vectors = np.stack([self.transcript_vector(courses) for courses in transcripts]) if transcripts else np.zeros((0, len(self.courses)), dtype=np.int32)
+        cell_counts = vectors @ self.cell_matrix
+        names = self.names if names is None else self.with_required(names)
+
+        results = []
+        for row in range(len(transcripts)):
+            evaluation = {name: self.allocate(name, cell_counts[row]) for name in names}
+            for name in names:
+                evaluation[name]["capped"] = self.capped_courses(name, evaluation[name]["capped"], transcripts[row])
+                rule = self.concentrations[name]
+                for required in rule["requires"]:
+                    if not evaluation[required]["complete"]:
+                        evaluation[name]["complete"] = False
+                        evaluation[name]["unmet"][f"{required} concentration"] = evaluation[required]["remaining"] or COURSE_UNITS
+                evaluation[name]["approximate"] = rule.get("approximate", False)
+            results.append(dict(sorted(evaluation.items(), key=lambda item: (item[1]["remaining"], item[0]))))
+        return results
+
+    def capped_courses(self, name: str, capped: list, courses) -> dict:
+        """
+        Name the transcript courses behind allocate()'s capped cells.
+
+        A cell's courses are interchangeable, so the ones listed last in the transcript
+        are reported as the ones that do not count.
+
+        Returns:
+            dict: Cap description -> courses it keeps from counting
+        """
+        cells = {cell["column"]: cell for cell in self.cells_by_concentration[name]}
+        blocked = {}
+        for entry in capped:
+            taken = [course for course in dict.fromkeys(courses) if course in cells[entry["column"]]["courses"]]
+            blocked.setdefault(entry["cap"], []).extend(taken[-entry["count"]:])
+        return blocked
+
+    def evaluate(self, courses, names: list = None) -> dict:
+        """Evaluate one transcript against every concentration (or the named ones)."""
+        return self.evaluate_many([courses], names)[0]
+
+    def with_required(self, names: list) -> list:
+        """The named concentrations followed by the concentrations they require."""
+        names = list(dict.fromkeys(names))
+        for name in names:
+            names.extend(required for required in self.concentrations[name]["requires"] if required not in names)
+        return names
+
+    def format_evaluation(self, evaluation: dict, limit: int = None) -> str:
+        """Render an evaluate() result, closest concentrations first."""
+        lines = []
+        for name, result in list(evaluation.items())[:limit]:
+            line = f"{name}: {result['total']} units required, {result['units']} counted after caps"
+            if result["complete"]:
+                line += ", complete"
+            elif result["unmet"]:
+                minimums = ", ".join(f"{bucket} ({units} units)" for bucket, units in result["unmet"].items())
+                if result["units"] >= result["total"]:
+                    line += ", total reached but minimums unmet"
+                line += f", {result['remaining']} more units needed" + (" in: " if sum(result["unmet"].values()) == result["remaining"] else ", including: ") + minimums
+            else:
+                line += f", {result['remaining']} more units needed"
+            for cap, courses in result["capped"].items():
+                line += f"; not counted: {', '.join(courses)} ({cap})"
+            if result["approximate"]:
+                line += " (approximate)"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def format_rule(self, name: str) -> str:
+        """List a concentration's buckets and notes."""
+        rule = self.concentrations[name]
+        lines = [f"{name}: {rule['total']} credit units"]
+        for bucket in rule["buckets"]:
+            limits = []
+            if bucket["min"]:
+                limits.append(f"at least {bucket['min']} units")
+            if bucket["max"] is not None:
+                limits.append(f"at most {bucket['max']} units")
+            if bucket["area_cap"] is not None:
+                limits.append(f"at most {bucket['area_cap']} units per area")
+            lines.append(f"  {bucket['name']}" + (f" ({', '.join(limits)})" if limits else "") + f": {', '.join(bucket['courses'])}")
+        for required in rule["requires"]:
+            lines.append(f"  Requires completing the {required} concentration")
+        for note in rule["notes"]:
+            lines.append(f"  Note: {note}")
+        return "\n".join(lines)
+
+    def answer(self, question: str):
+        """
+        Answer evaluation, membership and listing questions deterministically.
+
+        Returns:
+            str: The answer, or None if the question needs the LLM
+        """
+        lowered = question.lower()
+        courses = COURSE_PATTERN.findall(question)
+        named = [name for name in self.names if re.search(r"\b" + re.escape(name.lower()) + r"\b", lowered)]
+        if re.search(r"\b(recommend\w*|should|best|easiest|prefer\w*|why)\b", lowered):
+            return None
+
+        if courses and re.search(r"\b(taken|took|completed|finished|closest|close|progress|remaining|left|evaluate|audit)\b", lowered):
+            transcripts = [COURSE_PATTERN.findall(line) for line in question.splitlines()]
+            transcripts = [transcript for transcript in transcripts if transcript]
+            evaluations = self.evaluate_many(transcripts)
+            if named:
+                evaluations = [{name: evaluation[name] for name in evaluation if name in named} for evaluation in evaluations]
+            limit = 5 if re.search(r"\bclos", lowered) or len(transcripts) > 1 else None
+            if len(transcripts) == 1:
+                return self.format_evaluation(evaluations[0], limit)
+            return "\n\n".join(f"Transcript {number}: {', '.join(transcript)}\n{self.format_evaluation(evaluation, limit)}"
+                               for number, (transcript, evaluation) in enumerate(zip(transcripts, evaluations), start=1))
+
+        if courses and re.search(r"\b(count|fulfil\w*|satisf\w*|qualif\w*|towards?|which concentrations?)\b", lowered):
+            lines = []
+            for course in courses:
+                matches = [
+                    f"{name} ({', '.join(bucket['name'] for bucket in rule['buckets'] if course in bucket['courses'])})"
+                    for name, rule in self.concentrations.items()
+                    if (not named or name in named) and any(course in bucket["courses"] for bucket in rule["buckets"])
+                ]
+                missing = [name for name in named if not any(course in bucket["courses"] for bucket in self.concentrations[name]["buckets"])]
+                line = f"{course} counts towards: {', '.join(matches)}" if matches else f"{course} does not count towards {' or '.join(named) or 'any concentration'}"
+                if matches and missing:
+                    line += f"; it does not count towards {' or '.join(missing)}"
+                lines.append(line)
+            return "\n".join(lines)
+
+        if len(named) > 1 and not courses and re.search(r"\bboth\b", lowered):
+            shared = set.intersection(*({course for bucket in self.concentrations[name]["buckets"] for course in bucket["courses"]} for name in named))
+            return f"Courses counting towards {' and '.join(named)}: {', '.join(sorted(shared)) or 'none'}"
+        if named and not courses:
+            return "\n\n".join(self.format_rule(name) for name in named)
+        return None
+
+
+# Compile the concentrations once
+concentration_rules = parse_concentrations(CONCENTRATION_REQUIREMENTS)
+general_management_rule(concentration_rules)
+concentration_evaluator = ConcentrationEvaluator(
+    concentration_rules,
+    exclusive=[group for rule in concentration_rules.values() for group in rule["exclusive"]],
+    couplings={course: partners for rule in concentration_rules.values() for course, partners in rule["couplings"].items()}
+)
+
 # Create the prompt template
 CONCENTRATION_PROMPT = PromptTemplate.from_template(
     """You are a concentration requirements assistant for the Booth School of Business MBA program.
@@ -96,7 +515,13 @@ CONCENTRATION_PROMPT = PromptTemplate.from_template(
 def concentration_requirements_checker(text: str):
     """
     A tool for students at the Booth School of Business to determine what courses fulfill concentration requirements.
+    It also reports progress towards every concentration for a list of courses taken (one transcript per line).
     """
+    # Progress, membership and listing questions are answered from the compiled rules without the LLM
+    answer = concentration_evaluator.answer(text)
+    if answer is not None:
+        return answer
+
     try:
         # Generate the prompt with the student's query
         prompt = CONCENTRATION_PROMPT.format(
@@ -0,0 +1,350 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date
+import csv
+import re
+from tools.course_csv_loaders.course_csv_loader_utils import DAYS, parse_clock, parse_schedule
+
+SEASONS = ("Winter", "Spring", "Summer", "Autumn")
+
+# Start-time windows (minutes after midnight) for time-of-day words
+TIME_OF_DAY = {
+    "morning": (0, 12 * 60 - 1),
+    "afternoon": (12 * 60, 17 * 60 - 1),
+    "evening": (17 * 60, 24 * 60 - 1),
+    "night": (17 * 60, 24 * 60 - 1)
+}
+
+# Questions asking for explanations, opinions or advice still go to the LLM
+FREE_TEXT_PATTERN = re.compile(
+    r"\b(why|how|recommend\w*|should|best|compare|difference|describe|about|prerequisites?|learn|cover\w*|content|good|easy|hard|similar)\b",
+    re.IGNORECASE
+)
+
+# Constraints parse_question() cannot apply, each paired with the filter that does apply it
+# when one was parsed ("at least 30 seats" is a capacity filter, "taught by Nagel" a faculty
+# filter). A question with any other such constraint goes to the LLM, rather than being
+# answered with every section that matches the rest of the question.
+QUALIFIER_PATTERNS = (
+    (re.compile(r"\b(seats?|spots?|openings?|space|wait ?list\w*|full|enroll\w*)\b"), "min_capacity"),
+    (re.compile(r"\b(taught|teach\w*|instructed|led)\s+by\b|\bwith\s+(?:professor|prof|instructor)\b"), "faculty"),
+    (re.compile(r"\b(prereq\w*|requirements?|required|concentrations?|credits?|units?|waive\w*|pass/fail)\b"), None),
+    (re.compile(r"\b(bids?|bidding|points?|price|cost)\b"), None),
+    (re.compile(r"\b(online|remote|virtual|in[- ]person|hybrid|zoom)\b"), None),
+    (re.compile(r"\b(exams?|finals?|midterms?|grad(?:e|es|ing)|workload|ratings?|reviews?)\b"), None),
+    (re.compile(r"\b(not|except|excluding|without|other than|besides)\b|n't\b"), None)
+)
+
+# Sections listed in a deterministic answer before the rest are summarised
+MAX_LISTED_SECTIONS = 30
+
+
+def quarter_sort_key(quarter: str) -> tuple:
+    """Chronological sort key for quarters such as "Spring 2025"."""
+    season, _, year = quarter.partition(" ")
+    return (int(year) if year.isdigit() else 0, SEASONS.index(season) if season in SEASONS else len(SEASONS))
+
+
+def current_quarter_key(today: date = None) -> tuple:
+    """quarter_sort_key() of the quarter a date falls in (Winter is January to March)."""
+    today = today or date.today()
+    return (today.year, (today.month - 1) // 3)
+
+
+def normalize_words(text: str) -> tuple:
+    """Lower-case the text and split it into words, ignoring punctuation."""
+    return tuple(re.findall(r"[a-z0-9&']+", text.lower()))
+
+
+class PhraseIndex:
+    """
+    Exact multi-word phrase lookup (titles, faculty names) by hashing word n-grams.
+
+    Matching a question costs one dictionary probe per n-gram instead of one regex
+    per phrase.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = {}
+        for phrase in phrases:
+            words = normalize_words(phrase)
+            if words:
+                self.phrases.setdefault(words, phrase)
+        self.max_words = max((len(words) for words in self.phrases), default=0)
+
+    def find(self, text: str) -> list:
+        """
+        Find the phrases that occur in the text as whole words, ignoring any phrase
+        that only occurs inside a longer matched phrase (e.g. "Investments" inside
+        "Advanced Investments").
+        """
+        words = normalize_words(text)
+        matches = [
+            (start, start + length, self.phrases[words[start:start + length]])
+            for start in range(len(words))
+            for length in range(1, min(self.max_words, len(words) - start) + 1)
+            if words[start:start + length] in self.phrases
+        ]
+        return sorted({
+            phrase for start, end, phrase in matches
+            if not any(other_start <= start and end <= other_end and (other_end - other_start) > (end - start)
+                       for other_start, other_end, _ in matches)
+        })
+
+
+class CourseCatalog:
+    """
+    Column-oriented, in-memory copy of all-course-list.csv with secondary indexes.
+
+    Each column is a plain list indexed by row id. Quarter, Course, Faculty, day,
+    Building and Title map to sets of row ids, and meeting start times are kept
+    sorted for range queries, so structured questions are answered with a few set
+    intersections instead of a vector search and an LLM completion.
+    """
+
+    COLUMNS = ("Quarter", "Title", "Course", "Section", "Program", "Faculty", "Schedule", "Capacity", "Building", "Location")
+
+    def __init__(self, rows: list):
+        self.columns = {name: [(row.get(name) or "").strip() for row in rows] for name in self.COLUMNS}
+        self.size = len(rows)
+
+        # Derived columns
+        self.meetings = [parse_schedule(schedule) for schedule in self.columns["Schedule"]]
+        self.enrolled, self.capacity = [], []
+        for capacity in self.columns["Capacity"]:
+            enrolled, _, maximum = capacity.partition("/")
+            self.enrolled.append(int(enrolled) if enrolled.isdigit() else None)
+            self.capacity.append(int(maximum) if maximum.isdigit() else None)
+
+        # Secondary indexes
+        self.by_quarter = defaultdict(set)
+        self.by_course = defaultdict(set)
+        self.by_title = defaultdict(set)
+        self.by_faculty = defaultdict(set)
+        self.by_last_name = defaultdict(set)
+        self.by_day = defaultdict(set)
+        self.by_building = defaultdict(set)
+        starts = []
+
+        for row in range(self.size):
+            self.by_quarter[self.columns["Quarter"][row]].add(row)
+            self.by_course[self.columns["Course"][row]].add(row)
+            self.by_title[self.columns["Title"][row].lower()].add(row)
+            self.by_building[self.columns["Building"][row].lower()].add(row)
+            for name in re.split(r",| and ", self.columns["Faculty"][row]):
+                name = name.strip()
+                if name:
+                    self.by_faculty[name.lower()].add(row)
+                    self.by_last_name[name.split()[-1]].add(row)
+            for day, start, _ in self.meetings[row]:
+                self.by_day[day].add(row)
+                starts.append((start, row))
+
+        self.title_phrases = PhraseIndex(self.by_title)
+        self.faculty_phrases = PhraseIndex(self.by_faculty)
+
+        starts.sort()
+        self.start_minutes = [start for start, _ in starts]
+        self.start_rows = [row for _, row in starts]
+
+    @classmethod
+    def from_csv(cls, csv_file):
+        """Load the catalog from all-course-list.csv."""
+        with open(csv_file, mode="r", encoding="utf-8-sig") as file:
+            return cls(list(csv.DictReader(file)))
+
+    def filter(self, quarters=None, courses=None, faculty=None, days=None, buildings=None,
+               start_after=None, start_before=None, end_before=None, min_capacity=None) -> list:
+        """
+        Find the sections matching every given filter.
+
+        Filters that take several values match any of them; different filters are combined.
+
+        Args:
+            quarters: Quarters such as "Spring 2025"
+            courses: Course numbers
+            faculty: Lower-cased faculty names
+            days: Day names such as "Monday"
+            buildings: Lower-cased building names
+            start_after (int): Earliest meeting start, in minutes after midnight
+            start_before (int): Latest meeting start, in minutes after midnight
+            end_before (int): Latest meeting end, in minutes after midnight
+            min_capacity (int): Minimum section capacity
+
+        Returns:
+            list: Matching row ids, sorted by quarter, course and section
+        """
+        candidates = None
+        for index, keys in ((self.by_quarter, quarters), (self.by_course, courses), (self.by_faculty, faculty),
+                            (self.by_day, days), (self.by_building, buildings)):
+            if keys:
+                rows = set().union(*(index.get(key, set()) for key in keys))
+                candidates = rows if candidates is None else candidates & rows
+
+        if start_after is not None or start_before is not None:
+            low = bisect_left(self.start_minutes, start_after if start_after is not None else 0)
+            high = bisect_right(self.start_minutes, start_before if start_before is not None else 24 * 60)
+            rows = set(self.start_rows[low:high])
+            candidates = rows if candidates is None else candidates & rows
+
+        if candidates is None:
+            candidates = set(range(self.size))
+
+        if days or start_after is not None or start_before is not None or end_before is not None:
+            # The day and time constraints must hold for the same meeting
+            candidates = {
+                row for row in candidates
+                if any(
+                    (not days or day in days)
+                    and (start_after is None or start >= start_after)
+                    and (start_before is None or start <= start_before)
+                    and (end_before is None or end <= end_before)
+                    for day, start, end in self.meetings[row]
+                )
+            }
+
+        if min_capacity is not None:
+            candidates = {row for row in candidates if (self.capacity[row] or 0) >= min_capacity}
+
+        return sorted(candidates, key=lambda row: (
+            quarter_sort_key(self.columns["Quarter"][row]),
+            self.columns["Course"][row],
+            int(self.columns["Section"][row]) if self.columns["Section"][row].isdigit() else 0
+        ))
+
+    def parse_question(self, question: str) -> dict:
+        """
+        Extract structured filters from a natural-language question.
+
+        Returns:
+            dict: Keyword arguments for filter(); empty if nothing structured was found
+        """
+        filters = {}
+        lowered = question.lower()
+
+        # Quarters, with or without a year ("Spring 2025", "fall", "winter quarter")
+        quarters = set()
+        for season, year in re.findall(r"\b(autumn|fall|winter|spring|summer)(?:\s+(?:quarter\s+)?(\d{4}))?\b", lowered):
+            season = "Autumn" if season == "fall" else season.capitalize()
+            quarters |= {quarter for quarter in self.by_quarter if quarter.startswith(season) and (not year or quarter.endswith(year))}
+        if quarters:
+            filters["quarters"] = quarters
+
+        # Course numbers and exact catalog titles
+        courses = set(re.findall(r"\b(\d{5})\b", question))
+        for title in self.title_phrases.find(question):
+            courses |= {self.columns["Course"][row] for row in self.by_title[title]}
+        if courses:
+            filters["courses"] = courses
+
+        # Faculty by full name, or by a capitalised last name
+        faculty = set(self.faculty_phrases.find(question))
+        for word in re.findall(r"\b[A-Z][a-z]{3,}\b", question):
+            for row in self.by_last_name.get(word, ()):
+                faculty |= {name.strip().lower() for name in re.split(r",| and ", self.columns["Faculty"][row]) if name.strip().endswith(word)}
+        if faculty:
+            filters["faculty"] = faculty
+
+        # Days of the week
+        days = {day for day in DAYS if re.search(r"\b" + day.lower() + r"s?\b", lowered)}
+        if re.search(r"\bweekends?\b", lowered):
+            days |= {"Saturday", "Sunday"}
+        if days:
+            filters["days"] = days
+
+        # Time of day and explicit clock bounds
+        for word, (start_after, start_before) in TIME_OF_DAY.items():
+            if re.search(r"\b" + word + r"s?\b", lowered):
+                filters["start_after"], filters["start_before"] = start_after, start_before
+                break
+        for bound, hour, minute, meridiem in re.findall(r"\b(after|before)\s+(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b", lowered):
+            minutes = parse_clock(f"{hour}:{minute or '00'} {meridiem}")
+            filters["start_after" if bound == "after" else "end_before"] = minutes
+        if re.search(r"\bbefore noon\b", lowered):
+            filters["end_before"] = 12 * 60
+
+        # Buildings, matched on their first word ("Harper", "Gleacher", "Booth 455")
+        buildings = {
+            building for building in self.by_building
+            if building and re.search(r"\b" + re.escape(building if building[-1].isdigit() else building.split()[0]) + r"\b", lowered)
+        }
+        if buildings:
+            filters["buildings"] = buildings
+
+        capacity = re.search(r"\b(?:at least|over|more than|above)\s+(\d+)\s+(?:seats|students|capacity)\b", lowered)
+        if capacity:
+            filters["min_capacity"] = int(capacity.group(1))
+
+        return filters
+
+    def unparsed_qualifiers(self, question: str, filters: dict) -> list:
+        """
+        Words of a question that constrain the answer in ways its parsed filters do not
+        (open seats, an instructor that was not recognised, prerequisites, negations, ...).
+
+        Args:
+            question (str): The question text
+            filters (dict): Output of parse_question()
+
+        Returns:
+            list: The unparsed qualifiers, empty if the filters capture the whole question
+        """
+        lowered = question.lower()
+        return [match.group(0) for pattern, covered_by in QUALIFIER_PATTERNS
+                if covered_by is None or covered_by not in filters
+                for match in pattern.finditer(lowered)]
+
+    def listing_order(self, rows: list, today: date = None) -> list:
+        """
+        Order sections for a listing: the current and upcoming quarters first, soonest
+        first, then past quarters, most recent first. Within a quarter, sections stay
+        in filter() order. This way truncating a long listing drops the oldest quarters
+        rather than the next ones.
+        """
+        current = current_quarter_key(today)
+
+        def key(row):
+            quarter = quarter_sort_key(self.columns["Quarter"][row])
+            return (0, quarter) if quarter >= current else (1, (-quarter[0], -quarter[1]))
+
+        return sorted(rows, key=key)
+
+    def format_rows(self, rows: list, limit: int = MAX_LISTED_SECTIONS) -> str:
+        """Render sections as one line each, noting the quarters of the sections left out."""
+        columns = self.columns
+        lines = [
+            f"{columns['Course'][row]}-{columns['Section'][row]} {columns['Title'][row]} | {columns['Quarter'][row]} | "
+            f"{columns['Schedule'][row]} | {columns['Faculty'][row]} | {columns['Building'][row]} {columns['Location'][row]} | "
+            f"Enrolled/Capacity: {columns['Capacity'][row]} | {columns['Program'][row]}"
+            for row in rows[:limit]
+        ]
+        if len(rows) > limit:
+            omitted = sorted({columns["Quarter"][row] for row in rows[limit:]}, key=quarter_sort_key)
+            lines.append(f"... and {len(rows) - limit} more sections (in {', '.join(omitted)}) not listed. "
+                         f"Add a quarter, day or time to narrow the list.")
+        return "\n".join(lines)
+
+    def answer(self, question: str):
+        """
+        Answer a structured schedule question deterministically.
+
+        Returns:
+            str: The matching sections, or None if the question needs the LLM (free-text
+                 question, no structured filters, constraints the filters do not
+                 capture, or no matching rows)
+        """
+        if FREE_TEXT_PATTERN.search(question):
+            return None
+
+        filters = self.parse_question(question)
+        if not filters or self.unparsed_qualifiers(question, filters):
+            return None
+
+        rows = self.listing_order(self.filter(**filters))
+        if not rows:
+            return None
+
+        limit = re.search(r"\b(\d{1,2})\s+(?:courses|classes|sections)\b", question.lower())
+        limit = int(limit.group(1)) if limit else MAX_LISTED_SECTIONS
+        shown = min(len(rows), limit)
+        return f"Found {len(rows)} matching sections, showing {shown}, upcoming quarters first, then the most recent ones (course-section title | quarter | schedule | faculty | location | enrolled/capacity | program):\n{self.format_rows(rows, limit)}"
@@ -1,4 +1,5 @@
 from pathlib import Path
+import re
 
 def get_csv_file_path() -> Path:
     """
@@ -17,5 +18,48 @@ def get_csv_file_path() -> Path:
     return csv_file
 
 
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
 
+# One or more day names followed by a time range, e.g. "Monday,Wednesday, 10:10 am - 11:30 am"
+MEETING_PATTERN = re.compile(
+    r"(?P<days>(?:(?:Mon|Tues|Wednes|Thurs|Fri|Satur|Sun)day\s*,\s*)+)"
+    r"(?P<start>\d{1,2}:\d{2}\s*[AaPp][Mm])\s*-\s*(?P<end>\d{1,2}:\d{2}\s*[AaPp][Mm])",
+    re.IGNORECASE
+)
 
+def parse_clock(text: str) -> int:
+    """
+    Convert a clock time such as "8:30 AM" or "06:00 pm" to minutes after midnight.
+    """
+    match = re.match(r"\s*(\d{1,2}):(\d{2})\s*([AaPp])[Mm]", text)
+    if not match:
+        raise ValueError(f"Unrecognized time: {text}")
+    hours, minutes, meridiem = int(match.group(1)), int(match.group(2)), match.group(3).lower()
+    return (hours % 12 + (12 if meridiem == "p" else 0)) * 60 + minutes
+
+def parse_schedule(schedule: str) -> list:
+    """
+    Parse a free-text schedule into weekly meetings.
+
+    Handles the formats used in all-course-list.csv and bidding-history.csv, e.g.
+    "Thursday, 8:30 AM - 11:30 AM", "Monday,Wednesday, 10:10 am - 11:30 am" and
+    "Tuesday, 10:10 AM - 11:30 AM Thursday, 10:10 AM - 11:30 AM". Schedules without
+    a day name (e.g. "EMBA Electives Week 1, 9:00 am - 12:00 pm") yield no meetings.
+
+    Args:
+        schedule (str): The schedule text
+
+    Returns:
+        list: (day name, start minute, end minute) tuples
+    """
+    meetings = []
+    for match in MEETING_PATTERN.finditer(schedule or ""):
+        start, end = parse_clock(match.group("start")), parse_clock(match.group("end"))
+        for day in re.findall(r"[A-Za-z]+day", match.group("days")):
+            meetings.append((day.capitalize(), start, end))
+    return meetings
+
+def format_clock(minutes: int) -> str:
+    """Format minutes after midnight as a clock time, e.g. 1110 -> "6:30 PM"."""
+    hours, minutes = divmod(minutes, 60)
+    return f"{(hours - 1) % 12 + 1}:{minutes:02d} {'AM' if hours < 12 else 'PM'}"
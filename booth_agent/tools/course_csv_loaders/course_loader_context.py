@@ -1,11 +1,14 @@
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langchain.document_loaders.csv_loader import CSVLoader
 from langchain.prompts import PromptTemplate
 from pathlib import Path
+from collections import defaultdict, deque
 from dotenv import load_dotenv
+import math
 import os
+import re
 from tools.course_csv_loaders.course_csv_loader_utils import get_csv_file_path
+from tools.single_flight import CoalescingChatOpenAI
 
 # Load environment variables
 load_dotenv()
@@ -14,11 +17,40 @@ load_dotenv()
 csv_file = get_csv_file_path()
 
 # Initialize the language model
-llm = ChatOpenAI(
+llm = CoalescingChatOpenAI(
     temperature=0,
     model="gpt-4o-mini"
 )
 
+# Maximum number of tokens of CSV rows placed in each prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("COURSE_CONTEXT_TOKEN_BUDGET", "4000"))
+
+# Columns whose words are used to pre-select candidate rows
+INDEXED_COLUMNS = ("Course", "Title", "Faculty", "Quarter")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "be", "by", "course", "courses", "do", "does", "for", "give", "how", "i", "in",
+    "is", "it", "me", "of", "offered", "on", "or", "the", "this", "to", "what", "when", "where", "which", "who", "with"
+}
+
+def tokenize(text: str) -> list:
+    """Lower-case the text and split it into words, dropping stopwords."""
+    return [word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS]
+
+def get_token_counter():
+    """
+    Return a function counting gpt-4o-mini tokens, falling back to a
+    four-characters-per-token estimate when the tiktoken encoding is unavailable.
+    """
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+        return lambda text: len(encoding.encode(text))
+    except Exception:
+        return lambda text: math.ceil(len(text) / 4)
+
+count_tokens = get_token_counter()
+
 class CSVQuestionAnswerer:
     def __init__(self, csv_file_path: str):
         """
@@ -30,6 +62,11 @@ class CSVQuestionAnswerer:
         self.csv_file_path = csv_file_path
         self.documents = self._load_csv()
         self.context = self._create_context()
+        self.row_tokens = [count_tokens(doc.page_content) for doc in self.documents]
+        self.row_index = self._create_row_index()
+
+        # Prompt tokens of recent calls: the full-catalog prompt vs. the pre-selected one
+        self.prompt_token_log = deque(maxlen=1000)
 
         # Define a prompt template for structured responses
         self.prompt = PromptTemplate(
@@ -48,6 +85,11 @@ class CSVQuestionAnswerer:
             input_variables=["context", "question"]
         )
 
+        # Tokens of the prompt around the rows and of the whole catalog, counted once, so
+        # logging the saving per call does not tokenize the full-catalog prompt again
+        self.template_tokens = count_tokens(self.prompt.format(context="", question=""))
+        self.catalog_tokens = count_tokens(self.context)
+
     def _load_csv(self):
         """
         Load the CSV file and return its content.
@@ -68,6 +110,54 @@ class CSVQuestionAnswerer:
         """
         return "\n".join(doc.page_content for doc in self.documents)
 
+    def _create_row_index(self) -> dict:
+        """
+        Build an inverted index from the words of the course number, title, faculty
+        and quarter columns to the rows that contain them.
+        """
+        row_index = defaultdict(set)
+        for row, doc in enumerate(self.documents):
+            for line in doc.page_content.splitlines():
+                column, _, value = line.partition(":")
+                if column.strip("\ufeff ") in INDEXED_COLUMNS:
+                    for word in tokenize(value):
+                        row_index[word].add(row)
+        return row_index
+
+    def select_rows(self, question: str, token_budget: int = CONTEXT_TOKEN_BUDGET) -> list:
+        """
+        Pick the rows most likely to answer the question, within a token budget.
+
+        Rows are scored by the inverse document frequency of the question words
+        they contain, so course numbers and rare title or faculty words outweigh
+        common ones such as quarter names. Questions matching no row at all get the
+        leading rows of the file up to the budget.
+
+        Args:
+            question (str): The question to ask.
+            token_budget (int): Maximum number of row tokens to select.
+
+        Returns:
+            list: Selected row indices, in file order.
+        """
+        scores = defaultdict(float)
+        for word in set(tokenize(question)):
+            rows = self.row_index.get(word)
+            if rows:
+                idf = math.log(1 + len(self.documents) / len(rows))
+                for row in rows:
+                    scores[row] += idf
+
+        ranked = sorted(scores, key=lambda row: (-scores[row], row)) if scores else range(len(self.documents))
+
+        selected, used = [], 0
+        for row in ranked:
+            if used + self.row_tokens[row] > token_budget:
+                break
+            selected.append(row)
+            used += self.row_tokens[row]
+        return sorted(selected)
+
     def ask(self, question: str) -> str:
         """
         Ask a question based on the CSV data.
@@ -79,10 +169,23 @@ class CSVQuestionAnswerer:
             str: The answer to the question.
         """
         try:
-            response = llm.invoke(self.prompt.format(
-                context=self.context,
-                question=question
-            ))
+            rows = self.select_rows(question)
+            context = (
+                f"(Showing the {len(rows)} of {len(self.documents)} rows most relevant to the question.)\n"
+                + "\n".join(self.documents[row].page_content for row in rows)
+            )
+            prompt = self.prompt.format(context=context, question=question)
+
+            # Estimated from the precomputed counts (row boundaries may merge a token or two)
+            question_tokens = self.template_tokens + count_tokens(question)
+            self.prompt_token_log.append({
+                "question": question,
+                "full_catalog_tokens": question_tokens + self.catalog_tokens,
+                "selected_tokens": question_tokens + sum(self.row_tokens[row] for row in rows),
+                "rows": len(rows)
+            })
+
+            response = llm.invoke(prompt)
             return response.content
         except Exception as e:
             return f"Error processing question: {str(e)}"
@@ -132,3 +235,7 @@ if __name__ == "__main__":
     for query in test_queries:
         print(f"\nQuery: {query}")
         print(f"Response: {course_tool_context_search(query)}")
+
+    for entry in qa.prompt_token_log:
+        print(f"{entry['question']}: {entry['selected_tokens']} prompt tokens ({entry['rows']} rows) "
+              f"instead of {entry['full_catalog_tokens']} for the full catalog")
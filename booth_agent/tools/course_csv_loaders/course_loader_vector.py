@@ -1,32 +1,39 @@
 from langchain_core.tools import tool
-from langchain.chains import RetrievalQA
-from langchain.chat_models import ChatOpenAI
-from langchain.document_loaders import CSVLoader
-from langchain.vectorstores import DocArrayInMemorySearch
-from langchain.embeddings.openai import OpenAIEmbeddings
-from langchain.indexes import VectorstoreIndexCreator
+from langchain_community.embeddings import OpenAIEmbeddings
+from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
-from langchain.llms import OpenAI
 import os
 from pathlib import Path
 from tools.course_csv_loaders.course_csv_loader_utils import get_csv_file_path
+from tools.course_csv_loaders.course_vector_index import load_or_build_index
+from tools.course_csv_loaders.course_catalog import CourseCatalog
+from tools.single_flight import CoalescingOpenAI
 
 # Load environment variables
 load_dotenv()
 
 csv_file = get_csv_file_path()
 
-# Initialize CSV loader
-loader = CSVLoader(file_path=csv_file)
+# Columnar catalog for structured questions (quarter, faculty, day, time, building, capacity)
+catalog = CourseCatalog.from_csv(csv_file)
 
-# Create vector search index at module level
-index = VectorstoreIndexCreator(
-    vectorstore_cls=DocArrayInMemorySearch,
-    embedding=OpenAIEmbeddings()
-).from_loaders([loader])
+# Memory-map the persisted catalog vectors; the CSV is only re-embedded when its hash changes
+index = load_or_build_index(OpenAIEmbeddings(), csv_file)
+
+# Number of catalog rows given to the LLM per question
+RETRIEVAL_K = 4
+
+QA_PROMPT = PromptTemplate.from_template(
+    """Use the following pieces of context to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+{context}
+
+Question: {question}
+Helpful Answer:"""
+)
 
 # Initialize LLM at module level
-llm = OpenAI(
+llm = CoalescingOpenAI(
     temperature=0, 
     model='gpt-3.5-turbo-instruct'
 )
@@ -54,9 +61,15 @@ def course_tool_vector_search(question: str):
     for quick insights into the course schedule database.
     """
     try:
-        # Use the pre-initialized index and llm
-        response = index.query(question, llm=llm)
-        return response
+        # Structured filter questions are answered directly from the catalog indexes
+        structured_answer = catalog.answer(question)
+        if structured_answer is not None:
+            return structured_answer
+
+        # Free-text questions fall back to vector search and the LLM
+        rows = index.similarity_search(question, k=RETRIEVAL_K)
+        context = "\n\n".join(row.page_content for row in rows)
+        return llm.invoke(QA_PROMPT.format(context=context, question=question))
 
     except Exception as e:
         return f"Error processing query: {str(e)}"
@@ -1,4 +1,8 @@
 import csv
+import math
+import re
+import time
+from collections import defaultdict
 from pathlib import Path
 from tools.course_csv_loaders.course_csv_loader_utils import get_csv_file_path
 from langchain_core.tools import tool
@@ -13,6 +17,190 @@ with open(csv_file, mode='r', encoding='utf-8') as file:
     for row in reader:
         COURSE_MAPPING[row["Course"]] = row["Title"]
 
+# Words that carry no meaning in a title lookup
+TITLE_STOPWORDS = {
+    "a", "an", "and", "the", "of", "for", "in", "on", "to", "with", "what", "is", "are", "course",
+    "courses", "class", "number", "numbers", "called", "named", "titled"
+}
+
+# Common abbreviations students use for title words
+ABBREVIATIONS = {
+    "acct": "accounting", "accting": "accounting", "fin": "finance", "finan": "financial", "econ": "economics",
+    "mgmt": "management", "mgt": "management", "mktg": "marketing", "mkt": "marketing", "stats": "statistics",
+    "stat": "statistics", "corp": "corporate", "intl": "international", "org": "organization",
+    "orgs": "organizations", "ops": "operations", "strat": "strategy", "micro": "microeconomics",
+    "macro": "macroeconomics", "ent": "entrepreneurship", "entrep": "entrepreneurial", "invest": "investments",
+    "neg": "negotiations", "negs": "negotiations", "dev": "development", "intro": "introduction",
+    "adv": "advanced", "mfg": "manufacturing", "comm": "communications", "pe": "private equity",
+    "vc": "venture capital", "ai": "artificial intelligence", "ml": "machine learning", "bus": "business",
+    "biz": "business", "analytics": "analytics", "&": "and"
+}
+
+# Separators between several titles in one request ("and" is handled separately, since titles contain it)
+BATCH_SEPARATORS = re.compile(r"[,;|\n]+")
+
+
+def title_words(text: str) -> list:
+    """Lower-case words of a title or query, with "&" kept as its own word."""
+    return re.findall(r"[a-z0-9]+|&", text.lower())
+
+
+def stem(word: str) -> str:
+    """Drop a plural "s" so "negotiation" and "negotiations" match."""
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def expand_words(words: list) -> list:
+    """Replace abbreviations with the words they stand for."""
+    expanded = []
+    for word in words:
+        expanded.extend(ABBREVIATIONS.get(word, word).split())
+    return expanded
+
+
+def index_words(words: list) -> list:
+    """Stemmed words of a title or query, without stopwords."""
+    return [stem(word) for word in words if word not in TITLE_STOPWORDS]
+
+
+def trigrams(text: str) -> set:
+    """Character trigrams of the text, with word boundaries padded."""
+    padded = f"  {' '.join(text.split())} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CourseTitleIndex:
+    """
+    Reverse index from course titles to course numbers.
+
+    Titles are indexed by word (for IDF-weighted word overlap) and by character trigram
+    (for typos and partial words). Each title maps to every course number that uses it,
+    so titles shared by several courses return all of them. Acronyms, both spelled out
+    in a title such as "(CSR)" and formed from the initials of longer titles, are
+    indexed as words.
+    """
+
+    def __init__(self, course_mapping: dict):
+        courses_by_title = defaultdict(set)
+        for course_number, title in course_mapping.items():
+            courses_by_title[" ".join(title.split())].add(course_number)
+
+        self.titles = sorted(courses_by_title)
+        self.courses = [sorted(courses_by_title[title]) for title in self.titles]
+        self.words = []
+        self.grams = []
+        self.word_index = defaultdict(set)
+        self.gram_index = defaultdict(set)
+
+        for entry, title in enumerate(self.titles):
+            words = index_words(title_words(title))
+            initials = "".join(word[0] for word in words if not word.isdigit())
+            acronyms = {acronym.lower() for acronym in re.findall(r"\(([A-Z]{2,})\)", title)}
+            if len(initials) >= 3:
+                acronyms.add(initials)
+
+            self.words.append(set(words) | acronyms)
+            self.grams.append(trigrams(" ".join(words)))
+            for word in self.words[entry]:
+                self.word_index[word].add(entry)
+            for gram in self.grams[entry]:
+                self.gram_index[gram].add(entry)
+
+        self.exact_titles = {tuple(index_words(title_words(title))) for title in self.titles}
+        self.idf = {word: math.log(1 + len(self.titles) / len(entries)) for word, entries in self.word_index.items()}
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.3) -> list:
+        """
+        Rank titles against one title query.
+
+        The score mixes the IDF-weighted share of query words found in the title with
+        the trigram overlap (Dice coefficient) of query and title; an exact title match
+        scores 1.
+
+        Args:
+            query (str): A course title, possibly abbreviated or misspelled
+            k (int): Number of titles to return
+            min_score (float): Lowest score returned
+
+        Returns:
+            list: (title, course numbers, score) tuples, best first
+        """
+        words = index_words(expand_words(title_words(query)))
+        if not words:
+            return []
+
+        query_grams = trigrams(" ".join(words))
+        candidates = set()
+        for word in words:
+            candidates |= self.word_index.get(word, set())
+        gram_counts = defaultdict(int)
+        for gram in query_grams:
+            for entry in self.gram_index.get(gram, ()):
+                gram_counts[entry] += 1
+        candidates |= gram_counts.keys()
+
+        query_weight = sum(self.idf.get(word, math.log(1 + len(self.titles))) for word in words)
+        results = []
+        for entry in candidates:
+            matched = sum(self.idf.get(word, 0.0) for word in words if word in self.words[entry])
+            dice = 2 * gram_counts.get(entry, 0) / (len(query_grams) + len(self.grams[entry]))
+            score = 1.0 if self.words[entry] >= set(words) and dice > 0.95 else 0.5 * matched / query_weight + 0.5 * dice
+            if score >= min_score:
+                results.append((self.titles[entry], self.courses[entry], score))
+
+        results.sort(key=lambda result: (-result[2], result[0]))
+        return results[:k]
+
+    def is_title(self, text: str) -> bool:
+        """Whether the text is a catalog title, up to case, punctuation and stopwords."""
+        return tuple(index_words(title_words(text))) in self.exact_titles
+
+    def join_titles(self, parts: list) -> list:
+        """
+        Rejoin adjacent comma-separated parts that together form a catalog title, such
+        as "Business", "Politics" and "and Ethics". The longest run is preferred.
+        """
+        joined = []
+        start = 0
+        while start < len(parts):
+            end = next((end for end in range(len(parts), start + 1, -1) if self.is_title(", ".join(parts[start:end]))), start + 1)
+            joined.append(", ".join(parts[start:end]))
+            start = end
+        return joined
+
+    def split_batch(self, text: str) -> list:
+        """
+        Split a request for several titles into one query per title.
+
+        A request that is itself a catalog title is not split. Otherwise parts are
+        separated by commas, semicolons, pipes or "and", keeping together adjacent parts
+        that form a title with commas in it ("Debt, Distress, and Restructuring"). A part
+        is only split on "and" when every piece matches some title better than the whole
+        part does, so titles such as "Probability and Statistics" stay intact.
+        """
+        text = text.strip(" ?.!\"'")
+        if not text:
+            return []
+        if self.is_title(text):
+            return [text]
+
+        queries = []
+        parts = [part.strip(" ?.!\"'") for part in BATCH_SEPARATORS.split(text)]
+        for part in self.join_titles([part for part in parts if part]):
+            pieces = [piece.strip() for piece in re.split(r"\band\b|&", part, flags=re.IGNORECASE) if piece.strip()]
+            if len(pieces) > 1 and not self.is_title(part):
+                whole = self.search(part, k=1)
+                whole_score = whole[0][2] if whole else 0.0
+                piece_scores = [(self.search(piece, k=1) or [(None, None, 0.0)])[0][2] for piece in pieces]
+                if min(piece_scores) > whole_score:
+                    queries.extend(pieces)
+                    continue
+            queries.append(part)
+        return queries
+
+
+title_index = CourseTitleIndex(COURSE_MAPPING)
+
 @tool
 def course_to_title(course_number: str):
     """
@@ -42,6 +230,38 @@ def course_to_title(course_number: str):
     else:
         return f"Course number {course_number} not found."
 
+@tool
+def title_to_course(course_titles: str):
+    """
+    A LangChain tool that finds the course number(s) for one or more course titles.
+
+    Titles may be partial, abbreviated or misspelled. Several titles can be looked up
+    in one call by separating them with commas, semicolons or "and". For each title
+    the best matching catalog titles are listed with their course numbers and a match
+    score between 0 and 1; a title shared by several courses lists all their numbers.
+
+    Example Usage:
+    - Input: "investments and financial accounting"
+    - Output:
+      investments: Investments -> 35000 (score 1.00); Advanced Investments -> 35150 (score 0.83); ...
+      financial accounting: Financial Accounting -> 30000 (score 1.00); ...
+
+    Args:
+        course_titles (str): One or more course titles.
+
+    Returns:
+        str: Ranked course numbers for each title, or a message if nothing matches.
+    """
+    lines = []
+    for query in title_index.split_batch(course_titles):
+        matches = title_index.search(query)
+        if matches:
+            candidates = "; ".join(f"{title} -> {', '.join(courses)} (score {score:.2f})" for title, courses, score in matches)
+            lines.append(f"{query}: {candidates}")
+        else:
+            lines.append(f"{query}: no matching course title found")
+    return "\n".join(lines) or "No course title given."
+
 # Example usage:
 if __name__ == "__main__":
 
@@ -51,3 +271,15 @@ if __name__ == "__main__":
     print(course_to_title("35150"))  # Output: "Advanced Investments"
     print(course_to_title("33942"))  # Output: "Applied Macroeconomics: Micro Data for Macro Models"
     print(course_to_title("99999"))  # Output: "Course number 99999 not found."
+
+    queries = ["investments and financial accounting", "Probability and Statistics", "Business, Politics, and Ethics",
+               "investments, debt, distress, and restructuring", "corp fin", "CSR", "Reaserch Seminar", "negotiations; entrepreneurial selling | pricing strategies"]
+    for query in queries:
+        print(title_to_course(query))
+
+    start = time.perf_counter()
+    for _ in range(100):
+        for query in queries:
+            for part in title_index.split_batch(query):
+                title_index.search(part)
+    print(f"{(time.perf_counter() - start) * 1e6 / (100 * len(queries)):.1f} us per request")
@@ -0,0 +1,120 @@
+from langchain_community.document_loaders import CSVLoader
+from langchain_core.documents import Document
+from pathlib import Path
+import numpy as np
+import json
+import os
+from tools.cache_utils import CACHE_DIR, file_sha256, read_manifest, write_manifest
+
+# Initialize file paths
+INDEX_DIR = CACHE_DIR / "course_vectors"
+VECTORS_FILE = "vectors.npy"
+ROWS_FILE = "rows.json"
+MANIFEST_FILE = "manifest.json"
+
+
+class CourseVectorIndex:
+    """
+    Embeddings of every catalog row, stored as a float32 NumPy array on disk.
+
+    The array is opened with mmap_mode="r", so the vectors are never copied into
+    Python objects and every server process maps the same pages from the OS page
+    cache. Vectors are L2-normalised, so a single matrix-vector product gives the
+    cosine similarity of the query to every row.
+    """
+
+    def __init__(self, vectors, rows: list, embeddings):
+        self.vectors = vectors
+        self.rows = rows
+        self.embeddings = embeddings
+
+    def similarity_search(self, query: str, k: int = 4) -> list:
+        """
+        Return the k catalog rows most similar to the query.
+
+        Args:
+            query (str): The question text
+            k (int): Number of rows to return
+
+        Returns:
+            list: Row documents, most similar first
+        """
+        query_vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        query_vector /= np.linalg.norm(query_vector) or 1.0
+
+        scores = self.vectors @ query_vector
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [Document(page_content=self.rows[i]["page_content"], metadata=self.rows[i]["metadata"]) for i in top]
+
+
+def index_settings(csv_file: Path, embeddings) -> dict:
+    """
+    Everything the saved vectors depend on: the CSV contents and the embedding model.
+    """
+    return {
+        "csv_sha256": file_sha256(csv_file),
+        "embedding_model": getattr(embeddings, "model", type(embeddings).__name__)
+    }
+
+
+def build_index(embeddings, csv_file: Path, index_dir: Path = INDEX_DIR, settings: dict = None):
+    """
+    Embed every row of the course CSV and save the vectors and row texts.
+
+    Args:
+        embeddings: Embedding model used for the rows
+        csv_file (Path): Path of all-course-list.csv
+        index_dir (Path): Directory the index is saved to
+        settings (dict): Precomputed output of index_settings(), if available
+    """
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    settings = settings or index_settings(csv_file, embeddings)
+
+    # Drop the old manifest first so an interrupted build is never mistaken for a current one
+    (index_dir / MANIFEST_FILE).unlink(missing_ok=True)
+
+    documents = CSVLoader(file_path=str(csv_file)).load()
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors /= np.where(norms == 0, 1.0, norms)
+
+    # Write to temporary files and swap them in, so processes that already mapped
+    # the old vectors keep reading a consistent file
+    tmp_vectors = index_dir / (VECTORS_FILE + ".tmp")
+    with open(tmp_vectors, "wb") as file:
+        np.save(file, vectors)
+    os.replace(tmp_vectors, index_dir / VECTORS_FILE)
+
+    tmp_rows = index_dir / (ROWS_FILE + ".tmp")
+    with open(tmp_rows, "w", encoding="utf-8") as file:
+        json.dump([{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents], file)
+    os.replace(tmp_rows, index_dir / ROWS_FILE)
+
+    write_manifest(index_dir / MANIFEST_FILE, settings)
+
+
+def load_or_build_index(embeddings, csv_file: Path, index_dir: Path = INDEX_DIR) -> CourseVectorIndex:
+    """
+    Memory-map the saved catalog vectors, re-embedding the CSV only if its content hash changed.
+
+    Args:
+        embeddings: Embedding model for the rows and queries
+        csv_file (Path): Path of all-course-list.csv
+        index_dir (Path): Directory the index is saved to
+
+    Returns:
+        CourseVectorIndex: The loaded index
+    """
+    index_dir = Path(index_dir)
+    settings = index_settings(csv_file, embeddings)
+    if read_manifest(index_dir / MANIFEST_FILE) != settings or not (index_dir / VECTORS_FILE).exists():
+        print(f"Building course vector index for {csv_file}")
+        build_index(embeddings, csv_file, index_dir, settings)
+
+    vectors = np.load(index_dir / VECTORS_FILE, mmap_mode="r")
+    with open(index_dir / ROWS_FILE, "r", encoding="utf-8") as file:
+        rows = json.load(file)
+    return CourseVectorIndex(vectors, rows, embeddings)
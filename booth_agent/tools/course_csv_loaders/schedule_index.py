@@ -0,0 +1,350 @@
+from langchain_core.tools import tool
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import product
+import argparse
+import csv
+import re
+import time
+from tools.cache_utils import BASE_DIR
+from tools.course_csv_loaders.course_catalog import CourseCatalog, quarter_sort_key
+from tools.course_csv_loaders.course_csv_loader_utils import DAYS, get_csv_file_path, parse_schedule
+
+# Initialize file paths
+BIDDING_HISTORY_PATH = BASE_DIR / "data" / "bidding-history.csv"
+
+# Hours considered when listing free time (8:00 AM to 10:00 PM)
+DAY_START = 8 * 60
+DAY_END = 22 * 60
+
+# Shortest gap worth reporting as free time, in minutes
+MIN_FREE_MINUTES = 30
+
+# Section combinations tried per quarter before reporting the conflicts instead
+MAX_COMBINATIONS = 5000
+
+# Sections listed when answering "what fits" questions
+MAX_LISTED_SECTIONS = 30
+
+
+def format_minutes(minutes: int) -> str:
+    """Render minutes after midnight as a clock time such as "6:00 PM"."""
+    hours, minutes = divmod(minutes, 60)
+    return f"{(hours - 1) % 12 + 1}:{minutes:02d} {'AM' if hours < 12 else 'PM'}"
+
+
+def section_key(course: str, section: str) -> str:
+    """
+    Label a section is looked up by, with its section number unpadded: the catalog writes
+    "35200-1" and the bidding history and users "35200-01".
+    """
+    return f"{course}-{section.lstrip('0') or section}"
+
+
+def overlaps(first: tuple, second: tuple) -> bool:
+    """Whether two (day, start, end) meetings overlap; meetings that only touch do not."""
+    return first[0] == second[0] and first[1] < second[2] and second[1] < first[2]
+
+
+class ScheduleIndex:
+    """
+    Weekly meetings of every section, parsed once and indexed per quarter and day.
+
+    For each (quarter, day) the meetings are kept sorted by start time, together with
+    the longest meeting of that day. Since a meeting that overlaps [start, end) must
+    start before end and after start minus the longest duration, finding the sections
+    that overlap an interval is two bisections and a scan of the meetings in between,
+    instead of re-parsing and comparing every schedule string.
+    """
+
+    def __init__(self, sections: list):
+        """
+        Args:
+            sections (list): Dicts with "quarter", "course", "section", "title" and "schedule"
+        """
+        self.sections = sections
+        self.meetings = [parse_schedule(section["schedule"]) for section in sections]
+        self.by_course = defaultdict(list)
+        self.by_label = {}
+
+        intervals = defaultdict(list)
+        for row, section in enumerate(sections):
+            self.by_course[(section["quarter"], section["course"])].append(row)
+            self.by_label.setdefault((section["quarter"], section_key(section["course"], section["section"])), row)
+            for day, start, end in self.meetings[row]:
+                intervals[(section["quarter"], day)].append((start, end, row))
+
+        self.starts, self.ends, self.rows, self.longest = {}, {}, {}, {}
+        for key, entries in intervals.items():
+            entries.sort()
+            self.starts[key] = [start for start, _, _ in entries]
+            self.ends[key] = [end for _, end, _ in entries]
+            self.rows[key] = [row for _, _, row in entries]
+            self.longest[key] = max(end - start for start, end, _ in entries)
+
+        self.quarters = sorted({section["quarter"] for section in sections}, key=quarter_sort_key)
+
+    @classmethod
+    def from_catalog(cls, catalog: CourseCatalog, extra_sections: list = ()):
+        """Index the sections of a CourseCatalog, plus optional sections from other sources."""
+        columns = catalog.columns
+        sections = [
+            {"quarter": columns["Quarter"][row], "course": columns["Course"][row], "section": columns["Section"][row],
+             "title": columns["Title"][row], "schedule": columns["Schedule"][row]}
+            for row in range(catalog.size)
+        ]
+        return cls(sections + list(extra_sections))
+
+    @staticmethod
+    def bidding_history_sections(file_path=BIDDING_HISTORY_PATH, skip_quarters=()) -> list:
+        """
+        Sections of past quarters from bidding-history.csv ("Day and Time" column).
+
+        Args:
+            skip_quarters: Quarters such as "Spring 2025" to leave out (e.g. those in the catalog)
+        """
+        sections = []
+        with open(file_path, mode="r", encoding="utf-8-sig") as file:
+            for row in csv.DictReader(file):
+                quarter = f"{row['Quarter']} {row['Year']}"
+                if quarter not in skip_quarters:
+                    sections.append({"quarter": quarter, "course": row["Course_Number"], "section": row["Section"],
+                                     "title": row["Title"], "schedule": row["Day and Time"]})
+        return sections
+
+    def label(self, row: int) -> str:
+        return f"{self.sections[row]['course']}-{self.sections[row]['section']}"
+
+    def describe(self, row: int) -> str:
+        """Section label, title and meetings, e.g. "35200-01 Corporate Finance (Monday 8:30 AM - 11:30 AM)"."""
+        meetings = ", ".join(f"{day} {format_minutes(start)} - {format_minutes(end)}" for day, start, end in self.meetings[row])
+        return f"{self.label(row)} {self.sections[row]['title']} ({meetings or 'no weekly meetings'})"
+
+    def overlapping(self, quarter: str, day: str, start: int, end: int) -> list:
+        """Rows of the sections with a meeting that overlaps [start, end) on a day of a quarter."""
+        key = (quarter, day)
+        if key not in self.starts:
+            return []
+        starts, ends, rows = self.starts[key], self.ends[key], self.rows[key]
+        low = bisect_right(starts, start - self.longest[key])
+        high = bisect_left(starts, end)
+        return [rows[position] for position in range(low, high) if ends[position] > start]
+
+    def conflicts(self, rows: list) -> list:
+        """
+        Pairs of the given sections whose meetings overlap (same quarter and day).
+
+        Returns:
+            list: (row, row, day, overlap start, overlap end) tuples
+        """
+        meetings = defaultdict(list)
+        for row in rows:
+            for day, start, end in self.meetings[row]:
+                meetings[(self.sections[row]["quarter"], day)].append((start, end, row))
+
+        found = []
+        for (_, day), entries in meetings.items():
+            # Sweep the day's meetings in start order, keeping those still running
+            active = []
+            for start, end, row in sorted(entries):
+                active = [entry for entry in active if entry[1] > start]
+                found.extend((other, row, day, start, min(end, other_end)) for _, other_end, other in active if other != row)
+                active.append((start, end, row))
+        return found
+
+    def free_slots(self, rows: list, days=DAYS, day_start: int = DAY_START, day_end: int = DAY_END) -> dict:
+        """
+        Free time left around the given sections.
+
+        Returns:
+            dict: Day -> list of (start, end) gaps of at least MIN_FREE_MINUTES
+        """
+        busy = defaultdict(list)
+        for row in rows:
+            for day, start, end in self.meetings[row]:
+                busy[day].append((start, end))
+
+        free = {}
+        for day in days:
+            gaps, cursor = [], day_start
+            for start, end in sorted(busy[day]):
+                if start - cursor >= MIN_FREE_MINUTES:
+                    gaps.append((cursor, min(start, day_end)))
+                cursor = max(cursor, end)
+            if day_end - cursor >= MIN_FREE_MINUTES:
+                gaps.append((cursor, day_end))
+            free[day] = [(start, end) for start, end in gaps if end - start >= MIN_FREE_MINUTES]
+        return free
+
+    def fitting(self, rows: list, quarter: str, candidates: list) -> list:
+        """Candidate rows of a quarter whose meetings overlap none of the given sections."""
+        blocked = set()
+        for row in rows:
+            for day, start, end in self.meetings[row]:
+                blocked.update(self.overlapping(quarter, day, start, end))
+        chosen_courses = {self.sections[row]["course"] for row in rows}
+        return [row for row in candidates if row not in blocked and self.sections[row]["course"] not in chosen_courses]
+
+    def resolve(self, quarter: str, references: list) -> list:
+        """
+        Section options for each course or section reference ("35200" or "35200-01") in a quarter.
+
+        Returns:
+            list: (reference, [rows]) pairs; rows is empty if the course is not offered
+        """
+        options = []
+        for reference in references:
+            if "-" in reference:
+                row = self.by_label.get((quarter, section_key(*reference.split("-", 1))))
+                options.append((reference, [row] if row is not None else []))
+            else:
+                options.append((reference, list(self.by_course.get((quarter, reference), []))))
+        return options
+
+    def conflict_free_choice(self, options: list):
+        """
+        Pick one section per course so that no two meetings overlap.
+
+        Returns:
+            list: Chosen rows, or None if every combination (up to MAX_COMBINATIONS) conflicts
+        """
+        for count, combination in enumerate(product(*(rows for _, rows in options))):
+            if count >= MAX_COMBINATIONS:
+                break
+            if not self.conflicts(list(combination)):
+                return list(combination)
+        return None
+
+
+def scan_conflicts(sections: list, rows: list) -> list:
+    """Parse and compare every pair of schedule strings, without the index (kept for the benchmark)."""
+    found = []
+    for position, row in enumerate(rows):
+        for other in rows[position + 1:]:
+            if sections[row]["quarter"] != sections[other]["quarter"]:
+                continue
+            for first in parse_schedule(sections[row]["schedule"]):
+                for second in parse_schedule(sections[other]["schedule"]):
+                    if overlaps(first, second):
+                        found.append((row, other, first[0]))
+    return found
+
+
+# Initialize the catalog and the interval index, with past quarters from the bidding history
+catalog = CourseCatalog.from_csv(get_csv_file_path())
+try:
+    schedule_index = ScheduleIndex.from_catalog(
+        catalog, ScheduleIndex.bidding_history_sections(skip_quarters=set(catalog.by_quarter))
+    )
+except FileNotFoundError:
+    print(f"Warning: Bidding history file not found at {BIDDING_HISTORY_PATH}, indexing the catalog only")
+    schedule_index = ScheduleIndex.from_catalog(catalog)
+
+
+def answer_schedule_question(text: str) -> str:
+    """Conflict check, free time and sections that fit around the courses named in the text."""
+    references = list(dict.fromkeys(re.findall(r"\b\d{5}(?:-\d{1,2})?\b", text)))
+    filters = catalog.parse_question(text)
+    lowered = text.lower()
+    asks_fit = re.search(r"\b(fits?|free|open|gaps?|around|available|add)\b", lowered)
+
+    quarters = sorted(filters.get("quarters", ()), key=quarter_sort_key)
+    if not quarters:
+        courses = {reference.split("-")[0] for reference in references}
+        quarters = [quarter for quarter in schedule_index.quarters
+                    if courses and all((quarter, course) in schedule_index.by_course for course in courses)][-1:]
+    if not quarters:
+        return "Please name the quarter (e.g. Spring 2025) and the course numbers (e.g. 35200 or 35200-01) to check."
+
+    answers = []
+    for quarter in quarters:
+        lines = [f"{quarter}:"]
+        options = schedule_index.resolve(quarter, references)
+        missing = [reference for reference, rows in options if not rows]
+        if missing:
+            lines.append(f"  Not offered in {quarter}: {', '.join(missing)}")
+        options = [(reference, rows) for reference, rows in options if rows]
+
+        chosen = []
+        if options:
+            chosen = schedule_index.conflict_free_choice(options)
+            if chosen is not None:
+                lines.append("  No conflicts with these sections:" if len(options) > 1 else "  Sections:")
+                lines.extend(f"    {schedule_index.describe(row)}" for row in chosen)
+            else:
+                chosen = [rows[0] for _, rows in options]
+                lines.append("  Every combination of sections has a time conflict, e.g.:")
+                for first, second, day, start, end in schedule_index.conflicts(chosen):
+                    lines.append(f"    {schedule_index.label(first)} and {schedule_index.label(second)} overlap on {day} "
+                                 f"{format_minutes(start)} - {format_minutes(end)}")
+
+        if asks_fit or not options:
+            days = sorted(filters.get("days", DAYS), key=DAYS.index)
+            free = schedule_index.free_slots(chosen, days)
+            lines.append("  Free time (8:00 AM - 10:00 PM):")
+            for day in days:
+                gaps = ", ".join(f"{format_minutes(start)} - {format_minutes(end)}" for start, end in free[day])
+                lines.append(f"    {day}: {gaps or 'none'}")
+
+            if any(key in filters for key in ("days", "start_after", "start_before", "end_before")):
+                window = {key: value for key, value in filters.items() if key in ("days", "start_after", "start_before", "end_before")}
+                catalog_rows = catalog.filter(quarters=[quarter], **window)
+                labels = [(quarter, section_key(catalog.columns["Course"][row], catalog.columns["Section"][row])) for row in catalog_rows]
+                candidates = [schedule_index.by_label[label] for label in labels if label in schedule_index.by_label]
+                fitting = schedule_index.fitting(chosen, quarter, candidates)
+                lines.append(f"  {len(fitting)} sections fit in that window without a conflict:")
+                lines.extend(f"    {schedule_index.describe(row)}" for row in fitting[:MAX_LISTED_SECTIONS])
+                if len(fitting) > MAX_LISTED_SECTIONS:
+                    lines.append(f"    ... and {len(fitting) - MAX_LISTED_SECTIONS} more")
+        answers.append("\n".join(lines))
+    return "\n\n".join(answers)
+
+
+@tool
+def schedule_conflict_checker(text: str) -> str:
+    """
+    Check whether courses or sections meet at the same time, pick conflict-free sections, list the
+    free time left in the week, and find sections that fit a day/time window around them.
+    Input: course numbers (35200) or sections (35200-01), optionally a quarter and a day or time window.
+    Example: "Do 35200 and 37000 conflict in Winter 2025? What fits Monday evenings?"
+    """
+    return answer_schedule_question(text)
+
+
+def run_benchmark(repeat: int = 3):
+    """Time building the index, and checking every pair of sections of each quarter with and without it."""
+    start = time.perf_counter()
+    index = ScheduleIndex.from_catalog(catalog)
+    print(f"Indexed {len(index.sections)} sections in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for quarter in sorted(catalog.by_quarter, key=quarter_sort_key):
+        rows = [row for row, section in enumerate(index.sections) if section["quarter"] == quarter]
+        timings = {}
+        for name, check in (("scan", lambda: scan_conflicts(index.sections, rows)), ("index", lambda: index.conflicts(rows))):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                found = check()
+            timings[name] = ((time.perf_counter() - start) * 1000 / repeat, len(found))
+        print(f"{quarter:<12} {len(rows):4d} sections: scan {timings['scan'][0]:8.2f} ms, index {timings['index'][0]:6.2f} ms "
+              f"({timings['index'][1]} overlapping pairs)")
+
+        start = time.perf_counter()
+        for row in rows:
+            for day, meeting_start, meeting_end in index.meetings[row]:
+                index.overlapping(quarter, day, meeting_start, meeting_end)
+        print(f"{'':<12} overlap queries: {(time.perf_counter() - start) * 1e6 / max(len(rows), 1):.1f} us/section")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check schedule conflicts or benchmark the schedule index')
+    parser.add_argument('--benchmark', action='store_true', help='Time the index against pairwise schedule parsing')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark()
+    else:
+        for query in ["Do 35200 and 37000 conflict in Winter 2025?",
+                      "I'm taking 30000-81 and 41201 in Spring 2025. What fits Monday evenings?",
+                      "What free time do I have with 35000, 33001 and 40000?"]:
+            print(f"\nQuery: {query}")
+            print(schedule_conflict_checker.invoke(query))
@@ -0,0 +1,300 @@
+from langchain_core.tools import tool
+import numpy as np
+import re
+import time
+from tools.course_csv_loaders.course_catalog import CourseCatalog, quarter_sort_key
+from tools.course_csv_loaders.course_csv_loader_utils import get_csv_file_path
+from tools.course_csv_loaders.course_name_finder import COURSE_MAPPING
+from tools.bidding_loader.bid_analytics import PERCENTILES, load_or_build_analytics
+from tools.degree_requirements import COURSE_PATTERN, degree_ruleset
+from tools.concentration_requirements import COURSE_UNITS, concentration_evaluator
+
+# Search limits, so a plan is always returned within one tool call
+DEFAULT_TIME_LIMIT = 3.0
+MAX_NODES = 200000
+
+DEFAULT_COURSES_PER_QUARTER = 4
+
+# Initialize the catalog offerings and the bid price statistics
+catalog = CourseCatalog.from_csv(get_csv_file_path())
+try:
+    bid_analytics = load_or_build_analytics()
+except FileNotFoundError:
+    print("Warning: Bidding history file not found, planning without bid prices")
+    bid_analytics = None
+
+
+def expected_price(course: str, percentile: int = None):
+    """
+    Expected Phase 1 clearing price of a course's Full-Time sections (its Evening/Weekend
+    sections if it has no Full-Time bids).
+
+    Args:
+        course (str): Course number
+        percentile (int): Use this historical percentile (one of PERCENTILES) instead of the forecast
+
+    Returns:
+        float: Points, or None if the course has no Phase 1 bid history
+    """
+    if bid_analytics is None:
+        return None
+    return bid_analytics.expected_price(course, "Phase 1", percentile)
+
+
+class CoursePlanner:
+    """
+    Branch and bound search for a quarter-by-quarter course plan.
+
+    A plan assigns untaken courses to the catalog quarters they are offered in, at most
+    a given number of courses per quarter. Plans are compared first by the requirement
+    units they leave unmet (degree categories plus the target concentrations, 100 units
+    per course) and then by their expected Phase 1 bid cost, which must stay within the
+    budget.
+
+    The search decides course by course whether to take it. Since a course's price does
+    not depend on the quarter, quarters only matter for the per-quarter load: a chosen
+    course is placed with an augmenting path over the quarter slots (moving earlier
+    courses to their other quarters if needed), so each set of courses is explored once
+    rather than once per arrangement. A branch is pruned when
+      - the course does not fit in any quarter or the cost would exceed the budget,
+      - the course does not reduce the unmet units given the courses already chosen, or
+      - even filling every free slot with the remaining candidates of each target cannot
+        beat the best plan (or only at a higher cost).
+    A greedy plan seeds the bound, and the search returns the best plan found when it
+    runs out of time or nodes.
+    """
+
+    def __init__(self, taken, concentrations, quarters, per_quarter: int = DEFAULT_COURSES_PER_QUARTER,
+                 budget: float = None, percentile: int = None, time_limit: float = DEFAULT_TIME_LIMIT):
+        self.taken = list(dict.fromkeys(taken))
+        self.concentrations = concentration_evaluator.with_required(concentrations)
+        self.quarters = list(quarters)
+        self.per_quarter = per_quarter
+        self.budget = budget
+        self.percentile = percentile
+        self.time_limit = time_limit
+        self.cache = {}
+
+        # Courses of each target (the degree, then each concentration), and the targets of each course
+        self.target_sets = [set(degree_ruleset.courses)]
+        for name in self.concentrations:
+            self.target_sets.append({course for bucket in concentration_evaluator.concentrations[name]["buckets"] for course in bucket["courses"]})
+        useful = set().union(*self.target_sets)
+        self.targets = {course: [target for target, courses in enumerate(self.target_sets) if course in courses] for course in useful}
+
+        # Useful courses offered in a planning quarter and not yet taken, with their quarters
+        self.offered = {}
+        for position, quarter in enumerate(self.quarters):
+            for row in catalog.by_quarter.get(quarter, ()):
+                course = catalog.columns["Course"][row]
+                if course in useful and course not in self.taken:
+                    self.offered.setdefault(course, set()).add(position)
+        self.offered = {course: sorted(positions) for course, positions in self.offered.items()}
+        self.prices = {course: expected_price(course, percentile) for course in self.offered}
+
+    def price(self, course: str) -> float:
+        return self.prices[course] or 0.0
+
+    def unmet_by_target(self, courses: tuple) -> tuple:
+        """
+        Requirement units still unmet with the given courses, for the degree and each target
+        concentration, memoized on the course set.
+        """
+        key = frozenset(courses)
+        if key not in self.cache:
+            audit = degree_ruleset.audit(courses)
+            units = [sum(group["needed"] for group in audit["groups"]) * COURSE_UNITS]
+            if self.concentrations:
+                evaluation = concentration_evaluator.evaluate(courses, self.concentrations)
+                units += [evaluation[name]["remaining"] for name in self.concentrations]
+            self.cache[key] = tuple(units)
+        return self.cache[key]
+
+    def place(self, course: str, assignment: dict, load: list) -> bool:
+        """
+        Put a course in one of its quarters, moving already placed courses to another of
+        their quarters when every quarter it is offered in is full.
+
+        Returns:
+            bool: Whether the course was placed (assignment and load are updated)
+        """
+        def augment(course: str, seen: set) -> bool:
+            for position in self.offered[course]:
+                if position in seen:
+                    continue
+                seen.add(position)
+                if load[position] < self.per_quarter:
+                    assignment[course] = position
+                    load[position] += 1
+                    return True
+                for other in [other for other, placed in assignment.items() if placed == position]:
+                    load[position] -= 1
+                    del assignment[other]
+                    if augment(other, seen):
+                        assignment[course] = position
+                        load[position] += 1
+                        return True
+                    assignment[other] = position
+                    load[position] += 1
+            return False
+
+        return augment(course, set())
+
+    def greedy(self) -> tuple:
+        """Repeatedly add the course that reduces the unmet units most, cheapest first."""
+        assignment, load, cost = {}, [0] * len(self.quarters), 0.0
+        unmet = self.unmet_by_target(tuple(self.taken))
+        while True:
+            courses = tuple(self.taken) + tuple(assignment)
+            options = sorted(
+                (sum(self.unmet_by_target(courses + (course,))) - sum(unmet), self.price(course), course)
+                for course in self.offered
+                if course not in assignment and (self.budget is None or cost + self.price(course) <= self.budget)
+            )
+            for gain, price, course in options:
+                if gain >= 0:
+                    return sum(unmet), cost, assignment
+                if self.place(course, assignment, load):
+                    cost += price
+                    unmet = self.unmet_by_target(courses + (course,))
+                    break
+            else:
+                return sum(unmet), cost, assignment
+
+    def search(self) -> dict:
+        """
+        Run the search.
+
+        Returns:
+            dict: "plan" (quarter -> [(course, expected price)]), "cost", "unmet_before",
+                  "unmet_after", "nodes", "seconds" and "exhaustive"
+        """
+        started = time.perf_counter()
+        deadline = started + self.time_limit
+        unmet_before = self.unmet_by_target(tuple(self.taken))
+        best = list(self.greedy())
+        capacity = self.per_quarter * len(self.quarters)
+        nodes = 0
+        stopped = False
+
+        # Courses counting towards more targets first, then cheap ones, so good plans are found early
+        order = sorted(self.offered, key=lambda course: (-len(self.targets[course]), self.price(course), course))
+
+        # Candidates from each position in the order on that count towards each target
+        remaining = np.zeros((len(order) + 1, len(self.target_sets)), dtype=np.int32)
+        for index in range(len(order) - 1, -1, -1):
+            remaining[index] = remaining[index + 1]
+            remaining[index, self.targets[order[index]]] += 1
+
+        def visit(index: int, assignment: dict, load: list, cost: float, unmet: tuple):
+            nonlocal nodes, stopped
+            nodes += 1
+            if nodes >= MAX_NODES or time.perf_counter() > deadline:
+                stopped = True
+                return
+            if (sum(unmet), cost) < (best[0], best[1]):
+                best[:] = [sum(unmet), cost, dict(assignment)]
+            if index >= len(order) or sum(unmet) == 0:
+                return
+
+            # Each course fills at most one degree category and 100 units of each concentration,
+            # so a target gains at most 100 units per free slot and per candidate left for it
+            slots = capacity - len(assignment)
+            bound = sum(max(units - COURSE_UNITS * min(slots, int(left)), 0) for units, left in zip(unmet, remaining[index]))
+            if (bound, cost) >= (best[0], best[1]):
+                return
+
+            course, price = order[index], self.price(order[index])
+            if slots and (self.budget is None or cost + price <= self.budget):
+                with_course = self.unmet_by_target(tuple(self.taken) + tuple(assignment) + (course,))
+                placed, placed_load = dict(assignment), list(load)
+                if sum(with_course) < sum(unmet) and self.place(course, placed, placed_load):
+                    visit(index + 1, placed, placed_load, cost + price, with_course)
+                    if stopped:
+                        return
+            visit(index + 1, assignment, load, cost, unmet)
+
+        visit(0, {}, [0] * len(self.quarters), 0.0, unmet_before)
+
+        unmet_after, cost, assignment = best
+        plan = {quarter: [] for quarter in self.quarters}
+        for course, position in sorted(assignment.items()):
+            plan[self.quarters[position]].append((course, self.prices[course]))
+        return {
+            "plan": plan,
+            "cost": cost,
+            "unmet_before": sum(unmet_before),
+            "unmet_after": unmet_after,
+            "nodes": nodes,
+            "seconds": time.perf_counter() - started,
+            "exhaustive": not stopped
+        }
+
+
+def parse_plan_request(text: str) -> dict:
+    """
+    Read the planning parameters from a question.
+
+    Recognizes course numbers already taken, concentration names, quarters such as
+    "Winter 2025" (default: every quarter in the catalog), "N courses per quarter",
+    "N points" as the bid budget and "safe"/"conservative" to price at the 75th
+    percentile instead of the forecast.
+    """
+    lowered = text.lower()
+    quarters = sorted(catalog.by_quarter, key=quarter_sort_key)
+    named_quarters = [quarter for quarter in quarters if quarter.lower() in lowered]
+    per_quarter = re.search(r"(\d+)\s+(?:courses|classes)\s+(?:per|a|each)\s+quarter", lowered)
+    budget = re.search(r"(\d[\d,]*)\s*(?:bid\s+)?points", lowered)
+    return {
+        "taken": COURSE_PATTERN.findall(text),
+        "concentrations": [name for name in concentration_evaluator.names if re.search(r"\b" + re.escape(name.lower()) + r"\b", lowered)],
+        "quarters": named_quarters or quarters,
+        "per_quarter": int(per_quarter.group(1)) if per_quarter else DEFAULT_COURSES_PER_QUARTER,
+        "budget": float(budget.group(1).replace(",", "")) if budget else None,
+        "percentile": 75 if re.search(r"\b(safe|conservative)\b", lowered) else None
+    }
+
+
+def format_plan(result: dict, request: dict) -> str:
+    """Render a search() result."""
+    pricing = "75th percentile" if request["percentile"] else "forecast"
+    lines = [f"Course plan for {', '.join(request['concentrations']) or 'the degree requirements'} "
+             f"({request['per_quarter']} courses per quarter max, Phase 1 prices at the {pricing}"
+             + (f", budget {request['budget']:.0f} points" if request["budget"] is not None else "") + "):"]
+    for quarter, courses in result["plan"].items():
+        lines.append(f"{quarter}:")
+        for course, price in courses:
+            title = COURSE_MAPPING.get(course, "")
+            lines.append(f"  {course} {title} - " + (f"expected {price:.0f} points" if price is not None else "no bid history"))
+        if not courses:
+            lines.append("  (nothing needed)")
+    lines.append(f"Expected bid cost: {result['cost']:.0f} points")
+    lines.append(f"Unmet requirement units: {result['unmet_before']} before, {result['unmet_after']} after this plan")
+    if result["unmet_after"]:
+        lines.append("Some requirements cannot be met with the courses offered in these quarters" + (" within the budget." if request["budget"] is not None else "."))
+    lines.append(f"Explored {result['nodes']} search nodes in {result['seconds']:.2f}s" + ("" if result["exhaustive"] else " (stopped at the search limit; best plan found so far)"))
+    return "\n".join(lines)
+
+
+@tool
+def course_planner(text: str) -> str:
+    """
+    Plan which courses to take in each upcoming quarter to finish the degree requirements and
+    one or more concentrations at the lowest expected bid cost.
+    Input: the courses already taken (course numbers), the concentrations wanted, and optionally
+    the quarters, "N courses per quarter", a bid budget in points, and "safe" for conservative prices.
+    Example: "Taken 30000, 35000, 37000. Plan Finance, 3 courses per quarter, budget 8000 points"
+    """
+    request = parse_plan_request(text)
+    planner = CoursePlanner(**request)
+    return format_plan(planner.search(), request)
+
+
+if __name__ == "__main__":
+    test_queries = [
+        "I have taken 30000, 35000, 37000, 33001 and 40000. Plan the Finance concentration.",
+        "Taken 30000, 35000, 37000, 33001, 40000, 41000. Plan Business Analytics with 3 courses per quarter and a budget of 2000 points, safe",
+    ]
+    for query in test_queries:
+        print(f"\nQuery: {query}")
+        print(course_planner.invoke(query))
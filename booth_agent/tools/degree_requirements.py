@@ -1,13 +1,16 @@
 from langchain_core.tools import tool
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from dotenv import load_dotenv
+import numpy as np
+import re
+from tools.course_csv_loaders.course_name_finder import COURSE_MAPPING
+from tools.single_flight import CoalescingChatOpenAI
 
 # Load environment variables
 load_dotenv()
 
 # Initialize the language model
-llm = ChatOpenAI(
+llm = CoalescingChatOpenAI(
     temperature=0,
     model="gpt-4o-mini"
 )
@@ -35,6 +38,317 @@ Economy	33050 (or 33040) or 33112	33401, 33403, 33501, 33502, 33503, 33520
 Society 	33305, 33471, 37212, or 38119	30133, 33251 (along with enrollment in 33250),34113, 34117, 38115, 38126, 42201
 """
 
+# Course references in the requirement lists ("30000", "ECON 30100")
+COURSE_PATTERN = re.compile(r"(?:\b[A-Z]{3,4} )?\b\d{5}\b")
+
+# Questions about progress towards the degree, answered with an audit of the courses listed
+AUDIT_PATTERN = re.compile(r"\b(taken|took|take|completed|finished|done|have|audit|remaining|left|need|missing|satisf\w*|fulfil\w*)\b")
+
+# Wording that presents the courses as the student's transcript, so even a single course is audited
+TRANSCRIPT_PATTERN = re.compile(
+    r"\b(i|we)('ve|\s+have|\s+had)?(\s+already|\s+only)?\s+(taken|took|completed|finished|done|passed|have)\b"
+    r"|\b(ive|my|transcript|audit|so far|what's left|what is left|remaining)\b"
+)
+
+# Questions about the requirement categories a single course counts towards
+COURSE_CATEGORY_PATTERN = re.compile(r"\b(requirements?|categor\w*|counts?|satisf\w*|fulfil\w*|fills?|meets?)\b")
+
+
+def parse_course_list(text: str):
+    """
+    Parse one requirement's list of courses.
+
+    "30005 (or 30001)" makes 30001 an equivalent option. "33251 (along with enrollment
+    in 33250)" makes 33251 count only together with 33250, which is not an option itself.
+
+    Returns:
+        tuple: (options in listed order, {course: courses it must be taken with})
+    """
+    options, couplings = [], {}
+    for match in re.finditer(r"(\b[A-Z]{3,4} )?\b\d{5}\b|\(([^)]*)\)", text):
+        if match.group(2) is None:
+            options.append(match.group(0))
+        elif re.search(r"\b(along with|with)\b", match.group(2)) and options:
+            couplings[options[-1]] = set(COURSE_PATTERN.findall(match.group(2)))
+        else:
+            options.extend(COURSE_PATTERN.findall(match.group(2)))
+    return list(dict.fromkeys(options)), couplings
+
+
+class DegreeRuleset:
+    """
+    The MBA degree requirements as categories of courses grouped under choose-k rules.
+
+    Every course that appears in a requirement gets a bit position. Categories and
+    transcripts are integer bitsets over those positions, so finding the courses of a
+    transcript that can fill a category is a single AND. Courses that only count
+    together with another course (33251 with 33250) are dropped from a transcript's
+    bitset when their partner is missing. Each course fills at most one category; the
+    assignment is a bipartite matching that fills the required categories first.
+    """
+
+    def __init__(self, groups: list, couplings: dict):
+        self.groups = groups
+        self.couplings = couplings
+        self.categories = [category for group in groups for category in group["categories"]]
+        self.courses = list(dict.fromkeys(course for category in self.categories for course in category["courses"]))
+        self.bits = {course: position for position, course in enumerate(self.courses)}
+        for category in self.categories:
+            category["mask"] = self.mask(category["courses"])
+            category["positions"] = np.array([self.bits[course] for course in category["courses"]])
+        self.by_name = {category["name"].lower(): category for category in self.categories}
+
+        # Dense course x category membership for auditing many transcripts at once
+        self.membership = np.zeros((len(self.courses), len(self.categories)), dtype=np.int32)
+        for column, category in enumerate(self.categories):
+            for course in category["courses"]:
+                self.membership[self.bits[course], column] = 1
+
+    @classmethod
+    def from_text(cls, text: str):
+        """
+        Parse DEGREE_REQUIREMENTS.
+
+        "You have to take 1 course each" starts the required group; "Select one each from
+        seven of the following eight" starts a choose-7 group. Each following line is a
+        category name and its course list.
+        """
+        groups, couplings = [], {}
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            header = re.search(r"take 1 course each|select one each from (\w+) of the following (\w+)", line, re.IGNORECASE)
+            if header:
+                words = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9}
+                groups.append({
+                    "name": "Required" if header.group(1) is None else "Breadth",
+                    "choose": None if header.group(1) is None else words[header.group(1).lower()],
+                    "categories": []
+                })
+                continue
+            match = re.match(r"([A-Za-z][A-Za-z ]*?)\s*(?::|\t|\s{2,})\s*(.*\d{5}.*)$", line)
+            if match and groups:
+                options, category_couplings = parse_course_list(match.group(2))
+                couplings.update(category_couplings)
+                groups[-1]["categories"].append({"name": match.group(1).strip(), "group": groups[-1]["name"], "courses": options})
+
+        for group in groups:
+            if group["choose"] is None:
+                group["choose"] = len(group["categories"])
+        return cls(groups, couplings)
+
+    def mask(self, courses) -> int:
+        """Bitset of the given courses (courses outside the requirements are ignored)."""
+        mask = 0
+        for course in courses:
+            if course in self.bits:
+                mask |= 1 << self.bits[course]
+        return mask
+
+    def transcript_mask(self, courses) -> int:
+        """Bitset of a transcript's countable courses, without coupled courses whose partner is missing."""
+        courses = set(courses)
+        return self.mask(course for course in courses if self.couplings.get(course, set()) <= courses)
+
+    def match(self, transcript: int) -> dict:
+        """
+        Assign transcript courses to categories, one course per category and one category per course.
+
+        Required categories are matched before breadth categories; augmenting paths never
+        unassign a category, so required categories keep their course.
+
+        Returns:
+            dict: Category index -> assigned course
+        """
+        assigned_course = {}
+        assigned_category = {}
+
+        def augment(category_index: int, seen: set) -> bool:
+            candidates = self.categories[category_index]["mask"] & transcript
+            while candidates:
+                bit = candidates & -candidates
+                candidates ^= bit
+                position = bit.bit_length() - 1
+                if position in seen:
+                    continue
+                seen.add(position)
+                if position not in assigned_category or augment(assigned_category[position], seen):
+                    assigned_category[position] = category_index
+                    assigned_course[category_index] = self.courses[position]
+                    return True
+            return False
+
+        for category_index in range(len(self.categories)):
+            augment(category_index, set())
+        return {category_index: course for category_index, course in sorted(assigned_course.items())}
+
+    def audit(self, courses) -> dict:
+        """
+        Check a transcript against the degree requirements.
+
+        Args:
+            courses: Course numbers taken or planned
+
+        Returns:
+            dict: Per-group filled and missing categories, whether the degree
+                  requirements are complete, and courses that do not count
+        """
+        courses = list(dict.fromkeys(courses))
+        return self.audit_result(courses, self.match(self.transcript_mask(courses)))
+
+    def audit_result(self, courses: list, assignment: dict) -> dict:
+        """Build the audit() result from a category -> course assignment."""
+        groups, complete, index = [], True, 0
+        for group in self.groups:
+            filled, missing = {}, []
+            for category in group["categories"]:
+                if index in assignment:
+                    filled[category["name"]] = assignment[index]
+                else:
+                    missing.append(category["name"])
+                index += 1
+            needed = max(group["choose"] - len(filled), 0)
+            complete = complete and needed == 0
+            groups.append({"name": group["name"], "choose": group["choose"], "filled": filled, "missing": missing, "needed": needed})
+
+        used = set(assignment.values())
+        uncoupled = [course for course in courses if not self.couplings.get(course, set()) <= set(courses)]
+        return {
+            "complete": complete,
+            "groups": groups,
+            "unused": [course for course in courses if course not in used and course not in uncoupled],
+            "missing_partner": {course: sorted(self.couplings[course]) for course in uncoupled}
+        }
+
+    def audit_many(self, transcripts: list) -> list:
+        """
+        Audit many transcripts at once.
+
+        The transcripts are stacked into a transcripts x courses matrix. Multiplying it by
+        the course x category membership matrix gives every transcript's candidate count
+        per category in one product, and an argmax per category picks the course that
+        fills it. Transcripts that hold a course listed in several categories could have
+        conflicting assignments and go through the matching in audit() instead.
+
+        Returns:
+            list: One audit() result per transcript
+        """
+        transcripts = [list(dict.fromkeys(courses)) for courses in transcripts]
+        taken = np.zeros((len(transcripts), len(self.courses)), dtype=np.int32)
+        for row, courses in enumerate(transcripts):
+            countable = set(courses)
+            for course in courses:
+                if course in self.bits and self.couplings.get(course, set()) <= countable:
+                    taken[row, self.bits[course]] = 1
+
+        candidates = taken @ self.membership
+        shared = (taken[:, self.membership.sum(axis=1) > 1]).any(axis=1)
+        picks = np.stack([
+            np.where(candidates[:, column] > 0, np.argmax(taken[:, category["positions"]], axis=1), -1)
+            for column, category in enumerate(self.categories)
+        ], axis=1)
+
+        results = []
+        for row, courses in enumerate(transcripts):
+            if shared[row]:
+                results.append(self.audit(courses))
+                continue
+            assignment = {
+                column: self.categories[column]["courses"][pick]
+                for column, pick in enumerate(picks[row].tolist()) if pick >= 0
+            }
+            results.append(self.audit_result(courses, assignment))
+        return results
+
+    def format_category(self, category: dict) -> str:
+        """List a category's courses with their titles."""
+        lines = [f"{category['name']} ({category['group']}): any one of"]
+        for course in category["courses"]:
+            title = COURSE_MAPPING.get(course)
+            note = f" (counts only with {', '.join(sorted(self.couplings[course]))})" if course in self.couplings else ""
+            lines.append(f"  {course}" + (f" - {title}" if title else "") + note)
+        return "\n".join(lines)
+
+    def format_requirements(self) -> str:
+        """Summarise the whole ruleset."""
+        lines = []
+        for group in self.groups:
+            lines.append(f"{group['name']}: one course each from {group['choose']} of these {len(group['categories'])} categories")
+            for category in group["categories"]:
+                lines.append(f"  {category['name']}: {', '.join(category['courses'])}")
+        for course, partners in self.couplings.items():
+            lines.append(f"{course} only counts together with {', '.join(sorted(partners))}.")
+        return "\n".join(lines)
+
+    def format_course(self, course: str) -> str:
+        """The requirement categories a single course counts towards."""
+        title = COURSE_MAPPING.get(course)
+        name = course + (f" - {title}" if title else "")
+        categories = [category for category in self.categories if course in category["courses"]]
+        if not categories:
+            return f"{name} does not count towards any degree requirement category."
+        lines = [f"{name} counts towards " + " or ".join(f"{category['name']} ({category['group']})" for category in categories) + "."]
+        if len(categories) > 1:
+            lines.append("A course fills only one of these categories.")
+        if course in self.couplings:
+            lines.append(f"It only counts together with {', '.join(sorted(self.couplings[course]))}.")
+        return "\n".join(lines)
+
+    def format_audit(self, audit: dict) -> str:
+        """Render an audit() result."""
+        lines = ["All degree requirements are satisfied." if audit["complete"] else "Degree requirements are not yet complete."]
+        for group in audit["groups"]:
+            filled = ", ".join(f"{name} ({course})" for name, course in group["filled"].items()) or "none"
+            lines.append(f"{group['name']} ({len(group['filled'])} of {group['choose']} needed): filled {filled}")
+            if group["needed"]:
+                lines.append(f"  Still needed: {group['needed']} more from {', '.join(group['missing'])}")
+        if audit["unused"]:
+            lines.append(f"Not counted towards these requirements: {', '.join(audit['unused'])}")
+        for course, partners in audit["missing_partner"].items():
+            lines.append(f"{course} only counts together with {', '.join(partners)}.")
+        return "\n".join(lines)
+
+    def answer(self, question: str):
+        """
+        Answer listing and audit questions deterministically.
+
+        Courses are audited as a transcript when the question lists several of them, or
+        a single one in transcript wording ("I have taken 30000, what is left?"). A
+        question about a single course otherwise gets the categories it counts towards.
+
+        Returns:
+            str: The answer, or None if the question needs the LLM
+        """
+        transcripts = [COURSE_PATTERN.findall(line) for line in question.splitlines()]
+        transcripts = [courses for courses in transcripts if courses]
+        lowered = question.lower().replace("’", "'")
+        several = len(transcripts) > 1 or (transcripts and len(set(transcripts[0])) > 1)
+
+        if transcripts and not several and not TRANSCRIPT_PATTERN.search(lowered):
+            return self.format_course(transcripts[0][0]) if COURSE_CATEGORY_PATTERN.search(lowered) else None
+
+        if transcripts and AUDIT_PATTERN.search(lowered):
+            if len(transcripts) > 1:
+                return "\n\n".join(f"Transcript {number}: {', '.join(courses)}\n{self.format_audit(audit)}"
+                                    for number, (courses, audit) in enumerate(zip(transcripts, self.audit_many(transcripts)), start=1))
+            return self.format_audit(self.audit(transcripts[0]))
+
+        if transcripts:
+            return None
+
+        categories = [category for name, category in self.by_name.items() if re.search(r"\b" + re.escape(name) + r"\b", lowered)]
+        if categories and not re.search(r"\b(recommend\w*|should|best|easiest|prefer\w*|why)\b", lowered):
+            return "\n\n".join(self.format_category(category) for category in categories)
+
+        if re.search(r"\b(what are|list|show)\b.*\b(degree|mba|core|graduation)\b.*\brequirements?\b", lowered):
+            return self.format_requirements()
+        return None
+
+
+# Parse the requirements once
+degree_ruleset = DegreeRuleset.from_text(DEGREE_REQUIREMENTS)
+
 # Create the prompt template
 COURSE_PLANNER_PROMPT = PromptTemplate.from_template(
     """You are a course planning assistant for the Booth School of Business MBA program. 
@@ -62,7 +376,13 @@ COURSE_PLANNER_PROMPT = PromptTemplate.from_template(
 def degree_requirements_checker(text: str):
     """
     A tool for students at the Booth School of Business to determine what courses they need to take to fulfill their degree requirements.
+    It lists the courses of a requirement category and audits a list of courses taken (one transcript per line).
     """
+    # Listing and audit questions are answered from the parsed ruleset without the LLM
+    answer = degree_ruleset.answer(text)
+    if answer is not None:
+        return answer
+
     try:
         # Generate the prompt with the student's query
         prompt = COURSE_PLANNER_PROMPT.format(
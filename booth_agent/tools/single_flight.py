@@ -0,0 +1,190 @@
+from concurrent.futures import CancelledError, Future
+from functools import wraps
+from threading import Lock
+import asyncio
+import inspect
+import json
+from langchain_openai import ChatOpenAI, OpenAI
+from tools.tool_memo import ToolMemo
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one computation.
+
+    The first caller of a key (the leader) runs the function; callers arriving while it
+    runs wait for it and receive the same result or exception. Nothing is kept once the
+    call finishes, so a later call computes again (memoization is tool_memo's job). If
+    the leader is cancelled, for example because its client disconnected, a waiting
+    caller takes over instead of failing with it.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = Lock()
+        self.stats = {"calls": 0, "shared": 0}
+
+    def _join(self, key: str) -> tuple:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.stats["shared"] += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.stats["calls"] += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future, result=None, error: BaseException = None):
+        with self._lock:
+            del self._calls[key]
+        if isinstance(error, (asyncio.CancelledError, CancelledError)):
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, func, *args, **kwargs) -> tuple:
+        """
+        Run func(*args, **kwargs), or wait for the identical call already in flight.
+
+        Returns:
+            tuple: (result, whether it was shared with a call made by another caller)
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException as e:
+                    self._finish(key, future, error=e)
+                    raise
+                self._finish(key, future, result)
+                return result, False
+            try:
+                return future.result(), True
+            except CancelledError:
+                continue
+
+    async def ado(self, key: str, func, *args, **kwargs) -> tuple:
+        """
+        Async version of do() for a coroutine function; callers may run on different event loops.
+
+        Returns:
+            tuple: (result, whether it was shared with a call made by another caller)
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException as e:
+                    self._finish(key, future, error=e)
+                    raise
+                self._finish(key, future, result)
+                return result, False
+            try:
+                # Shielded, so a waiter being cancelled does not cancel the leader's call
+                return await asyncio.shield(asyncio.wrap_future(future)), True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+
+    def snapshot(self) -> dict:
+        """Calls computed, calls that shared another caller's computation, and calls in flight."""
+        with self._lock:
+            return {**self.stats, "in_flight": len(self._calls)}
+
+
+# Initialize the coalescing groups for LLM completions and tool calls
+llm_flight = SingleFlight()
+tool_flight = SingleFlight()
+
+
+def flight_key(model, params: dict, inputs) -> str:
+    """Key of an LLM call: the model class, its invocation parameters and its prompt."""
+    return json.dumps({"model": type(model).__name__, "params": params, "inputs": inputs}, sort_keys=True, default=str)
+
+
+def without_usage(result):
+    """
+    Copy of a shared LLM result without token usage, so the tokens are accounted only to
+    the request that actually spent them.
+    """
+    result = result.model_copy(deep=True)
+    # A ChatResult holds a list of generations, an LLMResult a list per prompt
+    for item in result.generations:
+        for generation in item if isinstance(item, list) else [item]:
+            if getattr(generation, "message", None) is not None:
+                generation.message.usage_metadata = None
+    if result.llm_output:
+        result.llm_output = {key: value for key, value in result.llm_output.items() if key != "token_usage"}
+    return result
+
+
+class CoalescingChatMixin:
+    """
+    Mixin for chat models that shares identical concurrent completions.
+
+    Calls with the same messages and invocation parameters (model, temperature, stop
+    words, ...) made while one is in flight wait for it instead of sending another
+    request. Streamed calls (with token callbacks) are not coalesced.
+    """
+
+    def _message_key(self, method: str, messages, stop, kwargs) -> str:
+        inputs = [(message.type, message.content, message.additional_kwargs) for message in messages]
+        return method + ":" + flight_key(self, self._get_invocation_params(stop=stop, **kwargs), inputs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._message_key("generate", messages, stop, kwargs)
+        result, shared = llm_flight.do(key, super()._generate, messages, stop=stop, run_manager=run_manager, **kwargs)
+        return without_usage(result) if shared else result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._message_key("agenerate", messages, stop, kwargs)
+        result, shared = await llm_flight.ado(key, super()._agenerate, messages, stop=stop, run_manager=run_manager, **kwargs)
+        return without_usage(result) if shared else result
+
+
+class CoalescingLLMMixin:
+    """Mixin for completion models that shares identical concurrent batches of prompts."""
+
+    def _prompt_key(self, method: str, prompts, stop, kwargs) -> str:
+        return method + ":" + flight_key(self, {**self._identifying_params, "stop": stop, **kwargs}, prompts)
+
+    def _generate(self, prompts, stop=None, run_manager=None, **kwargs):
+        key = self._prompt_key("generate", prompts, stop, kwargs)
+        result, shared = llm_flight.do(key, super()._generate, prompts, stop=stop, run_manager=run_manager, **kwargs)
+        return without_usage(result) if shared else result
+
+    async def _agenerate(self, prompts, stop=None, run_manager=None, **kwargs):
+        key = self._prompt_key("agenerate", prompts, stop, kwargs)
+        result, shared = await llm_flight.ado(key, super()._agenerate, prompts, stop=stop, run_manager=run_manager, **kwargs)
+        return without_usage(result) if shared else result
+
+
+class CoalescingChatOpenAI(CoalescingChatMixin, ChatOpenAI):
+    """ChatOpenAI that sends one request for identical concurrent completions."""
+
+
+class CoalescingOpenAI(CoalescingLLMMixin, OpenAI):
+    """OpenAI completion model that sends one request for identical concurrent batches of prompts."""
+
+
+def coalesce_tool(tool, flight: SingleFlight = tool_flight):
+    """Copy of a tool whose identical concurrent calls share one run."""
+    func = tool.func
+
+    @wraps(func)
+    def coalesced(*args, **kwargs):
+        if args:
+            kwargs = {**dict(zip(inspect.signature(func).parameters, args)), **kwargs}
+        key = tool.name + ":" + ToolMemo.make_key(kwargs)
+        return flight.do(key, func, **kwargs)[0]
+
+    return tool.model_copy(update={"func": coalesced})
+
+
+def coalesce_tools(tools: list) -> list:
+    """Coalesce identical concurrent calls of every tool of an agent."""
+    return [coalesce_tool(tool) for tool in tools]
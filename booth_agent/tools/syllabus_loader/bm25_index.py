@@ -0,0 +1,132 @@
+from collections import Counter
+from pathlib import Path
+import json
+import math
+import re
+
+# Words too common in syllabi and questions to help ranking
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i",
+    "in", "is", "it", "its", "me", "my", "of", "on", "or", "the", "this", "to", "we", "what", "when",
+    "where", "which", "who", "will", "with", "you", "your"
+}
+
+
+def tokenize(text: str) -> list:
+    """Lower-case the text and split it into alphanumeric terms, dropping stopwords."""
+    return [term for term in re.findall(r"[a-z0-9]+", text.lower()) if term not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index of the syllabus chunks.
+
+    Scoring is done locally from the postings lists, so a lexical search needs no
+    query embedding. Every chunk also carries its course number so searches can be
+    restricted to the same per-course partitions as the vector search.
+    """
+
+    def __init__(self, doc_ids: list, courses: list, postings: dict, doc_lengths: list, k1: float = 1.5, b: float = 0.75):
+        self.doc_ids = doc_ids
+        self.courses = courses
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.average_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        self.idf = {
+            term: math.log(1 + (len(doc_ids) - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for term, term_postings in postings.items()
+        }
+
+    @classmethod
+    def from_documents(cls, doc_ids: list, documents: list):
+        """
+        Build the inverted index.
+
+        Args:
+            doc_ids (list): Vector-store ids of the chunks
+            documents (list): Chunk documents, in the same order as doc_ids
+        """
+        postings = {}
+        doc_lengths = []
+        for position, document in enumerate(documents):
+            terms = tokenize(document.page_content)
+            doc_lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                postings.setdefault(term, []).append([position, frequency])
+
+        courses = [document.metadata.get("course") for document in documents]
+        return cls(list(doc_ids), courses, postings, doc_lengths)
+
+    @classmethod
+    def from_store(cls, store):
+        """Build the inverted index over every chunk of a FAISS store."""
+        doc_ids = [store.index_to_docstore_id[position] for position in sorted(store.index_to_docstore_id)]
+        return cls.from_documents(doc_ids, [store.docstore.search(doc_id) for doc_id in doc_ids])
+
+    def search(self, query: str, k: int = 4, courses=None) -> list:
+        """
+        Rank chunks against the query terms.
+
+        Args:
+            query (str): The question text
+            k (int): Number of chunks to return
+            courses: Optional course numbers to restrict the search to
+
+        Returns:
+            list: (chunk id, BM25 score) pairs, best first
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, frequency in self.postings[term]:
+                if courses is not None and self.courses[position] not in courses:
+                    continue
+                length_norm = 1 - self.b + self.b * self.doc_lengths[position] / self.average_length
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.doc_ids[position], score) for position, score in ranked]
+
+    def save(self, path):
+        """Persist the index as JSON next to the FAISS files."""
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({
+                "doc_ids": self.doc_ids,
+                "courses": self.courses,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths,
+                "k1": self.k1,
+                "b": self.b
+            }, file)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved with save(), or return None if there is none."""
+        if not Path(path).exists():
+            return None
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        return cls(data["doc_ids"], data["courses"], data["postings"], data["doc_lengths"], data["k1"], data["b"])
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 4, rrf_k: int = 60) -> list:
+    """
+    Fuse several ranked lists of chunk ids by reciprocal rank.
+
+    Args:
+        rankings (list): Lists of chunk ids, best first
+        k (int): Number of fused ids to return
+        rrf_k (int): Rank offset that damps the influence of the top positions
+
+    Returns:
+        list: Fused chunk ids, best first
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]]
@@ -1,15 +1,20 @@
 from langchain_core.tools import tool
-from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import OpenAIEmbeddings
 from langchain.prompts import PromptTemplate
 from langchain.chains.question_answering import load_qa_chain
-from langchain_openai import OpenAI
 from langchain.output_parsers import RegexParser
+from langchain_core.callbacks import BaseCallbackHandler, CallbackManager, Callbacks
 from pathlib import Path
+from threading import Lock
+import argparse
 import os
+import re
+import time
 from dotenv import load_dotenv
+from tools.syllabus_loader.syllabus_index import INDEX_DIR, CoursePartitions, load_bm25_index, load_or_build_index
+from tools.syllabus_loader.bm25_index import reciprocal_rank_fusion
+from tools.course_csv_loaders.course_name_finder import COURSE_MAPPING
+from tools.single_flight import CoalescingOpenAI
 
 # Load environment variables
 load_dotenv()
@@ -26,48 +31,76 @@ docs_dir.mkdir(parents=True, exist_ok=True)
 def initialize_syllabus_loader():
     """Initialize the syllabus loader and embeddings."""
     try:
-        # Check if docs directory is empty
-        if not any(docs_dir.iterdir()):
-            print(f"Warning: No PDF files found in {docs_dir}. Please add syllabus PDFs to this directory.")
-            return None
-            
-        # Load PDF documents
-        loader = DirectoryLoader(str(docs_dir), glob="./*.pdf", loader_cls=PyPDFLoader)
-        documents = loader.load()
-        
-        if not documents:
-            print(f"Warning: No PDF documents were loaded from {docs_dir}")
-            return None
-        
-        # Split documents into chunks
-        chunk_size_value = 1000
-        chunk_overlap = 100
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size_value, 
-            chunk_overlap=chunk_overlap,
-            length_function=len
-        )
-        texts = text_splitter.split_documents(documents)
-        
-        # Create embeddings
-        embeddings = FAISS.from_documents(texts, OpenAIEmbeddings())
-        
-        # Save and load embeddings (for persistence)
-        embeddings.save_local("llm_faiss_index")
-        embeddings = FAISS.load_local(
-            "llm_faiss_index", 
-            OpenAIEmbeddings(), 
-            allow_dangerous_deserialization=True
-        )
-        
-        return embeddings
+        # Memory-load the persisted index; the PDFs are only re-embedded when their
+        # content hashes or the splitter settings no longer match the saved manifest
+        return load_or_build_index(OpenAIEmbeddings(), docs_dir, INDEX_DIR)
     except Exception as e:
         print(f"Error initializing syllabus loader: {str(e)}")
         return None
 
+# Answering strategies: "stuff" answers from all retrieved chunks in a single completion,
+# "map_rerank" scores one completion per chunk and keeps the best one
+ANSWER_STRATEGIES = ("stuff", "map_rerank")
+ANSWER_STRATEGY = os.getenv("SYLLABUS_QA_STRATEGY", "stuff")
+
+# Number of chunks retrieved per question
+RETRIEVAL_K = 2
+
+# Retrieval modes: "lexical" (local BM25 only, no query embedding), "vector" (FAISS only)
+# or "hybrid" (both, fused by reciprocal rank)
+RETRIEVAL_MODES = ("lexical", "vector", "hybrid")
+RETRIEVAL_MODE = os.getenv("SYLLABUS_RETRIEVAL_MODE", "hybrid")
+
+# Candidates taken from each retriever before hybrid fusion
+FUSION_DEPTH = 10
+
+class LLMCallCounter(BaseCallbackHandler):
+    """Callback handler that counts the LLM completions made during one answer."""
+
+    def __init__(self):
+        self.llm_calls = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.llm_calls += len(prompts)
+
+def with_counter(callbacks: Callbacks, counter: LLMCallCounter) -> CallbackManager:
+    """
+    The callbacks inherited from the tool run plus the counter, so the request's handlers
+    (usage tracking, thinking traces) still see the nested LLM calls.
+    """
+    manager = CallbackManager.configure(inheritable_callbacks=callbacks)
+    manager.add_handler(counter)
+    return manager
+
+class StrategyStats:
+    """Running totals of answers, LLM calls and latency for each answering strategy."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._totals = {}
+
+    def record(self, strategy: str, llm_calls: int, seconds: float):
+        with self._lock:
+            totals = self._totals.setdefault(strategy, {"answers": 0, "llm_calls": 0, "seconds": 0.0})
+            totals["answers"] += 1
+            totals["llm_calls"] += llm_calls
+            totals["seconds"] += seconds
+
+    def summary(self) -> dict:
+        """Per-strategy totals plus LLM calls and latency per answer."""
+        with self._lock:
+            return {
+                strategy: {
+                    **totals,
+                    "llm_calls_per_answer": totals["llm_calls"] / totals["answers"],
+                    "seconds_per_answer": totals["seconds"] / totals["answers"]
+                }
+                for strategy, totals in self._totals.items()
+            }
+
 # Initialize the QA chain
 def initialize_qa_chain():
-    """Initialize the question answering chain."""
+    """Initialize the map_rerank question answering chain (one completion per chunk)."""
     prompt_template = """Use the following pieces of context to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer.
 
     This should be in the following format:
@@ -97,18 +130,188 @@ def initialize_qa_chain():
     )
     
     return load_qa_chain(
-        OpenAI(temperature=0), 
+        llm, 
         chain_type="map_rerank", 
         return_intermediate_steps=True, 
         prompt=PROMPT
     )
 
+STUFF_PROMPT = PromptTemplate.from_template(
+    """Use the numbered syllabus excerpts below to answer the question at the end. If you don't know the answer, just say that you don't know, don't try to make up an answer.
+
+    Cite every excerpt you rely on by its number in square brackets, e.g. [1] or [1][2].
+
+    Excerpts:
+    ---------
+    {context}
+    ---------
+    Question: {question}
+    Helpful Answer:"""
+)
+
+def format_excerpts(chunk_docs) -> str:
+    """Number the retrieved chunks and label them with their source file and page."""
+    return "\n\n".join(
+        f"[{number}] ({Path(doc.metadata.get('source', '')).name}, page {doc.metadata.get('page', 0) + 1})\n{doc.page_content}"
+        for number, doc in enumerate(chunk_docs, start=1)
+    )
+
+def build_title_lookup() -> dict:
+    """Map lower-cased course titles to the course numbers that carry them."""
+    lookup = {}
+    for course_number, title in COURSE_MAPPING.items():
+        lookup.setdefault(title.strip().lower(), set()).add(course_number)
+    return lookup
+
+def resolve_courses(query: str) -> tuple:
+    """
+    Find the courses a question is about, from course numbers or catalog titles in it.
+
+    Titles are matched as whole phrases, and a title contained in a longer matched
+    title (e.g. "Investments" inside "Advanced Investments") is ignored.
+
+    Returns:
+        tuple: (set of course numbers, True if they were given as explicit numbers)
+    """
+    numbers = set(re.findall(r"\b(\d{5})\b", query))
+    if numbers:
+        return numbers, True
+
+    lowered = query.lower()
+    matches = []
+    for title, courses in title_lookup.items():
+        for match in re.finditer(r"\b" + re.escape(title) + r"\b", lowered):
+            matches.append((match.start(), match.end(), courses))
+
+    courses = set()
+    for start, end, title_courses in matches:
+        if not any(other_start <= start and end <= other_end and (other_end - other_start) > (end - start)
+                   for other_start, other_end, _ in matches):
+            courses |= title_courses
+    return courses, False
+
+def search_chunks(query: str, mode: str, courses=None, k: int = RETRIEVAL_K) -> list:
+    """
+    Retrieve the top k chunks with the given retrieval mode.
+
+    Args:
+        query (str): The question text
+        mode (str): One of RETRIEVAL_MODES
+        courses: Optional course numbers whose partitions are searched
+        k (int): Number of chunks to return
+
+    Returns:
+        list: Chunk documents, best first
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown syllabus retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+
+    lexical_ids = []
+    if mode in ("lexical", "hybrid"):
+        lexical_ids = [doc_id for doc_id, _ in bm25.search(query, FUSION_DEPTH if mode == "hybrid" else k, courses)]
+        if mode == "lexical":
+            return [embeddings.docstore.search(doc_id) for doc_id in lexical_ids]
+
+    depth = FUSION_DEPTH if mode == "hybrid" else k
+    if courses:
+        vector_chunks = partitions.similarity_search_with_score(query, courses, k=depth)
+    else:
+        vector_chunks = embeddings.similarity_search_with_score(query, k=depth)
+    vector_docs = [chunk[0] for chunk in vector_chunks]
+    if mode == "vector":
+        return vector_docs
+
+    fused_ids = reciprocal_rank_fusion([lexical_ids, [doc.id for doc in vector_docs]], k=k)
+    return [embeddings.docstore.search(doc_id) for doc_id in fused_ids]
+
+def retrieve_chunks(query: str, mode: str = None) -> list:
+    """
+    Retrieve the chunks for a question, searching only the partitions of the courses it names.
+
+    Questions without a recognisable course, or naming a course title that has no
+    indexed syllabus, fall back to searching every chunk.
+
+    Args:
+        query (str): The question text
+        mode (str): One of RETRIEVAL_MODES; defaults to RETRIEVAL_MODE
+
+    Raises:
+        LookupError: If the question names course numbers none of which has a syllabus
+    """
+    courses, explicit = resolve_courses(query)
+    indexed = courses & partitions.courses
+
+    if explicit and not indexed:
+        raise LookupError(f"No syllabus is available for course {', '.join(sorted(courses))}.")
+
+    return search_chunks(query, mode or RETRIEVAL_MODE, indexed or None)
+
+def answer_stuffed(query: str, chunk_docs, callbacks) -> dict:
+    """Answer from all retrieved chunks with a single completion and extract its citations."""
+    prompt = STUFF_PROMPT.format(context=format_excerpts(chunk_docs), question=query)
+    answer = llm.invoke(prompt, config={"callbacks": callbacks}).strip()
+
+    cited = sorted({int(number) for number in re.findall(r"\[(\d+)\]", answer) if 1 <= int(number) <= len(chunk_docs)})
+    citations = [
+        {
+            "excerpt": number,
+            "source": Path(chunk_docs[number - 1].metadata.get("source", "")).name,
+            "page": chunk_docs[number - 1].metadata.get("page", 0) + 1
+        }
+        for number in cited
+    ]
+    return {"Answer": answer, "Citations": citations}
+
+def answer_map_rerank(query: str, chunk_docs, callbacks) -> dict:
+    """Answer with one scored completion per chunk and keep the highest-scoring answer."""
+    results = chain.invoke({"input_documents": chunk_docs, "question": query}, config={"callbacks": callbacks})
+    return {"Answer": results["output_text"]}
+
+def answer_query(query: str, strategy: str = None, callbacks: Callbacks = None) -> dict:
+    """
+    Retrieve the most relevant syllabus chunks and answer the question with the given strategy.
+
+    Args:
+        query (str): The question about the course syllabus
+        strategy (str): One of ANSWER_STRATEGIES; defaults to ANSWER_STRATEGY
+        callbacks (Callbacks): Callbacks of the tool run, passed on to the LLM calls
+
+    Returns:
+        dict: The answer, the reference text and the strategy used
+    """
+    strategy = strategy or ANSWER_STRATEGY
+    if strategy not in ANSWER_STRATEGIES:
+        raise ValueError(f"Unknown syllabus answering strategy '{strategy}', expected one of {ANSWER_STRATEGIES}")
+
+    start = time.perf_counter()
+    counter = LLMCallCounter()
+
+    # Get relevant chunks, restricted to the course the question is about
+    chunk_docs = retrieve_chunks(query)
+
+    if strategy == "stuff":
+        result = answer_stuffed(query, chunk_docs, with_counter(callbacks, counter))
+    else:
+        result = answer_map_rerank(query, chunk_docs, with_counter(callbacks, counter))
+
+    strategy_stats.record(strategy, counter.llm_calls, time.perf_counter() - start)
+
+    # Create reference text
+    result["Reference"] = " ".join(doc.page_content for doc in chunk_docs)
+    result["Strategy"] = strategy
+    return result
+
 # Initialize components at module level
+llm = CoalescingOpenAI(temperature=0)
 embeddings = initialize_syllabus_loader()
+partitions = CoursePartitions(embeddings) if embeddings else None
+bm25 = load_bm25_index(embeddings, INDEX_DIR) if embeddings else None
+title_lookup = build_title_lookup()
 chain = initialize_qa_chain()
+strategy_stats = StrategyStats()
 
 @tool
-def syllabus_qa(query: str):
+def syllabus_qa(query: str, callbacks: Callbacks = None):
     """
     A tool for answering questions about course syllabi at the Booth School of Business.
     
@@ -125,41 +328,76 @@ def syllabus_qa(query: str):
     
     Args:
         query (str): The question about the course syllabus
+        callbacks (Callbacks): Injected by LangChain with the callbacks of the tool run
         
     Returns:
-        dict: A dictionary containing the answer and reference text
+        dict: A dictionary containing the answer, reference text and cited excerpts
     """
     try:
         if not embeddings or not chain:
             return "I apologize, but I cannot answer syllabus-related questions at the moment. The syllabus database has not been properly initialized. Please ensure that PDF syllabi are available in the docs directory."
             
-        # Get relevant chunks
-        relevant_chunks = embeddings.similarity_search_with_score(query, k=2)
-        chunk_docs = [chunk[0] for chunk in relevant_chunks]
-        
-        # Get results from chain
-        results = chain({"input_documents": chunk_docs, "question": query})
-        
-        # Create reference text
-        text_reference = " ".join(doc.page_content for doc in results["input_documents"])
-        
-        return {
-            "Answer": results["output_text"],
-            "Reference": text_reference
-        }
+        return answer_query(query, callbacks=callbacks)
         
+    except LookupError as e:
+        return str(e)
     except Exception as e:
         return f"Error processing syllabus query: {str(e)}"
 
+# Fixed retrieval benchmark: questions paired with the course(s) whose syllabus answers them.
+# They deliberately avoid course numbers and exact catalog titles so no partition filtering applies.
+BENCHMARK_QUERIES = [
+    ("Who teaches the course on money and banking?", {"33401"}),
+    ("What does Canice Prendergast cover about managing the workplace?", {"33032"}),
+    ("Does the Python and SQL course expect any coding background?", {"32120"}),
+    ("What are the grading components of the Leadership Studio?", {"31403"}),
+    ("How is Scott Meadow's private equity course graded?", {"34101"}),
+    ("What is the final exam format for The Wealth of Nations?", {"33520"}),
+    ("Who developed Perspectives on Capitalism?", {"33250", "33251"}),
+    ("What do Michael Alter's selling classes cover?", {"34111"}),
+    ("Prerequisites for deal structuring and financial reporting", {"30122"}),
+    ("Office hours for Veronica Guerrieri's macroeconomics class", {"33050"}),
+    ("Internal information for strategic decisions grading", {"30005"}),
+    ("Negotiation exercises and role plays", {"38103"}),
+]
+
+def run_retrieval_benchmark(ks=(1, 2, 4)):
+    """Compare latency and recall@k of the lexical, vector and hybrid retrieval modes."""
+    print(f"{'mode':<8} {'ms/query':>9} " + " ".join(f"{'recall@' + str(k):>9}" for k in ks))
+    for mode in RETRIEVAL_MODES:
+        hits = {k: 0 for k in ks}
+        start = time.perf_counter()
+        for query, expected_courses in BENCHMARK_QUERIES:
+            chunk_docs = search_chunks(query, mode, k=max(ks))
+            for k in ks:
+                hits[k] += any(doc.metadata.get("course") in expected_courses for doc in chunk_docs[:k])
+        milliseconds = (time.perf_counter() - start) * 1000 / len(BENCHMARK_QUERIES)
+        print(f"{mode:<8} {milliseconds:9.2f} " + " ".join(f"{hits[k] / len(BENCHMARK_QUERIES):9.2f}" for k in ks))
+
 # Example usage
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Ask sample syllabus questions')
+    parser.add_argument('--compare-strategies', action='store_true', help='Run the sample questions with every answering strategy and report LLM calls and latency')
+    parser.add_argument('--benchmark-retrieval', action='store_true', help='Compare latency and recall@k of the lexical, vector and hybrid retrieval modes')
+    args = parser.parse_args()
+
+    if args.benchmark_retrieval:
+        run_retrieval_benchmark()
+        raise SystemExit
+
     test_queries = [
         "What are the prerequisites for Entrepreneurial Selling?",
         "How is the final grade calculated in Negotiations?",
         "What are the main topics covered in Investments?"
     ]
     
-    for query in test_queries:
-        print(f"\nQuery: {query}")
-        result = syllabus_qa(query)
-        print(f"Response: {result}") 
\ No newline at end of file
+    strategies = ANSWER_STRATEGIES if args.compare_strategies else (ANSWER_STRATEGY,)
+    for strategy in strategies:
+        for query in test_queries:
+            print(f"\nQuery ({strategy}): {query}")
+            result = answer_query(query, strategy)
+            print(f"Response: {result}")
+
+    print("\nLLM calls and latency per strategy:")
+    for strategy, totals in strategy_stats.summary().items():
+        print(f"  {strategy}: {totals['llm_calls_per_answer']:.1f} LLM calls/answer, {totals['seconds_per_answer']:.2f} s/answer over {totals['answers']} answers")
@@ -0,0 +1,289 @@
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+import inspect
+import json
+import os
+import sqlite3
+import time
+from tools.cache_utils import CACHE_DIR, DATA_DIR, DataVersion
+
+COURSE_LIST_PATH = DATA_DIR / "all-course-list.csv"
+BIDDING_HISTORY_PATHS = [DATA_DIR / "bidding-history.csv", DATA_DIR / "bidding-history.parquet"]
+SYLLABUS_DIR = DATA_DIR / "syllabus"
+
+HOUR = 60 * 60
+
+# Per-tool limits: outputs kept, seconds an output is served, and the data files it is computed from.
+# The tool's own source file is always part of its data version, so the degree and concentration
+# rules (which live in code) invalidate their outputs when they are edited.
+TOOL_MEMO_SETTINGS = {
+    "syllabus_qa": {"max_entries": 500, "ttl_seconds": 24 * HOUR, "data_paths": [SYLLABUS_DIR, COURSE_LIST_PATH]},
+    "bid_history_qa": {"max_entries": 500, "ttl_seconds": 6 * HOUR, "data_paths": BIDDING_HISTORY_PATHS},
+    "degree_requirements_checker": {"max_entries": 200, "ttl_seconds": 24 * HOUR, "data_paths": []},
+    "concentration_requirements_checker": {"max_entries": 200, "ttl_seconds": 24 * HOUR, "data_paths": []},
+    "course_tool_vector_search": {"max_entries": 500, "ttl_seconds": 6 * HOUR, "data_paths": [COURSE_LIST_PATH]},
+    "course_to_title": {"max_entries": 1000, "ttl_seconds": 24 * HOUR, "data_paths": [COURSE_LIST_PATH]},
+    "title_to_course": {"max_entries": 1000, "ttl_seconds": 24 * HOUR, "data_paths": [COURSE_LIST_PATH]},
+    "schedule_conflict_checker": {"max_entries": 200, "ttl_seconds": 6 * HOUR, "data_paths": [COURSE_LIST_PATH] + BIDDING_HISTORY_PATHS},
+    "course_planner": {"max_entries": 100, "ttl_seconds": 6 * HOUR, "data_paths": [COURSE_LIST_PATH] + BIDDING_HISTORY_PATHS}
+}
+
+# Settings of tools not listed above
+DEFAULT_MEMO_SETTINGS = {"max_entries": 200, "ttl_seconds": 6 * HOUR, "data_paths": [DATA_DIR]}
+
+# Seconds between checks of a tool's data files
+DATA_VERSION_CHECK_SECONDS = 5
+
+# Outputs that report a failure or a missing index, which a retry may not repeat
+UNCACHEABLE_PREFIXES = ("Error", "I apologize")
+
+# Arguments that LangChain injects and that are not part of a tool's input
+INJECTED_ARGUMENTS = ("callbacks", "run_manager", "config")
+
+# Set to persist tool outputs across restarts in .cache/tool_memo.sqlite
+PERSIST_TOOL_MEMO = os.getenv("BOOTH_AGENT_TOOL_MEMO_PERSIST", "").lower() in ("1", "true", "yes")
+TOOL_MEMO_DB = CACHE_DIR / "tool_memo.sqlite"
+
+
+class MemoStore:
+    """
+    SQLite file holding the JSON-serializable tool outputs of every memoized tool.
+
+    Rows are keyed on the tool name and its input, and carry the data version and time
+    they were computed at, so a lookup only returns an output that is still valid.
+    """
+
+    def __init__(self, path=TOOL_MEMO_DB):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS tool_memo (tool TEXT, key TEXT, version TEXT, stored REAL, value TEXT, "
+                "PRIMARY KEY (tool, key))"
+            )
+
+    def get(self, tool: str, key: str, version: str, min_stored: float):
+        """
+        Returns:
+            tuple: (output, time it was computed), or None if there is no valid row
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, stored FROM tool_memo WHERE tool = ? AND key = ? AND version = ? AND stored >= ?",
+                (tool, key, version, min_stored)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def put(self, tool: str, key: str, version: str, stored: float, value, max_entries: int):
+        """Store an output, dropping the tool's stale rows and its oldest rows beyond max_entries."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tool_memo VALUES (?, ?, ?, ?, ?)",
+                (tool, key, version, stored, json.dumps(value))
+            )
+            self._connection.execute("DELETE FROM tool_memo WHERE tool = ? AND version != ?", (tool, version))
+            self._connection.execute(
+                "DELETE FROM tool_memo WHERE tool = ? AND key NOT IN "
+                "(SELECT key FROM tool_memo WHERE tool = ? ORDER BY stored DESC LIMIT ?)",
+                (tool, tool, max_entries)
+            )
+
+    def clear(self, tool: str = None):
+        with self._lock, self._connection:
+            if tool is None:
+                self._connection.execute("DELETE FROM tool_memo")
+            else:
+                self._connection.execute("DELETE FROM tool_memo WHERE tool = ?", (tool,))
+
+
+class ToolMemo:
+    """
+    Outputs of one tool, keyed on its input and the version of the data it reads.
+
+    Outputs are evicted least recently used first beyond max_entries and expire after
+    ttl_seconds. The data version is a fingerprint (paths, sizes, modification times) of
+    the tool's data files and source file, so refreshing the data makes older outputs
+    unreachable. Error messages are not stored, so a retry runs the tool again.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float, data_paths, store: MemoStore = None):
+        """
+        Args:
+            name (str): Tool name, which namespaces the persisted outputs
+            max_entries (int): Outputs kept in memory (and in the store)
+            ttl_seconds (float): Seconds an output is served
+            data_paths: Files or directories the tool's outputs are computed from
+            store (MemoStore): Optional SQLite store the outputs are also written to
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = DataVersion(data_paths, DATA_VERSION_CHECK_SECONDS)
+        self.store = store
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.stats = {"hits": 0, "persisted_hits": 0, "misses": 0, "stores": 0, "skipped": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def make_key(kwargs: dict) -> str:
+        """Canonical JSON of a tool's arguments, with surrounding whitespace stripped from strings."""
+        arguments = {
+            name: value.strip() if isinstance(value, str) else value
+            for name, value in kwargs.items() if name not in INJECTED_ARGUMENTS
+        }
+        return json.dumps(arguments, sort_keys=True, default=str)
+
+    def get(self, key: str):
+        """
+        Look up the output for an input key.
+
+        Returns:
+            tuple: (True, output) on a hit, (False, None) on a miss
+        """
+        version = self.version.current()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["version"] == version and now - entry["stored"] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return True, entry["value"]
+            if entry is not None:
+                del self._entries[key]
+                self.stats["expirations"] += 1
+
+        row = self.store.get(self.name, key, version, now - self.ttl_seconds) if self.store is not None else None
+        with self._lock:
+            if row is None:
+                self.stats["misses"] += 1
+                return False, None
+            self._remember(key, {"value": row[0], "version": version, "stored": row[1]})
+            self.stats["persisted_hits"] += 1
+            return True, row[0]
+
+    def put(self, key: str, value):
+        """Store a tool output for the current data version, unless it reports an error."""
+        if value is None or (isinstance(value, str) and value.startswith(UNCACHEABLE_PREFIXES)):
+            with self._lock:
+                self.stats["skipped"] += 1
+            return
+        version = self.version.current()
+        stored = time.time()
+        with self._lock:
+            self._remember(key, {"value": value, "version": version, "stored": stored})
+            self.stats["stores"] += 1
+        if self.store is not None:
+            try:
+                self.store.put(self.name, key, version, stored, value, self.max_entries)
+            except (TypeError, ValueError):
+                # Not JSON-serializable: kept in memory only
+                pass
+
+    def _remember(self, key: str, entry: dict):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def wrap(self, func):
+        """Memoize a tool function; its signature is kept so LangChain still injects callbacks."""
+        @wraps(func)
+        def memoized(*args, **kwargs):
+            if args:
+                kwargs = {**dict(zip(inspect.signature(func).parameters, args)), **kwargs}
+            key = self.make_key(kwargs)
+            hit, value = self.get(key)
+            if hit:
+                return value
+            value = func(**kwargs)
+            self.put(key, value)
+            return value
+
+        return memoized
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.store is not None:
+            self.store.clear(self.name)
+
+    def snapshot(self) -> dict:
+        """Hit/miss counters, hit rate and size."""
+        with self._lock:
+            hits = self.stats["hits"] + self.stats["persisted_hits"]
+            lookups = hits + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "data_version": self.version.value
+            }
+
+
+def build_memo(tool, store: MemoStore = None, **settings) -> ToolMemo:
+    """
+    Memo for a tool, configured from its entry in TOOL_MEMO_SETTINGS.
+
+    Args:
+        tool: A tool created with @tool (a StructuredTool or Tool)
+        store (MemoStore): Optional SQLite store for persisting its outputs
+        **settings: Overrides of the tool's settings
+    """
+    settings = {**TOOL_MEMO_SETTINGS.get(tool.name, DEFAULT_MEMO_SETTINGS), **settings}
+    # Unwrap first: a coalesced tool's func is defined in single_flight.py, not the tool's module
+    source_file = inspect.getsourcefile(inspect.unwrap(tool.func))
+    data_paths = list(settings["data_paths"]) + ([source_file] if source_file else [])
+    return ToolMemo(tool.name, settings["max_entries"], settings["ttl_seconds"], data_paths, store)
+
+
+def memoize_tool(tool, memo: ToolMemo):
+    """Copy of a tool whose function is served from the given memo."""
+    return tool.model_copy(update={"func": memo.wrap(tool.func)})
+
+
+class ToolMemoRegistry:
+    """The memos of every tool wrapped by memoize_tools(), for stats and clearing."""
+
+    def __init__(self):
+        self.memos = {}
+        self.store = None
+
+    def memoize_tools(self, tools: list, persist: bool = PERSIST_TOOL_MEMO) -> list:
+        """
+        Memoize every tool of an agent.
+
+        Args:
+            tools (list): Tools created with @tool
+            persist (bool): Also keep the outputs in .cache/tool_memo.sqlite
+
+        Returns:
+            list: The memoized tools, in the same order
+        """
+        if persist and self.store is None:
+            self.store = MemoStore()
+        memoized = []
+        for tool in tools:
+            memo = self.memos[tool.name] = build_memo(tool, self.store if persist else None)
+            memoized.append(memoize_tool(tool, memo))
+        return memoized
+
+    def clear(self):
+        for memo in self.memos.values():
+            memo.clear()
+
+    def snapshot(self) -> dict:
+        """Counters of every memoized tool."""
+        return {
+            "persisted": self.store is not None,
+            "tools": {name: memo.snapshot() for name, memo in self.memos.items()}
+        }
+
+
+# Initialize the registry used by the agent
+tool_memos = ToolMemoRegistry()
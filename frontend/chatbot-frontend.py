@@ -3,6 +3,7 @@ import requests
 import json
 from datetime import datetime
 import os
+import uuid
 from PIL import Image
 
 # Display the logo
@@ -28,28 +29,115 @@ except Exception as e:
 # Set the title using StreamLit
 st.title('Booth Course Assistant')
 
+# Backend addresses (the API, and the async server that streams answers) and timeouts
+# (seconds to connect, seconds to wait between streamed events)
+API_URL = os.getenv("BOOTH_AGENT_API_URL", "http://127.0.0.1:5000")
+STREAM_URL = os.getenv("BOOTH_AGENT_STREAM_URL", "http://127.0.0.1:5001")
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 120
+
+
+@st.cache_resource
+def get_http_session():
+    """One pooled HTTP session shared by every rerun, so connections are reused."""
+    return requests.Session()
+
+
+def read_events(response):
+    """
+    Parse a server-sent event stream.
+
+    Yields:
+        tuple: (event name, decoded JSON payload)
+    """
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+def show_raw_data(raw_data, key):
+    """Render the thinking steps and the raw payload, only when the user asks for them."""
+    if not st.checkbox("Show thinking and raw response data", key=key):
+        return
+    # Format the bot thinking with proper newlines
+    if "bot_thinking" in raw_data:
+        st.write("### Bot's Thinking Process:")
+        for step in raw_data["bot_thinking"].split("\n"):
+            if step.strip():
+                st.text(step.strip())
+    # Display the rest of the raw data
+    st.write("### Raw Response Data:")
+    st.json(raw_data, expanded=False)
+
+
+def stream_answer(query):
+    """
+    Send the query to the streaming endpoint and render the answer as it arrives.
+
+    Returns:
+        tuple: (answer text, raw data of the response)
+    """
+    response = get_http_session().post(
+        f"{STREAM_URL}/api/query/stream",
+        json={'query': query, 'session_id': st.session_state.session_id},
+        stream=True,
+        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+    )
+    response.raise_for_status()
+
+    status = st.status("Thinking...")
+    placeholder = st.empty()
+    answer, steps, raw_data = "", [], {}
+    with response:
+        for event, data in read_events(response):
+            if event == "start":
+                st.session_state.session_id = data["session_id"]
+            elif event == "thought":
+                status.write(data["text"])
+            elif event == "tool_start":
+                status.update(label=f"Using {data['tool']}...")
+                steps.append(data)
+            elif event == "tool_end":
+                status.text(data["output"][:500])
+                steps.append(data)
+            elif event == "token":
+                answer += data["text"]
+                placeholder.markdown(answer + "▌")
+            elif event == "done":
+                answer = data["response"]
+                raw_data = {**data, "steps": steps}
+            elif event == "error":
+                raise RuntimeError(data["error"])
+
+    status.update(label="Done", state="complete", expanded=False)
+    placeholder.markdown(answer)
+    return answer, raw_data
+
+
 # Initialize session state for chat history if it doesn't exist
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
+# Conversation id sent with every query, so the server keeps this chat's memory apart from other users
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 # Display chat history
 st.write('### Chat History')
-for message in st.session_state.chat_history:
+for index, message in enumerate(st.session_state.chat_history):
     with st.chat_message(message["role"]):
         st.write(message["content"])
         if "raw_data" in message:
-            with st.expander("Raw Response Data"):
-                # Format the bot thinking with proper newlines
-                if "bot_thinking" in message["raw_data"]:
-                    thinking = message["raw_data"]["bot_thinking"]
-                    # Split thinking into steps
-                    steps = thinking.split("\n")
-                    st.write("### Bot's Thinking Process:")
-                    for step in steps:
-                        if step.strip():
-                            st.text(step.strip())
-                # Display the rest of the raw data
-                st.code(json.dumps(message["raw_data"], indent=2))
+            show_raw_data(message["raw_data"], key=f"raw_{index}")
 
 # Add a text input for the query
 query = st.text_input('Ask a question about Booth courses:')
@@ -57,66 +145,28 @@ query = st.text_input('Ask a question about Booth courses:')
 # Add a submit button
 if st.button('Submit'):
     if query:
+        # Add user query to chat history
+        st.session_state.chat_history.append({
+            "role": "user",
+            "content": query,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+        with st.chat_message("user"):
+            st.write(query)
+
         try:
-            # Add user query to chat history
+            # Render the answer as the server streams it
+            with st.chat_message("assistant"):
+                answer, raw_data = stream_answer(query)
+
+            # Add assistant response to chat history
             st.session_state.chat_history.append({
-                "role": "user",
-                "content": query,
+                "role": "assistant",
+                "content": answer,
+                "raw_data": raw_data,
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             })
-            
-            # Send POST request to the Flask API
-            response = requests.post(
-                'http://127.0.0.1:5000/api/query',
-                json={'query': query}
-            )
-            
-            # Print raw response for debugging
-            print("Raw Response:", response.text)
-            print("Status Code:", response.status_code)
-            
-            # Check if the request was successful
-            if response.status_code == 200:
-                result = response.json()
-                print("Parsed JSON:", json.dumps(result, indent=2))
-                
-                # Add assistant response to chat history
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "content": result['response'],
-                    "raw_data": result,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
-                
-                # Display the response in a chat message
-                with st.chat_message("assistant"):
-                    st.write(result['response'])
-                    with st.expander("See thinking and Raw Response Data"):
-                        # Format the bot thinking with proper newlines
-                        if "bot_thinking" in result:
-                            thinking = result["bot_thinking"]
-                            # Split thinking into steps
-                            steps = thinking.split("\n")
-                            st.write("### Bot's Thinking Process:")
-                            for step in steps:
-                                if step.strip():
-                                    st.text(step.strip())
-                        # Display the rest of the raw data
-                        st.write("### Raw Response Data:")
-                        st.code(json.dumps(result, indent=2))
-                
-                # Clear the input
-                st.session_state.query = ""
-                
-            else:
-                error_message = f'Error: {response.status_code} - {response.text}'
-                st.error(error_message)
-                st.session_state.chat_history.append({
-                    "role": "assistant",
-                    "content": error_message,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                })
-                
+
         except requests.exceptions.ConnectionError:
             error_message = 'Could not connect to the server. Make sure the Flask server is running.'
             st.error(error_message)
@@ -125,6 +175,14 @@ if st.button('Submit'):
                 "content": error_message,
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             })
+        except requests.exceptions.Timeout:
+            error_message = f'The server did not respond within {READ_TIMEOUT} seconds. Please try again.'
+            st.error(error_message)
+            st.session_state.chat_history.append({
+                "role": "assistant",
+                "content": error_message,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
         except Exception as e:
             error_message = f'An error occurred: {str(e)}'
             st.error(error_message)
@@ -139,7 +197,13 @@ if st.button('Submit'):
 
 # Add a clear chat button
 if st.button('Clear Chat History'):
+    try:
+        # Forget the conversation on the server too
+        get_http_session().delete(f"{API_URL}/api/sessions/{st.session_state.session_id}", timeout=CONNECT_TIMEOUT)
+    except requests.exceptions.RequestException:
+        pass
     st.session_state.chat_history = []
+    st.session_state.session_id = uuid.uuid4().hex
     st.rerun()
 
 # Add some helpful information